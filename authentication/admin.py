@@ -70,7 +70,7 @@ class RoleAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('permissions', 'users')
+        return super().get_queryset(request).with_counts()
 
 
 @admin.register(UserSession)
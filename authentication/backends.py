@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Case, IntegerField, Q, Value, When
+
+UserModel = get_user_model()
+
+
+class UsernameOrEmailBackend(ModelBackend):
+    """
+    Authenticate with a username or an email address in a single lookup
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        candidates = list(
+            UserModel._default_manager
+            .filter(Q(username=username) | Q(email__iexact=username))
+            .order_by(Case(When(username=username, then=Value(0)), default=Value(1), output_field=IntegerField()))
+            [:2]
+        )
+        # A username match wins over an email match; an email shared by
+        # several accounts is ambiguous and never authenticates
+        user = next((candidate for candidate in candidates if candidate.username == username), None)
+        if user is None and len(candidates) == 1:
+            user = candidates[0]
+
+        if user is None:
+            # Run the password hasher anyway so that unknown logins take as
+            # long as wrong passwords
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -129,11 +129,36 @@ ROLE_CHOICES = [
     (ROLES['PROJECT_USER'], 'Project User'),
 ]
 
+# Permission bit positions, compiled once at import: each permission string
+# is one bit, a set of permissions is an integer mask
+PERMISSION_BITS = {permission: 1 << index for index, permission in enumerate(PERMISSIONS.values())}
+
+# Bits above this offset belong to Permission rows of custom roles
+# (see authentication.permission_masks)
+CUSTOM_PERMISSION_OFFSET = len(PERMISSION_BITS)
+
+def permission_mask(permissions):
+    """Mask of a list of permission strings (unknown strings are ignored)"""
+    mask = 0
+    for permission in permissions:
+        mask |= PERMISSION_BITS.get(permission, 0)
+    return mask
+
+def mask_permissions(mask):
+    """Permission strings of a mask, in declaration order"""
+    return [permission for permission, bit in PERMISSION_BITS.items() if mask & bit]
+
+ROLE_PERMISSION_MASKS = {role: permission_mask(permissions) for role, permissions in ROLE_PERMISSIONS.items()}
+
 # Helper functions
 def get_role_permissions(role):
     """Get permissions for a specific role"""
     return ROLE_PERMISSIONS.get(role, [])
 
+def get_role_permission_mask(role):
+    """Get the permission mask of a specific role"""
+    return ROLE_PERMISSION_MASKS.get(role, 0)
+
 def has_permission(user, permission):
     """Check if user has a specific permission"""
     if not user:
@@ -143,8 +168,7 @@ def has_permission(user, permission):
     if user.role == ROLES['ADMIN'] or user.is_superuser or user.is_staff:
         return True
     
-    user_permissions = get_role_permissions(user.role)
-    return permission in user_permissions
+    return bool(get_role_permission_mask(user.role) & PERMISSION_BITS.get(permission, 0))
 
 def is_super_user(user):
     """Check if user is a superuser"""
@@ -0,0 +1,136 @@
+"""
+Slim user directory for team pickers.
+
+The directory is a snapshot of the active users (id, username, name, avatar,
+department, position) built with one query and kept in the cache under a
+version that any User save or delete changes (``authentication.signals``).
+Each process keeps a sorted index of the name tokens of the current version
+and answers prefix searches with a binary search.
+"""
+import bisect
+import logging
+import threading
+import uuid
+
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+
+from .models import User
+from .user_cache import get_user_cache_setting
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'user_directory_version'
+
+# Snapshots outlive their version by this much; a new version is built on
+# first use anyway
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+
+def _cache():
+    return caches[get_user_cache_setting('cache')]
+
+
+def _snapshot_key(version):
+    return f'user_directory:{version}'
+
+
+def build_entries():
+    """Active users as directory entries, ordered by name (one query)"""
+    entries = []
+    rows = (
+        User.objects.filter(is_active=True)
+        .order_by('first_name', 'last_name', 'username')
+        .values('id', 'username', 'first_name', 'last_name', 'avatar', 'department', 'position')
+    )
+    for row in rows:
+        avatar = row.pop('avatar')
+        first_name, last_name = row.pop('first_name'), row.pop('last_name')
+        row['full_name'] = f"{first_name} {last_name}".strip() or row['username']
+        row['avatar'] = default_storage.url(avatar) if avatar else None
+        entries.append(row)
+    return entries
+
+
+class DirectoryIndex:
+    """Entries with a sorted (token, position) list for prefix search"""
+
+    def __init__(self, version, entries):
+        self.version = version
+        self.entries = entries
+        pairs = set()
+        for position, entry in enumerate(entries):
+            for token in self.tokens(entry):
+                pairs.add((token, position))
+        self.pairs = sorted(pairs)
+        self.tokens_only = [token for token, _ in self.pairs]
+
+    @staticmethod
+    def tokens(entry):
+        return set(f"{entry['full_name']} {entry['username']}".lower().split())
+
+    def _prefix_positions(self, prefix):
+        start = bisect.bisect_left(self.tokens_only, prefix)
+        positions = set()
+        for token, position in self.pairs[start:]:
+            if not token.startswith(prefix):
+                break
+            positions.add(position)
+        return positions
+
+    def search(self, query, limit=None):
+        """Entries with a name token starting with each word of `query`, in name order"""
+        words = query.lower().split()
+        if not words:
+            return self.entries[:limit] if limit else list(self.entries)
+        positions = self._prefix_positions(words[0])
+        for word in words[1:]:
+            if not positions:
+                break
+            positions &= self._prefix_positions(word)
+        found = [self.entries[position] for position in sorted(positions)]
+        return found[:limit] if limit else found
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The index of the current directory version (rebuilt when it changed)"""
+    global _index
+    cache = _cache()
+    try:
+        version = cache.get(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"User directory cache unavailable: {e}")
+        return DirectoryIndex(None, build_entries())
+
+    index = _index
+    if index is not None and version is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is not None and version is not None and index.version == version:
+            return index
+        if version is None:
+            # Publish the version before reading the users: an invalidation
+            # during build_entries() deletes it, so a stale snapshot is never
+            # served under the current version
+            candidate = uuid.uuid4().hex
+            version = candidate if cache.add(VERSION_KEY, candidate, timeout=None) else cache.get(VERSION_KEY)
+        entries = cache.get(_snapshot_key(version)) if version is not None else None
+        if entries is None:
+            entries = build_entries()
+            if version is not None:
+                cache.set(_snapshot_key(version), entries, timeout=SNAPSHOT_TIMEOUT)
+        _index = DirectoryIndex(version, entries)
+        return _index
+
+
+def invalidate_directory():
+    try:
+        _cache().delete(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Could not invalidate the user directory: {e}")
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from authentication.models import DepartmentPermission, DEPARTMENT_CHOICES
+from authentication.models import DEPARTMENT_CHOICES
+from authentication.provisioning import ProvisioningReport, sync_department_permissions
 
 User = get_user_model()
 
@@ -12,7 +13,13 @@ class Command(BaseCommand):
         parser.add_argument(
             '--username',
             type=str,
-            help='Username to assign permissions to'
+            nargs='+',
+            help='Username(s) to assign permissions to'
+        )
+        parser.add_argument(
+            '--all-users',
+            action='store_true',
+            help='Assign permissions to all active users'
         )
         parser.add_argument(
             '--department',
@@ -44,62 +51,58 @@ class Command(BaseCommand):
             self.list_users()
             return
 
-        if not options['username']:
+        if options['all_users']:
+            users = User.objects.filter(is_active=True)
+        elif options['username']:
+            users = User.objects.filter(username__in=options['username'])
+        else:
             self.stdout.write(
-                self.style.ERROR('Username is required. Use --username <username>')
+                self.style.ERROR('Username is required. Use --username <username> or --all-users')
             )
             return
 
-        try:
-            user = User.objects.get(username=options['username'])
-        except User.DoesNotExist:
-            self.stdout.write(
-                self.style.ERROR(f'User "{options["username"]}" not found')
-            )
-            return
+        users = dict(users.values_list('id', 'username'))
+        if options['username']:
+            missing = set(options['username']) - set(users.values())
+            for username in sorted(missing):
+                self.stdout.write(
+                    self.style.ERROR(f'User "{username}" not found')
+                )
+            if not users:
+                return
 
         departments = [options['department']] if options['department'] else [choice[0] for choice in DEPARTMENT_CHOICES]
         
         if options['all_departments']:
             departments = [choice[0] for choice in DEPARTMENT_CHOICES]
 
-        for department in departments:
-            self.assign_permissions(user, department, options['permissions'])
-
-    def assign_permissions(self, user, department, permissions):
-        """Assign permissions for a specific department"""
-        perm, created = DepartmentPermission.objects.get_or_create(
-            user=user,
-            department=department,
-            defaults={
-                'can_view': 'view' in permissions,
-                'can_edit': 'edit' in permissions,
-                'can_create': 'create' in permissions,
-                'can_delete': 'delete' in permissions,
-            }
-        )
+        self.assign_permissions(users, departments, options['permissions'])
 
-        if not created:
-            # Update existing permissions
-            perm.can_view = 'view' in permissions
-            perm.can_edit = 'edit' in permissions
-            perm.can_create = 'create' in permissions
-            perm.can_delete = 'delete' in permissions
-            perm.save()
+    def assign_permissions(self, users, departments, permissions):
+        """Assign permissions for the given departments to users ({id: username})"""
+        flags = {
+            'can_view': 'view' in permissions,
+            'can_edit': 'edit' in permissions,
+            'can_create': 'create' in permissions,
+            'can_delete': 'delete' in permissions,
+        }
+        desired = {(user_id, department): flags for user_id in users for department in departments}
+        report = ProvisioningReport()
+        report.run('department permissions', sync_department_permissions, desired)
 
-        action = 'Created' if created else 'Updated'
         self.stdout.write(
             self.style.SUCCESS(
-                f'{action} permissions for {user.username} - {department}: {", ".join(permissions)}'
+                f'Assigned {", ".join(permissions)} on {", ".join(departments)} to {len(users)} users'
             )
         )
+        report.write(self.stdout)
 
     def list_users(self):
         """List all users with their department permissions"""
         self.stdout.write(self.style.SUCCESS('Users and their department permissions:'))
         self.stdout.write('=' * 80)
         
-        for user in User.objects.all().order_by('username'):
+        for user in User.objects.prefetch_related('department_permissions').order_by('username'):
             self.stdout.write(f'\n{user.username} ({user.get_full_name()}) - Department: {user.department or "None"}')
             
             permissions = user.department_permissions.all()
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+from authentication.provisioning import ProvisioningReport, sync_user_roles
 
 User = get_user_model()
 
@@ -31,34 +33,27 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        if options['all_managers']:
-            # Set all users as PROJECT_MANAGER
-            users = User.objects.all()
-            count = users.update(role='PROJECT_MANAGER')
+        report = ProvisioningReport()
+        if options['all_managers'] or options['all_users']:
+            # Set all users as PROJECT_MANAGER or PROJECT_USER
+            role = 'PROJECT_MANAGER' if options['all_managers'] else 'PROJECT_USER'
+            counts = report.run('user roles', sync_user_roles, role)
             self.stdout.write(
-                self.style.SUCCESS(f'✓ Assigned PROJECT_MANAGER role to {count} users')
-            )
-            
-        elif options['all_users']:
-            # Set all users as PROJECT_USER
-            users = User.objects.all()
-            count = users.update(role='PROJECT_USER')
-            self.stdout.write(
-                self.style.SUCCESS(f'✓ Assigned PROJECT_USER role to {count} users')
+                self.style.SUCCESS(f'✓ Assigned {role} role to {counts["updated"] + counts["unchanged"]} users')
             )
+            report.write(self.stdout)
             
         elif options['username'] and options['role']:
             # Assign specific role to specific user
-            try:
-                user = User.objects.get(username=options['username'])
-                user.role = options['role']
-                user.save()
+            user = User.objects.filter(username=options['username']).first()
+            if user is not None:
+                report.run('user roles', sync_user_roles, options['role'], User.objects.filter(pk=user.pk))
                 self.stdout.write(
                     self.style.SUCCESS(
                         f'✓ Assigned {options["role"]} to user: {user.username} ({user.full_name})'
                     )
                 )
-            except User.DoesNotExist:
+            else:
                 self.stdout.write(
                     self.style.ERROR(f'✗ User not found: {options["username"]}')
                 )
@@ -84,10 +79,12 @@ class Command(BaseCommand):
             self.stdout.write('  python manage.py assign_project_roles --username john --role PROJECT_MANAGER')
             
         # Display summary
-        pm_count = User.objects.filter(role='PROJECT_MANAGER').count()
-        pu_count = User.objects.filter(role='PROJECT_USER').count()
-        no_role_count = User.objects.filter(role__isnull=True).count() + \
-                       User.objects.filter(role='').count()
+        counts = User.objects.aggregate(
+            pm_count=Count('id', filter=Q(role='PROJECT_MANAGER')),
+            pu_count=Count('id', filter=Q(role='PROJECT_USER')),
+            no_role_count=Count('id', filter=Q(role__isnull=True) | Q(role='')),
+        )
+        pm_count, pu_count, no_role_count = counts['pm_count'], counts['pu_count'], counts['no_role_count']
         
         self.stdout.write('\n=== Summary ===')
         self.stdout.write(f'PROJECT_MANAGER: {pm_count} users')
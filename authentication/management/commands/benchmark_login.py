@@ -0,0 +1,117 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.sessions import wait_for_session_writes
+
+User = get_user_model()
+
+
+class BenchmarkPasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with the iteration count chosen for the benchmark run"""
+    iterations = 1000
+
+
+class Command(BaseCommand):
+    help = 'Measure logins per second through the login endpoint at a fixed password hasher cost'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=200,
+            help='Number of logins (default: 200)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Parallel clients (default: 1)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=1000,
+            help='PBKDF2 iterations of the benchmark password hasher (default: 1000)'
+        )
+        parser.add_argument(
+            '--email',
+            action='store_true',
+            help='Log in with the email address instead of the username'
+        )
+
+    def handle(self, *args, **options):
+        count = max(1, options['count'])
+        concurrency = max(1, options['concurrency'])
+        BenchmarkPasswordHasher.iterations = options['iterations']
+
+        hasher = f'{BenchmarkPasswordHasher.__module__}.{BenchmarkPasswordHasher.__qualname__}'
+        with override_settings(PASSWORD_HASHERS=[hasher], ALLOWED_HOSTS=['*']):
+            suffix = uuid.uuid4().hex[:8]
+            password = uuid.uuid4().hex
+            user = User.objects.create_user(
+                username=f'benchmark_login_{suffix}',
+                email=f'benchmark_login_{suffix}@example.com',
+                password=password,
+            )
+            credentials = {
+                'username': user.email if options['email'] else user.username,
+                'password': password,
+            }
+            url = reverse('authentication:login')
+
+            try:
+                # Warm-up login, also used to count the queries of one login
+                with CaptureQueriesContext(connection) as queries:
+                    self._login(APIClient(), url, credentials)
+                wait_for_session_writes()
+
+                per_client = [count // concurrency + (1 if i < count % concurrency else 0) for i in range(concurrency)]
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='benchmark-login') as executor:
+                    durations = [
+                        duration
+                        for batch in executor.map(lambda n: self._run_client(url, credentials, n), per_client)
+                        for duration in batch
+                    ]
+                elapsed = time.perf_counter() - started
+                wait_for_session_writes()
+            finally:
+                user.delete()
+
+        durations.sort()
+        self.stdout.write(f'Logins: {len(durations)} ({concurrency} clients, PBKDF2 {options["iterations"]} iterations)')
+        self.stdout.write(f'Queries per login: {len(queries)}')
+        self.stdout.write(f'Elapsed: {elapsed:.2f}s')
+        self.stdout.write(
+            f'Latency: mean {statistics.mean(durations) * 1000:.1f}ms, '
+            f'p50 {durations[len(durations) // 2] * 1000:.1f}ms, '
+            f'p95 {durations[int(len(durations) * 0.95) - 1] * 1000:.1f}ms'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Throughput: {len(durations) / elapsed:.1f} logins/s'))
+
+    def _run_client(self, url, credentials, logins):
+        client = APIClient()
+        durations = []
+        try:
+            for _ in range(logins):
+                started = time.perf_counter()
+                self._login(client, url, credentials)
+                durations.append(time.perf_counter() - started)
+        finally:
+            connections.close_all()
+        return durations
+
+    def _login(self, client, url, credentials):
+        response = client.post(url, credentials, format='json')
+        if response.status_code != 200:
+            raise RuntimeError(f'Login failed with status {response.status_code}: {response.content[:200]}')
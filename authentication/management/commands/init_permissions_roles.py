@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from authentication.models import Permission, Role
+from authentication.models import Permission
+from authentication.provisioning import ProvisioningReport, sync_permissions, sync_roles
 
 
 class Command(BaseCommand):
@@ -41,19 +42,9 @@ class Command(BaseCommand):
             {'name': 'Can change settings', 'codename': 'change_settings', 'description': 'Peut modifier les paramètres', 'category': 'settings'},
         ]
         
-        created_permissions = []
-        for perm_data in permissions_data:
-            permission, created = Permission.objects.get_or_create(
-                codename=perm_data['codename'],
-                defaults=perm_data
-            )
-            if created:
-                created_permissions.append(permission)
-                self.stdout.write(f'  Created permission: {permission.name}')
-            else:
-                self.stdout.write(f'  Permission already exists: {permission.name}')
-        
-        self.stdout.write(f'Created {len(created_permissions)} new permissions')
+        report = ProvisioningReport()
+        counts = report.run('permissions', sync_permissions, permissions_data)
+        self.stdout.write(f'Created {counts["created"]} new permissions')
         
         # Create default roles
         self.stdout.write('Creating default roles...')
@@ -63,7 +54,7 @@ class Command(BaseCommand):
                 'name': 'Administrateur',
                 'description': 'Accès complet au système',
                 'is_system': True,
-                'permissions': [p.codename for p in Permission.objects.all()]
+                'permissions': list(Permission.objects.values_list('codename', flat=True))
             },
             {
                 'name': 'Manager',
@@ -109,22 +100,8 @@ class Command(BaseCommand):
             }
         ]
         
-        created_roles = []
-        for role_data in roles_data:
-            permissions = role_data.pop('permissions')
-            role, created = Role.objects.get_or_create(
-                name=role_data['name'],
-                defaults=role_data
-            )
-            
-            if created:
-                # Assign permissions to role
-                role_permissions = Permission.objects.filter(codename__in=permissions)
-                role.permissions.set(role_permissions)
-                created_roles.append(role)
-                self.stdout.write(f'  Created role: {role.name} with {role_permissions.count()} permissions')
-            else:
-                self.stdout.write(f'  Role already exists: {role.name}')
-        
-        self.stdout.write(f'Created {len(created_roles)} new roles')
+        # Roles that already exist keep their permissions
+        counts = report.run('roles', sync_roles, roles_data, reset_permissions=False)
+        self.stdout.write(f'Created {counts["created"]} new roles')
+        report.write(self.stdout)
         self.stdout.write(self.style.SUCCESS('Successfully initialized permissions and roles!'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from authentication.sessions import prune_stale_sessions
+
+
+class Command(BaseCommand):
+    help = 'Deactivate idle user sessions and delete old inactive ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-days',
+            type=int,
+            default=None,
+            help='Deactivate sessions idle for this many days (default: SESSION_ACTIVITY stale_days)'
+        )
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=None,
+            help='Delete inactive sessions idle for this many days (default: SESSION_ACTIVITY retention_days)'
+        )
+
+    def handle(self, *args, **options):
+        expired, deleted = prune_stale_sessions(
+            stale_days=options['stale_days'],
+            retention_days=options['retention_days'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} sessions, deleted {deleted}'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from authentication.token_revocation import get_revocation_setting, prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted JWT refresh tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Tokens deleted per transaction (default: TOKEN_REVOCATION prune_batch_size)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the expired tokens'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or get_revocation_setting('prune_batch_size')
+        count = prune_expired_tokens(batch_size=batch_size, dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{count} expired tokens would be deleted')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired tokens'))
@@ -1,9 +1,14 @@
+from collections import Counter
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from authentication.models import DepartmentPermission, DEPARTMENT_CHOICES
+from authentication.models import DEPARTMENT_CHOICES
+from authentication.provisioning import ProvisioningReport, sync_department_permissions
 
 User = get_user_model()
 
+FULL_ACCESS = {'can_view': True, 'can_edit': True, 'can_create': True, 'can_delete': True}
+OWN_DEPARTMENT_ACCESS = {'can_view': True, 'can_edit': True, 'can_create': True, 'can_delete': False}
+
 
 class Command(BaseCommand):
     help = 'Setup default department permissions for existing users'
@@ -12,74 +17,69 @@ class Command(BaseCommand):
         parser.add_argument(
             '--reset',
             action='store_true',
-            help='Reset all existing department permissions'
+            help='Reset all existing department permissions to the defaults'
         )
 
     def handle(self, *args, **options):
-        if options['reset']:
-            self.stdout.write('Resetting all department permissions...')
-            DepartmentPermission.objects.all().delete()
-
         self.stdout.write('Setting up department permissions...')
-        
-        # Get all users
-        users = User.objects.all()
-        
+
+        users = User.objects.values('id', 'username', 'is_superuser', 'role', 'department')
+        desired = {}
+        kinds = Counter()
+        user_ids = []
         for user in users:
-            self.setup_user_permissions(user)
-        
+            user_ids.append(user['id'])
+            kind, permissions = self.default_permissions(user)
+            kinds[kind] += 1
+            for department, flags in permissions.items():
+                desired[(user['id'], department)] = flags
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  - {user["username"]}: {kind}')
+
+        # Without --reset, existing permissions are kept as they are
+        report = ProvisioningReport()
+        report.run(
+            'department permissions',
+            sync_department_permissions,
+            desired,
+            overwrite=options['reset'],
+            prune=options['reset'],
+            user_ids=user_ids,
+        )
+
+        for kind, count in kinds.items():
+            self.stdout.write(f'  {count} users: {kind}')
+        report.write(self.stdout)
         self.stdout.write(
-            self.style.SUCCESS(f'Department permissions setup completed for {users.count()} users')
+            self.style.SUCCESS(f'Department permissions setup completed for {len(user_ids)} users')
         )
 
-    def setup_user_permissions(self, user):
-        """Setup default permissions for a user based on their department"""
-        
+    def default_permissions(self, user):
+        """Default permissions for a user based on their department: (description, {department: flags})"""
+
         # Superusers and admins get access to all departments
-        if user.is_superuser or user.role == 'admin':
-            for department, _ in DEPARTMENT_CHOICES:
-                DepartmentPermission.objects.get_or_create(
-                    user=user,
-                    department=department,
-                    defaults={
-                        'can_view': True,
-                        'can_edit': True,
-                        'can_create': True,
-                        'can_delete': True,
-                    }
-                )
-            self.stdout.write(f'  - {user.username}: Full access to all departments (admin)')
-            return
+        if user['is_superuser'] or user['role'] == 'admin':
+            return (
+                'Full access to all departments (admin)',
+                {department: FULL_ACCESS for department, _ in DEPARTMENT_CHOICES},
+            )
 
         # Managers get view access to all departments, edit/create for their department
-        if user.role == 'manager':
-            for department, _ in DEPARTMENT_CHOICES:
-                is_own_department = user.department == department
-                DepartmentPermission.objects.get_or_create(
-                    user=user,
-                    department=department,
-                    defaults={
+        if user['role'] == 'manager':
+            return (
+                'View all, edit/create own department (manager)',
+                {
+                    department: {
                         'can_view': True,
-                        'can_edit': is_own_department,
-                        'can_create': is_own_department,
+                        'can_edit': user['department'] == department,
+                        'can_create': user['department'] == department,
                         'can_delete': False,
                     }
-                )
-            self.stdout.write(f'  - {user.username}: View all, edit/create own department (manager)')
-            return
+                    for department, _ in DEPARTMENT_CHOICES
+                },
+            )
 
         # Regular users get access only to their own department
-        if user.department:
-            DepartmentPermission.objects.get_or_create(
-                user=user,
-                department=user.department,
-                defaults={
-                    'can_view': True,
-                    'can_edit': True,
-                    'can_create': True,
-                    'can_delete': False,
-                }
-            )
-            self.stdout.write(f'  - {user.username}: Access to own department ({user.department})')
-        else:
-            self.stdout.write(f'  - {user.username}: No department assigned, no permissions created')
+        if user['department']:
+            return 'Access to own department', {user['department']: OWN_DEPARTMENT_ACCESS}
+        return 'No department assigned, no permissions created', {}
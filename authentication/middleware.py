@@ -0,0 +1,47 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject, empty
+
+from .sessions import activity_tracker
+
+
+def get_client_ip(request):
+    """Get client IP address"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+class SessionActivityMiddleware:
+    """
+    Record the last seen time and IP of authenticated users in the activity
+    tracker (written in bulk later, see authentication.sessions)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.track(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.track(request)
+        return response
+
+    def track(self, request):
+        user = getattr(request, 'user', None)
+        # Only users already resolved by the request (DRF sets request.user
+        # when it authenticates): never load one just to track it
+        if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+            return
+        if user.is_authenticated:
+            activity_tracker.touch(user.pk, get_client_ip(request))
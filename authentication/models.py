@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import date
 from .constants import ROLES, PERMISSIONS, ROLE_PERMISSIONS, USER_STATUS_CHOICES, ROLE_CHOICES, has_permission, is_super_user
@@ -62,6 +63,15 @@ class User(AbstractUser):
         """Check if user has a specific permission"""
         return has_permission(self, permission)
     
+    def get_department_permission(self, department):
+        """Explicit permission for a department, from prefetched rows when available"""
+        if 'department_permissions' in getattr(self, '_prefetched_objects_cache', {}):
+            return next(
+                (perm for perm in self.department_permissions.all() if perm.department == department),
+                None
+            )
+        return self.department_permissions.filter(department=department).first()
+    
     def can_view_department(self, department):
         """Check if user can view projects from a specific department"""
         # Superusers and admins can see all departments
@@ -69,12 +79,11 @@ class User(AbstractUser):
             return True
         
         # Check if user has explicit permission for this department
-        try:
-            perm = self.department_permissions.get(department=department)
+        perm = self.get_department_permission(department)
+        if perm is not None:
             return perm.can_view
-        except DepartmentPermission.DoesNotExist:
-            # If no explicit permission, check if it's their own department
-            return self.department == department
+        # If no explicit permission, check if it's their own department
+        return self.department == department
     
     def can_edit_department(self, department):
         """Check if user can edit projects from a specific department"""
@@ -83,12 +92,11 @@ class User(AbstractUser):
             return True
         
         # Check if user has explicit permission for this department
-        try:
-            perm = self.department_permissions.get(department=department)
+        perm = self.get_department_permission(department)
+        if perm is not None:
             return perm.can_edit
-        except DepartmentPermission.DoesNotExist:
-            # If no explicit permission, check if it's their own department
-            return self.department == department
+        # If no explicit permission, check if it's their own department
+        return self.department == department
     
     def can_create_department(self, department):
         """Check if user can create projects for a specific department"""
@@ -97,12 +105,11 @@ class User(AbstractUser):
             return True
         
         # Check if user has explicit permission for this department
-        try:
-            perm = self.department_permissions.get(department=department)
+        perm = self.get_department_permission(department)
+        if perm is not None:
             return perm.can_create
-        except DepartmentPermission.DoesNotExist:
-            # If no explicit permission, check if it's their own department
-            return self.department == department
+        # If no explicit permission, check if it's their own department
+        return self.department == department
     
     def get_accessible_departments(self):
         """Get list of departments the user can access"""
@@ -117,8 +124,8 @@ class User(AbstractUser):
             accessible.append(self.department)
         
         # Add departments with explicit permissions
-        for perm in self.department_permissions.filter(can_view=True):
-            if perm.department not in accessible:
+        for perm in self.department_permissions.all():
+            if perm.can_view and perm.department not in accessible:
                 accessible.append(perm.department)
         
         return accessible
@@ -178,6 +185,11 @@ class User(AbstractUser):
         """Get all permissions for the user"""
         from .constants import get_role_permissions
         return get_role_permissions(self.role)
+    
+    def get_permission_mask(self):
+        """Get the permission mask of the user's role and custom roles"""
+        from .permission_masks import user_permission_mask
+        return user_permission_mask(self)
 
 
 class Permission(models.Model):
@@ -217,6 +229,34 @@ class Permission(models.Model):
         return f"{self.name} ({self.codename})"
 
 
+class RoleQuerySet(models.QuerySet):
+    """
+    Role queries
+    """
+    
+    def with_counts(self):
+        """Annotate user and permission counts (read by user_count and permission_count)"""
+        # One subquery per count: joining both m2m tables would multiply the
+        # rows of each role by users x permissions
+        return self.annotate(
+            users_total=self._link_count(User.roles.through),
+            permissions_total=self._link_count(Role.permissions.through),
+        )
+    
+    @staticmethod
+    def _link_count(through):
+        links = (
+            through.objects.filter(role=models.OuterRef('pk'))
+            .order_by().values('role')
+            .annotate(total=models.Count('*')).values('total')
+        )
+        return Coalesce(models.Subquery(links, output_field=models.IntegerField()), 0)
+    
+    def for_serialization(self):
+        """Counts annotated and permissions prefetched, as RoleSerializer reads them"""
+        return self.with_counts().prefetch_related('permissions')
+
+
 class Role(models.Model):
     """
     Custom Role model for role-based access control
@@ -230,6 +270,8 @@ class Role(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = RoleQuerySet.as_manager()
+    
     class Meta:
         db_table = 'custom_roles'
         verbose_name = 'Role'
@@ -242,7 +284,21 @@ class Role(models.Model):
     @property
     def user_count(self):
         """Get the number of users with this role"""
+        if 'users_total' in self.__dict__:
+            return self.users_total
         return self.users.count()
+    
+    @property
+    def permission_count(self):
+        """Get the number of permissions of this role"""
+        if 'permissions_total' in self.__dict__:
+            return self.permissions_total
+        return self.permissions.count()
+
+
+def user_roles_prefetch():
+    """Prefetch of User.roles with what RoleSerializer reads (counts, permissions)"""
+    return models.Prefetch('roles', queryset=Role.objects.for_serialization())
 
 
 class UserSession(models.Model):
@@ -0,0 +1,122 @@
+"""
+Integer permission masks of users.
+
+A user's mask is the mask of their built-in role (``constants.PERMISSION_BITS``)
+OR the masks of their custom roles. The custom ``Permission`` rows (those
+not named like a built-in permission) are numbered densely by codename: the
+n-th one is bit ``CUSTOM_PERMISSION_OFFSET + n``, so masks stay as short as
+the number of permissions. Adding or removing one renumbers the following
+bits: clients decode masks with the current ``bit_positions()``.
+
+The role masks, that codename order and the permission codes of each role
+are computed with two queries and cached; they are invalidated when role
+permissions or permissions change (``authentication.signals``) and
+otherwise expire after ``AUTH_USER_CACHE['permission_masks_ttl']`` seconds.
+"""
+import logging
+
+from django.core.cache import caches
+
+from .constants import CUSTOM_PERMISSION_OFFSET, PERMISSION_BITS, get_role_permission_mask, mask_permissions
+from .models import Permission, Role
+from .user_cache import get_user_cache_setting
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'auth_role_permission_masks'
+
+
+def _cache():
+    return caches[get_user_cache_setting('cache')]
+
+
+def custom_permission_bit(index):
+    return 1 << (CUSTOM_PERMISSION_OFFSET + index)
+
+
+def _compute_masks():
+    # Permission rows named like a built-in permission share its bit
+    all_codenames = dict(Permission.objects.values_list('pk', 'codename'))
+    custom = sorted(codename for codename in all_codenames.values() if codename not in PERMISSION_BITS)
+    indexes = {codename: index for index, codename in enumerate(custom)}
+    bits = {
+        permission_id: PERMISSION_BITS.get(codename) or custom_permission_bit(indexes[codename])
+        for permission_id, codename in all_codenames.items()
+    }
+    role_masks = {}
+    role_codes = {}
+    for role_id, permission_id in (
+        Role.permissions.through.objects.order_by('permission_id').values_list('role_id', 'permission_id')
+    ):
+        role_masks[role_id] = role_masks.get(role_id, 0) | bits[permission_id]
+        role_codes.setdefault(role_id, []).append(all_codenames[permission_id])
+    return {'roles': role_masks, 'custom': custom, 'role_codes': role_codes}
+
+
+def get_masks():
+    """
+    {'roles': {role_id: mask}, 'custom': [codename of each custom bit],
+    'role_codes': {role_id: [codename]}}
+    """
+    cache = _cache()
+    try:
+        masks = cache.get(CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"Permission mask cache unavailable: {e}")
+        return _compute_masks()
+    if masks is None or 'custom' not in masks:
+        masks = _compute_masks()
+        cache.set(CACHE_KEY, masks, timeout=get_user_cache_setting('permission_masks_ttl'))
+    return masks
+
+
+def get_role_permission_codes(role_id):
+    """Permission codenames of a custom role, from the cached map"""
+    return get_masks()['role_codes'].get(role_id, [])
+
+
+def invalidate_masks():
+    try:
+        _cache().delete(CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"Could not invalidate permission masks: {e}")
+
+
+def _role_ids(user):
+    if 'roles' in getattr(user, '_prefetched_objects_cache', {}):
+        return [role.pk for role in user.roles.all()]
+    return list(user.roles.values_list('pk', flat=True))
+
+
+def user_permission_mask(user):
+    """Mask of the user's built-in role and custom roles, memoized on the instance"""
+    mask = getattr(user, '_permission_mask', None)
+    if mask is None:
+        mask = get_role_permission_mask(user.role)
+        role_ids = _role_ids(user)
+        if role_ids:
+            role_masks = get_masks()['roles']
+            for role_id in role_ids:
+                mask |= role_masks.get(role_id, 0)
+        user._permission_mask = mask
+    return mask
+
+
+def mask_to_permissions(mask):
+    """Permission strings and custom permission codenames of a mask"""
+    permissions = mask_permissions(mask)
+    custom = mask >> CUSTOM_PERMISSION_OFFSET
+    if custom:
+        permissions.extend(
+            codename for index, codename in enumerate(get_masks()['custom'])
+            if custom >> index & 1
+        )
+    return permissions
+
+
+def bit_positions():
+    """{permission: bit position} for decoding masks on the client side"""
+    positions = {permission: bit.bit_length() - 1 for permission, bit in PERMISSION_BITS.items()}
+    for index, codename in enumerate(get_masks()['custom']):
+        positions[codename] = CUSTOM_PERMISSION_OFFSET + index
+    return positions
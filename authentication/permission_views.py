@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import Permission, Role
+from .permission_masks import bit_positions
 from .serializers import PermissionSerializer, RoleSerializer, RolePermissionSerializer
 
 
@@ -63,6 +64,18 @@ def permission_categories(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def permission_bits(request):
+    """
+    Get the bit position of each permission, to decode permission masks
+    """
+    return Response({
+        'success': True,
+        'data': bit_positions()
+    })
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def permissions_by_category(request):
@@ -0,0 +1,275 @@
+"""
+Diff-and-apply provisioning of permissions, roles and department permissions.
+
+Each ``sync_*`` function takes the desired state, reads the current state
+once, and writes only the differences with ``bulk_create``, ``bulk_update``
+and filtered deletes, so running it again changes nothing. Every function
+returns a ``Counter`` of created / updated / deleted / unchanged rows.
+
+Bulk writes send no model signals: the functions invalidate the permission
+masks and the cached users themselves (see ``authentication.signals``).
+"""
+import logging
+import time
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DepartmentPermission, Permission, Role, User
+from .permission_masks import invalidate_masks
+from .user_cache import bump_permissions_version
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+DEPARTMENT_PERMISSION_FLAGS = ('can_view', 'can_edit', 'can_create', 'can_delete')
+
+# Project permissions and roles, created after every migrate
+PROJECT_PERMISSIONS = [
+    {'name': 'View Projects', 'codename': 'view_project', 'description': 'Can view projects', 'category': 'projects'},
+    {'name': 'Create Projects', 'codename': 'add_project', 'description': 'Can create projects', 'category': 'projects'},
+    {'name': 'Edit Projects', 'codename': 'change_project', 'description': 'Can edit projects', 'category': 'projects'},
+    {'name': 'Delete Projects', 'codename': 'delete_project', 'description': 'Can delete projects', 'category': 'projects'},
+    {'name': 'View Tasks', 'codename': 'view_task', 'description': 'Can view tasks', 'category': 'tasks'},
+    {'name': 'Create Tasks', 'codename': 'add_task', 'description': 'Can create tasks', 'category': 'tasks'},
+    {'name': 'Edit Tasks', 'codename': 'change_task', 'description': 'Can edit tasks', 'category': 'tasks'},
+    {'name': 'Delete Tasks', 'codename': 'delete_task', 'description': 'Can delete tasks', 'category': 'tasks'},
+    {'name': 'View Calendar', 'codename': 'view_calendar', 'description': 'Can view calendar', 'category': 'projects'},
+    {'name': 'Manage Calendar', 'codename': 'manage_calendar', 'description': 'Can manage calendar', 'category': 'projects'},
+]
+
+PROJECT_ROLES = [
+    {
+        'name': 'PROJECT_MANAGER',
+        'description': 'Full access to projects, tasks, and calendar',
+        'is_system': True,
+        'permissions': [permission['codename'] for permission in PROJECT_PERMISSIONS],
+    },
+    {
+        'name': 'PROJECT_USER',
+        'description': 'View-only access to projects and tasks',
+        'is_system': True,
+        'permissions': ['view_project', 'view_task', 'view_calendar'],
+    },
+]
+
+
+class ProvisioningReport:
+    """Row counts and duration of each provisioning step"""
+
+    def __init__(self):
+        self.steps = []
+
+    def run(self, name, func, *args, **kwargs):
+        """Run a sync function as step `name`; returns its counts"""
+        start = time.perf_counter()
+        counts = func(*args, **kwargs)
+        self.steps.append((name, counts, time.perf_counter() - start))
+        return counts
+
+    @property
+    def total_seconds(self):
+        return sum(seconds for _, _, seconds in self.steps)
+
+    def lines(self):
+        width = max((len(name) for name, _, _ in self.steps), default=0)
+        for name, counts, seconds in self.steps:
+            yield (
+                f"{name:<{width}}  created {counts['created']}, updated {counts['updated']}, "
+                f"deleted {counts['deleted']}, unchanged {counts['unchanged']}  ({seconds * 1000:.1f} ms)"
+            )
+        yield f"{'total':<{width}}  {self.total_seconds * 1000:.1f} ms"
+
+    def write(self, stdout):
+        for line in self.lines():
+            stdout.write(line)
+
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _role_user_ids(role_ids):
+    return set(
+        User.roles.through.objects
+        .filter(role_id__in=role_ids)
+        .values_list('user_id', flat=True)
+    )
+
+
+@transaction.atomic
+def sync_permissions(permissions_data, update_existing=False):
+    """
+    Create the permissions of `permissions_data` missing by codename; with
+    `update_existing`, also align the name, description and category of the
+    existing ones
+    """
+    counts = Counter()
+    desired = {data['codename']: data for data in permissions_data}
+    existing = Permission.objects.in_bulk(list(desired), field_name='codename')
+
+    missing = [Permission(**data) for codename, data in desired.items() if codename not in existing]
+    Permission.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+    counts['created'] = len(missing)
+
+    changed = []
+    if update_existing:
+        fields = ['name', 'description', 'category']
+        for codename, permission in existing.items():
+            updates = {field: desired[codename][field] for field in fields if field in desired[codename]}
+            if any(getattr(permission, field) != value for field, value in updates.items()):
+                for field, value in updates.items():
+                    setattr(permission, field, value)
+                changed.append(permission)
+        if changed:
+            now = timezone.now()
+            for permission in changed:
+                permission.updated_at = now
+            Permission.objects.bulk_update(changed, [*fields, 'updated_at'], batch_size=BATCH_SIZE)
+    counts['updated'] = len(changed)
+    counts['unchanged'] = len(existing) - len(changed)
+
+    if missing or changed:
+        transaction.on_commit(invalidate_masks)
+    return counts
+
+
+@transaction.atomic
+def sync_roles(roles_data, reset_permissions=True):
+    """
+    Create the roles of `roles_data` missing by name and give them their
+    `permissions` codenames. With `reset_permissions`, the permissions of the
+    existing roles are made to match too; otherwise they are left as they are.
+    Counts are of roles; permission links added or removed count as updates.
+    """
+    counts = Counter()
+    desired = {data['name']: data for data in roles_data}
+    existing = Role.objects.in_bulk(list(desired), field_name='name')
+
+    missing = [
+        Role(**{key: value for key, value in data.items() if key != 'permissions'})
+        for name, data in desired.items() if name not in existing
+    ]
+    if missing:
+        Role.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+        # Primary keys are not returned by every backend (MySQL)
+        created = Role.objects.in_bulk([role.name for role in missing], field_name='name')
+    else:
+        created = {}
+    counts['created'] = len(created)
+
+    managed = {**created, **existing} if reset_permissions else created
+    codenames = {codename for name in managed for codename in desired[name].get('permissions', [])}
+    permission_ids = dict(Permission.objects.filter(codename__in=codenames).values_list('codename', 'id'))
+    unknown = codenames - set(permission_ids)
+    if unknown:
+        logger.warning(f"Unknown permissions skipped: {', '.join(sorted(unknown))}")
+
+    wanted = {
+        (role.pk, permission_ids[codename])
+        for name, role in managed.items()
+        for codename in desired[name].get('permissions', [])
+        if codename in permission_ids
+    }
+    through = Role.permissions.through
+    current = set(
+        through.objects
+        .filter(role_id__in=[role.pk for role in managed.values()])
+        .values_list('role_id', 'permission_id')
+    )
+    added, removed = wanted - current, current - wanted
+    through.objects.bulk_create(
+        [through(role_id=role_id, permission_id=permission_id) for role_id, permission_id in added],
+        batch_size=BATCH_SIZE,
+    )
+    for role_id in {role_id for role_id, _ in removed}:
+        through.objects.filter(
+            role_id=role_id,
+            permission_id__in=[permission_id for rid, permission_id in removed if rid == role_id],
+        ).delete()
+
+    changed_role_ids = {role_id for role_id, _ in added | removed} - {role.pk for role in created.values()}
+    counts['updated'] = len(changed_role_ids)
+    counts['unchanged'] = len(existing) - len(changed_role_ids)
+
+    if added or removed:
+        user_ids = _role_user_ids({role_id for role_id, _ in added | removed})
+        transaction.on_commit(invalidate_masks)
+        transaction.on_commit(lambda: bump_permissions_version(*user_ids))
+    return counts
+
+
+@transaction.atomic
+def sync_department_permissions(desired, overwrite=True, prune=False, user_ids=None):
+    """
+    Apply `desired`, {(user_id, department): {flag: bool}}, to the department
+    permissions of `user_ids` (the users of `desired` by default). Missing
+    rows are created; with `overwrite`, rows whose flags differ are updated
+    (otherwise kept as they are); with `prune`, the other rows of these users
+    are deleted.
+    """
+    counts = Counter()
+    user_ids = {user_id for user_id, _ in desired} if user_ids is None else set(user_ids)
+    existing = {}
+    for chunk in _chunks(user_ids):
+        for permission in DepartmentPermission.objects.filter(user_id__in=chunk):
+            existing[(permission.user_id, permission.department)] = permission
+
+    missing = []
+    changed = []
+    now = timezone.now()
+    for key, flags in desired.items():
+        permission = existing.get(key)
+        if permission is None:
+            missing.append(DepartmentPermission(user_id=key[0], department=key[1], **flags))
+        elif overwrite and any(getattr(permission, flag) != value for flag, value in flags.items()):
+            for flag, value in flags.items():
+                setattr(permission, flag, value)
+            permission.updated_at = now
+            changed.append(permission)
+    DepartmentPermission.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+    if changed:
+        DepartmentPermission.objects.bulk_update(
+            changed, [*DEPARTMENT_PERMISSION_FLAGS, 'updated_at'], batch_size=BATCH_SIZE
+        )
+
+    extra = [permission for key, permission in existing.items() if key not in desired] if prune else []
+    for chunk in _chunks(extra):
+        DepartmentPermission.objects.filter(pk__in=[permission.pk for permission in chunk]).delete()
+
+    counts['created'] = len(missing)
+    counts['updated'] = len(changed)
+    counts['deleted'] = len(extra)
+    counts['unchanged'] = len(existing) - len(changed) - len(extra)
+
+    touched = {permission.user_id for permission in missing + changed + extra}
+    if touched:
+        transaction.on_commit(lambda: bump_permissions_version(*touched))
+    return counts
+
+
+@transaction.atomic
+def sync_user_roles(role, users=None):
+    """Set the `role` field of `users` (every user by default), writing only the users that differ"""
+    counts = Counter()
+    users = User.objects.all() if users is None else users
+    changed = list(users.exclude(role=role).values_list('id', flat=True))
+    for chunk in _chunks(changed):
+        User.objects.filter(pk__in=chunk).update(role=role)
+    counts['updated'] = len(changed)
+    counts['unchanged'] = users.count() - len(changed)
+    if changed:
+        transaction.on_commit(lambda: bump_permissions_version(*changed))
+    return counts
+
+
+def provision_project_roles(report=None):
+    """Create the project permissions and the PROJECT_MANAGER / PROJECT_USER roles"""
+    report = report or ProvisioningReport()
+    report.run('permissions', sync_permissions, PROJECT_PERMISSIONS)
+    report.run('roles', sync_roles, PROJECT_ROLES)
+    return report
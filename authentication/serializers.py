@@ -1,9 +1,11 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from .models import User, Permission, Role, DepartmentPermission
+from .permission_masks import get_role_permission_codes, mask_to_permissions
+from .tokens import FilteredRefreshToken
 
 
 class PermissionSerializer(serializers.ModelSerializer):
@@ -30,12 +32,13 @@ class RoleSerializer(serializers.ModelSerializer):
         required=False
     )
     user_count = serializers.ReadOnlyField()
+    permission_count = serializers.ReadOnlyField()
     
     class Meta:
         model = Role
         fields = [
             'id', 'name', 'display_name', 'description', 'permissions', 'permission_ids',
-            'is_active', 'is_system', 'user_count', 'created_at', 'updated_at'
+            'is_active', 'is_system', 'user_count', 'permission_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'is_system', 'created_at', 'updated_at']
     
@@ -71,6 +74,7 @@ class UserSerializer(serializers.ModelSerializer):
     """
     full_name = serializers.ReadOnlyField()
     permissions = serializers.SerializerMethodField()
+    permission_mask = serializers.SerializerMethodField()
     roles = RoleSerializer(many=True, read_only=True)
     role_ids = serializers.ListField(
         child=serializers.IntegerField(),
@@ -87,22 +91,32 @@ class UserSerializer(serializers.ModelSerializer):
             'id', 'username', 'email', 'first_name', 'last_name', 'full_name',
             'role', 'status', 'avatar', 'phone', 'location', 'department', 
             'position', 'filiale', 'join_date', 'last_login', 'preferences', 
-            'permissions', 'roles', 'role_ids', 'created_at', 'updated_at',
+            'permissions', 'permission_mask', 'roles', 'role_ids', 'created_at', 'updated_at',
             'is_superuser', 'is_staff'
         ]
         read_only_fields = ['id', 'last_login', 'created_at', 'updated_at', 'is_superuser', 'is_staff']
     
+    def get_fields(self):
+        fields = super().get_fields()
+        # Lists only carry permission_mask, decoded by the client with
+        # /permissions/bits/; ?expand=permissions brings the list back
+        if isinstance(self.parent, serializers.ListSerializer) and not self.is_expanded('permissions'):
+            fields.pop('permissions', None)
+        return fields
+    
+    def is_expanded(self, field):
+        request = self.context.get('request')
+        if request is None:
+            return False
+        return field in request.query_params.get('expand', '').split(',')
+    
     def get_permissions(self, obj):
         """Get user permissions based on role and custom roles"""
-        # Get permissions from both the built-in role and custom roles
-        permissions = set(obj.get_permissions())
-        
-        # Add permissions from custom roles
-        for role in obj.roles.all():
-            for permission in role.permissions.all():
-                permissions.add(permission.codename)
-        
-        return list(permissions)
+        return mask_to_permissions(obj.get_permission_mask())
+    
+    def get_permission_mask(self, obj):
+        """Permission mask as a hex string (bit positions: /permissions/bits/)"""
+        return format(obj.get_permission_mask(), 'x')
     
     def update(self, instance, validated_data):
         """Update user with roles - with superuser protection"""
@@ -188,6 +202,28 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
+class RoleSummarySerializer(serializers.ModelSerializer):
+    """
+    Role reference with its permission codes (cached map) and no counts
+    """
+    permissions = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Role
+        fields = ['id', 'name', 'display_name', 'permissions']
+    
+    def get_permissions(self, obj):
+        return get_role_permission_codes(obj.pk)
+
+
+class LoginUserSerializer(UserSerializer):
+    """
+    User payload of the login response - roles without nested permissions.
+    Expects the user with `roles` prefetched.
+    """
+    roles = RoleSummarySerializer(many=True, read_only=True)
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """
     Serializer for user profile updates
@@ -215,6 +251,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     Custom JWT token serializer that includes user data
     """
     username_field = 'username'
+    token_class = FilteredRefreshToken
     
     def validate(self, attrs):
         """Validate credentials and return user with tokens"""
@@ -225,25 +262,13 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         if not username_or_email or not password:
             raise serializers.ValidationError('Username/email and password are required')
         
-        # Try to authenticate with username first, then email
+        # UsernameOrEmailBackend resolves either in a single lookup
         user = authenticate(
             request=self.context.get('request'),
             username=username_or_email,
             password=password
         )
         
-        if not user:
-            # Try with email
-            try:
-                user_obj = User.objects.get(email=username_or_email)
-                user = authenticate(
-                    request=self.context.get('request'),
-                    username=user_obj.username,
-                    password=password
-                )
-            except User.DoesNotExist:
-                pass
-        
         if not user:
             raise serializers.ValidationError('Invalid credentials')
         
@@ -270,11 +295,18 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['username'] = user.username
         token['email'] = user.email
         token['role'] = user.role
-        token['permissions'] = user.get_permissions()
+        token['perm_mask'] = format(user.get_permission_mask(), 'x')
         
         return token
 
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer checking the blacklist through the revocation filter
+    """
+    token_class = FilteredRefreshToken
+
+
 class ChangePasswordSerializer(serializers.Serializer):
     """
     Serializer for password change
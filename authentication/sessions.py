@@ -0,0 +1,178 @@
+"""
+Login session records written off the request path.
+
+The ``UserSession`` upsert of a login runs on a single background worker so
+that the login response does not wait for it. Set
+``LOGIN_SESSION_WRITE_ASYNC = False`` to write it inline instead.
+
+Request activity (last seen time and IP of each user) is buffered in memory
+by ``SessionActivityMiddleware`` and written to the sessions in bulk every
+``SESSION_ACTIVITY['flush_seconds']`` by a background thread, so requests
+never write. ``prune_stale_sessions`` (``manage.py prune_sessions``) expires
+sessions without activity.
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, DateTimeField, F, GenericIPAddressField, Value, When
+from django.utils import timezone
+
+from .models import UserSession
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_ACTIVITY_SETTINGS = {
+    'flush_seconds': 30,
+    'online_minutes': 5,
+    'stale_days': 7,
+    'retention_days': 90,
+}
+
+
+def get_session_activity_setting(name):
+    return getattr(settings, 'SESSION_ACTIVITY', {}).get(name, DEFAULT_SESSION_ACTIVITY_SETTINGS[name])
+
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='login-session')
+
+
+def write_login_session(user_id, ip_address, user_agent):
+    """Create or update the session record of a login"""
+    try:
+        UserSession.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                'session_key': f"jwt_{user_id}_{uuid.uuid4().hex[:8]}",
+                'ip_address': ip_address,
+                'user_agent': user_agent,
+                'is_active': True,
+            },
+        )
+    except Exception as e:
+        logger.error(f"Error creating user session: {e}")
+
+
+def _write_in_background(user_id, ip_address, user_agent):
+    try:
+        write_login_session(user_id, ip_address, user_agent)
+    finally:
+        connections.close_all()
+
+
+def record_login_session(user_id, ip_address, user_agent):
+    """Schedule the session write of a login (inline when async writes are off)"""
+    if not getattr(settings, 'LOGIN_SESSION_WRITE_ASYNC', True):
+        write_login_session(user_id, ip_address, user_agent)
+        return
+    _executor.submit(_write_in_background, user_id, ip_address, user_agent)
+
+
+def wait_for_session_writes(timeout=None):
+    """Block until the session writes scheduled so far are done"""
+    _executor.submit(lambda: None).result(timeout=timeout)
+
+
+def write_activity(entries, chunk_size=500):
+    """Write {user_id: (seen_at, ip_address)} to the active sessions, one UPDATE per chunk"""
+    user_ids = list(entries)
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        UserSession.objects.filter(user_id__in=chunk, is_active=True).update(
+            last_activity=Case(
+                *(When(user_id=user_id, then=Value(entries[user_id][0])) for user_id in chunk),
+                output_field=DateTimeField(),
+            ),
+            ip_address=Case(
+                *(
+                    When(user_id=user_id, then=Value(entries[user_id][1]))
+                    for user_id in chunk if entries[user_id][1]
+                ),
+                default=F('ip_address'),
+                output_field=GenericIPAddressField(),
+            ),
+        )
+
+
+class ActivityTracker:
+    """
+    Last seen time and IP per user, kept in memory and flushed in bulk by a
+    background thread
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.thread = None
+
+    def touch(self, user_id, ip_address):
+        with self.lock:
+            self.pending[user_id] = (timezone.now(), ip_address)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='session-activity', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(get_session_activity_setting('flush_seconds'))
+            try:
+                self.flush()
+            finally:
+                connections.close_all()
+
+    def flush(self):
+        """Write the buffered activity; returns the number of users written"""
+        with self.lock:
+            entries, self.pending = self.pending, {}
+        if not entries:
+            return 0
+        try:
+            write_activity(entries)
+        except Exception as e:
+            logger.error(f"Failed to write activity of {len(entries)} users: {e}")
+            # Keep it for the next flush unless newer activity was recorded
+            with self.lock:
+                for user_id, entry in entries.items():
+                    self.pending.setdefault(user_id, entry)
+            return 0
+        return len(entries)
+
+
+activity_tracker = ActivityTracker()
+atexit.register(activity_tracker.flush)
+
+
+def count_online_users(minutes=None):
+    """Users with an active session seen in the last `minutes`"""
+    minutes = minutes or get_session_activity_setting('online_minutes')
+    since = timezone.now() - timedelta(minutes=minutes)
+    return (
+        UserSession.objects
+        .filter(is_active=True, last_activity__gte=since)
+        .values('user_id').distinct().count()
+    )
+
+
+def prune_stale_sessions(stale_days=None, retention_days=None):
+    """
+    Deactivate sessions without activity for `stale_days`, delete inactive
+    sessions older than `retention_days`; returns (expired, deleted)
+    """
+    now = timezone.now()
+    stale_days = stale_days or get_session_activity_setting('stale_days')
+    retention_days = retention_days or get_session_activity_setting('retention_days')
+    expired = UserSession.objects.filter(
+        is_active=True, last_activity__lt=now - timedelta(days=stale_days)
+    ).update(is_active=False)
+    deleted, _ = UserSession.objects.filter(
+        is_active=False, last_activity__lt=now - timedelta(days=retention_days)
+    ).delete()
+    if expired or deleted:
+        logger.info(f"Sessions pruned: {expired} expired, {deleted} deleted")
+    return expired, deleted
@@ -1,6 +1,13 @@
-from django.db.models.signals import post_migrate
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
 from django.dispatch import receiver
-from .models import Role, Permission
+from .models import DepartmentPermission, Role, Permission, User
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .directory import invalidate_directory
+from .permission_masks import invalidate_masks
+from .provisioning import provision_project_roles
+from .token_revocation import token_revoked
+from .user_cache import bump_permissions_version
 
 
 @receiver(post_migrate)
@@ -13,50 +20,91 @@ def create_initial_roles(sender, **kwargs):
 def create_project_roles():
     """Create PROJECT_MANAGER and PROJECT_USER roles with permissions"""
     try:
-        # Create permissions
-        permissions_data = [
-            {'name': 'View Projects', 'codename': 'view_project', 'description': 'Can view projects', 'category': 'projects'},
-            {'name': 'Create Projects', 'codename': 'add_project', 'description': 'Can create projects', 'category': 'projects'},
-            {'name': 'Edit Projects', 'codename': 'change_project', 'description': 'Can edit projects', 'category': 'projects'},
-            {'name': 'Delete Projects', 'codename': 'delete_project', 'description': 'Can delete projects', 'category': 'projects'},
-            {'name': 'View Tasks', 'codename': 'view_task', 'description': 'Can view tasks', 'category': 'tasks'},
-            {'name': 'Create Tasks', 'codename': 'add_task', 'description': 'Can create tasks', 'category': 'tasks'},
-            {'name': 'Edit Tasks', 'codename': 'change_task', 'description': 'Can edit tasks', 'category': 'tasks'},
-            {'name': 'Delete Tasks', 'codename': 'delete_task', 'description': 'Can delete tasks', 'category': 'tasks'},
-            {'name': 'View Calendar', 'codename': 'view_calendar', 'description': 'Can view calendar', 'category': 'projects'},
-            {'name': 'Manage Calendar', 'codename': 'manage_calendar', 'description': 'Can manage calendar', 'category': 'projects'},
-        ]
-        
-        created_permissions = []
-        for perm_data in permissions_data:
-            permission, created = Permission.objects.get_or_create(
-                codename=perm_data['codename'],
-                defaults=perm_data
-            )
-            created_permissions.append(permission)
-        
-        # Create PROJECT_MANAGER role
-        manager_role, created = Role.objects.get_or_create(
-            name='PROJECT_MANAGER',
-            defaults={
-                'description': 'Full access to projects, tasks, and calendar',
-                'is_system': True
-            }
-        )
-        manager_role.permissions.set(created_permissions)
-        
-        # Create PROJECT_USER role
-        user_role, created = Role.objects.get_or_create(
-            name='PROJECT_USER',
-            defaults={
-                'description': 'View-only access to projects and tasks',
-                'is_system': True
-            }
-        )
-        view_permissions = [p for p in created_permissions if p.codename in ['view_project', 'view_task', 'view_calendar']]
-        user_role.permissions.set(view_permissions)
-        
-        print("✅ Roles and permissions created successfully!")
-        
+        report = provision_project_roles()
+        print(f"✅ Roles and permissions provisioned ({report.total_seconds * 1000:.1f} ms)")
     except Exception as e:
         print(f"❌ Error creating roles: {e}")
+
+
+# Cached authenticated users (authentication.user_cache): bump the
+# permissions version of every user whose role, status or permissions change.
+# Caches are invalidated once the transaction commits: a request served in
+# between would otherwise cache the rows from before the change again.
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    _bump_on_commit(instance.pk)
+    transaction.on_commit(invalidate_directory)
+
+
+@receiver([post_save, post_delete], sender=DepartmentPermission)
+def invalidate_department_permission_user(sender, instance, **kwargs):
+    _bump_on_commit(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def invalidate_user_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse and action.startswith('post_'):
+        _bump_on_commit(instance.pk)
+    elif reverse and action in ('post_add', 'post_remove'):
+        _bump_on_commit(*pk_set)
+    elif reverse and action == 'pre_clear':
+        # role.users.clear(): the users are only known before
+        _bump_on_commit(*_role_user_ids([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def invalidate_role_permission_users(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('post_'):
+        transaction.on_commit(invalidate_masks)
+    if not reverse and action.startswith('post_'):
+        role_ids = [instance.pk]
+    elif reverse and action in ('post_add', 'post_remove'):
+        role_ids = pk_set
+    elif reverse and action == 'pre_clear':
+        # permission.roles.clear(): the roles are only known before
+        role_ids = instance.roles.values_list('pk', flat=True)
+    else:
+        return
+    _bump_on_commit(*_role_user_ids(role_ids))
+
+
+@receiver(post_save, sender=Role)
+def invalidate_role_users(sender, instance, created, **kwargs):
+    if not created:
+        _bump_on_commit(*_role_user_ids([instance.pk]))
+
+
+@receiver(pre_delete, sender=Role)
+def invalidate_deleted_role_users(sender, instance, **kwargs):
+    _bump_on_commit(*_role_user_ids([instance.pk]))
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Role)
+@receiver(post_delete, sender=Permission)
+def invalidate_permission_masks(sender, **kwargs):
+    transaction.on_commit(invalidate_masks)
+
+
+@receiver(pre_delete, sender=Permission)
+def invalidate_deleted_permission_users(sender, instance, **kwargs):
+    _bump_on_commit(*_role_user_ids(instance.roles.values_list('pk', flat=True)))
+
+
+def _bump_on_commit(*user_ids):
+    # Evaluated now: on delete and clear, the rows are gone at commit
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: bump_permissions_version(*user_ids))
+
+
+def _role_user_ids(role_ids):
+    return User.objects.filter(roles__in=list(role_ids)).values_list('pk', flat=True).distinct()
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def record_token_revocation(sender, instance, created, **kwargs):
+    """Make a blacklisted refresh token fail the revocation filter at once"""
+    if created:
+        token_revoked(instance.token.jti)
@@ -1,3 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 
-# Create your tests here.
+from .serializers import CustomTokenRefreshSerializer
+from .token_revocation import VERSION_KEY, revocation_filter
+from .tokens import FilteredRefreshToken
+
+User = get_user_model()
+
+
+class RevokedTokenTests(TestCase):
+    """
+    Blacklisted refresh tokens are rejected, whether revoked by this process or another one
+    """
+
+    def setUp(self):
+        cache.clear()
+        revocation_filter.filter = None
+        self.user = User.objects.create_user(username='revoked', email='revoked@example.com', password='x')
+
+    def tearDown(self):
+        revocation_filter.filter = None
+
+    def test_valid_token_accepted(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        FilteredRefreshToken(str(token))
+
+    def test_blacklisted_token_rejected(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        # Filter already built: the blacklisting must reach it at once
+        FilteredRefreshToken(str(token))
+        token.blacklist()
+
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(token))
+
+    def test_token_revoked_by_another_process_rejected(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        FilteredRefreshToken(str(token))
+
+        # Another process: a blacklist row this process never saw, then the version bump
+        outstanding = OutstandingToken.objects.get(jti=token['jti'])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=outstanding)])
+        cache.set(VERSION_KEY, 'bumped-elsewhere', timeout=None)
+
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(token))
+
+    def test_unrevoked_token_skips_blacklist_query(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        FilteredRefreshToken(str(token))
+        with self.assertNumQueries(0):
+            FilteredRefreshToken(str(token))
+
+    def test_refresh_with_revoked_token_fails(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        token.blacklist()
+
+        serializer = CustomTokenRefreshSerializer(data={'refresh': str(token)})
+        with self.assertRaises(TokenError):
+            serializer.is_valid(raise_exception=True)
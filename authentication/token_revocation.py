@@ -0,0 +1,180 @@
+"""
+Refresh-token revocation checks without a query per refresh.
+
+Each process keeps a Bloom filter of the blacklisted token ids (jti). A token
+the filter has never seen is not blacklisted; only possible matches are
+checked against ``BlacklistedToken``. The filter is rebuilt from the table
+every ``rebuild_seconds``. A blacklisting bumps a version in the shared
+cache once committed; a process seeing a new version loads the rows added
+since its last load (an indexed id range) before checking, so revocations
+take effect immediately in every process sharing the cache.
+
+``prune_expired_tokens`` deletes expired outstanding tokens, and their
+blacklist rows, in batches (``manage.py prune_tokens``).
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_REVOCATION_SETTINGS = {
+    'cache': 'default',
+    'rebuild_seconds': 300,
+    'false_positive_rate': 0.001,
+    'prune_batch_size': 1000,
+}
+
+VERSION_KEY = 'token_revocation_version'
+
+# Incremental loads re-read this many ids below the last one seen, for rows
+# whose transaction committed after a higher id was already visible
+INCREMENTAL_OVERLAP = 100
+
+
+def get_revocation_setting(name):
+    return getattr(settings, 'TOKEN_REVOCATION', {}).get(name, DEFAULT_TOKEN_REVOCATION_SETTINGS[name])
+
+
+def _cache():
+    return caches[get_revocation_setting('cache')]
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter of strings: no false negatives, false positives
+    at about `false_positive_rate` once `capacity` keys are added
+    """
+
+    def __init__(self, capacity, false_positive_rate):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationFilter:
+    """Per-process Bloom filter of blacklisted token ids, kept current through the cache version"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.filter = None
+        self.last_id = 0
+        self.version = None
+        self.built_at = 0.0
+
+    def _current_version(self):
+        try:
+            cache = _cache()
+            version = cache.get(VERSION_KEY)
+            if version is None:
+                cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+                version = cache.get(VERSION_KEY)
+            return version
+        except Exception as e:
+            logger.warning(f"Token revocation version unavailable: {e}")
+            return None
+
+    def rebuild(self, version=None):
+        """Load every unexpired blacklisted token id"""
+        last_id = BlacklistedToken.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        jtis = list(
+            BlacklistedToken.objects
+            .filter(token__expires_at__gt=timezone.now())
+            .values_list('token__jti', flat=True)
+        )
+        # Headroom for the tokens blacklisted until the next rebuild
+        bloom = BloomFilter(max(2 * len(jtis), 1024), get_revocation_setting('false_positive_rate'))
+        for jti in jtis:
+            bloom.add(jti)
+        self.filter, self.last_id, self.version = bloom, last_id, version
+        self.built_at = time.monotonic()
+        logger.debug(f"Token revocation filter rebuilt with {len(jtis)} tokens")
+
+    def load_new(self, version):
+        """Add the tokens blacklisted since the last load"""
+        rows = list(
+            BlacklistedToken.objects
+            .filter(id__gt=self.last_id - INCREMENTAL_OVERLAP)
+            .values_list('id', 'token__jti')
+        )
+        for row_id, jti in rows:
+            self.filter.add(jti)
+            self.last_id = max(self.last_id, row_id)
+        self.version = version
+
+    def add(self, jti):
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+
+    def might_be_revoked(self, jti):
+        """False when the token is certainly not blacklisted"""
+        version = self._current_version()
+        with self.lock:
+            expired = time.monotonic() - self.built_at > get_revocation_setting('rebuild_seconds')
+            if self.filter is None or expired:
+                self.rebuild(version)
+            elif version is None or version != self.version:
+                self.load_new(version)
+            return jti in self.filter
+
+
+revocation_filter = RevocationFilter()
+
+
+def token_revoked(jti):
+    """Record a blacklisting: add it locally, bump the shared version once committed"""
+    revocation_filter.add(jti)
+
+    def bump():
+        try:
+            _cache().set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        except Exception as e:
+            logger.warning(f"Could not bump the token revocation version: {e}")
+
+    transaction.on_commit(bump)
+
+
+def prune_expired_tokens(batch_size=None, dry_run=False):
+    """Delete expired outstanding tokens (and their blacklist rows) in batches; returns the count"""
+    batch_size = batch_size or get_revocation_setting('prune_batch_size')
+    expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+    if dry_run:
+        return expired.count()
+
+    deleted = 0
+    while True:
+        ids = list(expired.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+    if deleted:
+        logger.info(f"Pruned {deleted} expired tokens")
+    return deleted
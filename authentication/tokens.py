@@ -0,0 +1,15 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .token_revocation import revocation_filter
+
+
+class FilteredRefreshToken(RefreshToken):
+    """
+    Refresh token whose blacklist check only queries the database for the
+    tokens the revocation filter cannot rule out
+    """
+
+    def check_blacklist(self):
+        if revocation_filter.might_be_revoked(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
@@ -27,11 +27,13 @@ urlpatterns = [
     path('users/<int:user_id>/roles/remove/', views.remove_roles_from_user, name='remove_roles_from_user'),
     path('users/statistics/', views.user_statistics, name='user_statistics'),
     path('users/recent/', views.recent_users, name='recent_users'),
+    path('users/directory/', views.user_directory, name='user_directory'),
     
     # Permission endpoints
     path('permissions/', permission_views.PermissionListCreateView.as_view(), name='permission_list'),
     path('permissions/<int:pk>/', permission_views.PermissionRetrieveUpdateDestroyView.as_view(), name='permission_detail'),
     path('permissions/categories/', permission_views.permission_categories, name='permission_categories'),
+    path('permissions/bits/', permission_views.permission_bits, name='permission_bits'),
     path('permissions/by-category/', permission_views.permissions_by_category, name='permissions_by_category'),
     path('permissions/bulk-create/', permission_views.bulk_create_permissions, name='bulk_create_permissions'),
     
@@ -0,0 +1,87 @@
+"""
+Short-lived shared cache of authenticated users.
+
+JWT-authenticated requests resolve their user from the cache instead of the
+database. An entry holds the user with roles and department permissions
+prefetched (role permissions come from ``authentication.permission_masks``),
+stamped with the user's permissions version; changing the user, their roles
+or their department permissions bumps the version (``authentication.signals``)
+and the next request reloads the row. Updates that send no signal
+(``QuerySet.update``) are picked up when the entry expires, after ``ttl``
+seconds.
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import User, user_roles_prefetch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_CACHE_SETTINGS = {
+    'cache': 'default',
+    'ttl': 10,
+    'permission_masks_ttl': 300,
+}
+
+
+def get_user_cache_setting(name):
+    return getattr(settings, 'AUTH_USER_CACHE', {}).get(name, DEFAULT_USER_CACHE_SETTINGS[name])
+
+
+def _cache():
+    return caches[get_user_cache_setting('cache')]
+
+
+def _user_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def _version_key(user_id):
+    return f'auth_user_version:{user_id}'
+
+
+def load_user(user_id):
+    """The user with the relations read by permission checks, from the database"""
+    return (
+        User.objects
+        .prefetch_related(user_roles_prefetch(), 'department_permissions')
+        .filter(pk=user_id)
+        .first()
+    )
+
+
+def get_user(user_id):
+    """The user `user_id` (None if it does not exist), from the cache when current"""
+    cache = _cache()
+    try:
+        found = cache.get_many([_user_key(user_id), _version_key(user_id)])
+    except Exception as e:
+        logger.warning(f"User cache unavailable: {e}")
+        return load_user(user_id)
+
+    version = found.get(_version_key(user_id))
+    entry = found.get(_user_key(user_id))
+    if version is not None and entry is not None and entry[0] == version:
+        return entry[1]
+
+    user = load_user(user_id)
+    if user is not None:
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(_version_key(user_id), version, timeout=None):
+                version = cache.get(_version_key(user_id))
+        cache.set(_user_key(user_id), (version, user), timeout=get_user_cache_setting('ttl'))
+    return user
+
+
+def bump_permissions_version(*user_ids):
+    """Invalidate the cached users `user_ids` (every worker sharing the cache)"""
+    if not user_ids:
+        return
+    try:
+        _cache().delete_many([_version_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.warning(f"Could not invalidate cached users {user_ids}: {e}")
@@ -1,22 +1,30 @@
-from rest_framework import status, generics, permissions, filters, viewsets
+from rest_framework import status, generics, permissions, filters, viewsets, serializers
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth import authenticate
 from django.utils import timezone
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Count, Q, prefetch_related_objects
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth.hashers import make_password
 import logging
 
-from .models import User, UserSession, Permission, Role, DepartmentPermission
+from .models import User, UserSession, Permission, Role, DepartmentPermission, DEPARTMENT_CHOICES, user_roles_prefetch
+from .permission_masks import invalidate_masks
+from .directory import get_index as get_directory_index
+from .sessions import count_online_users, record_login_session
+from .user_cache import bump_permissions_version
 from .serializers import (
     UserSerializer, 
+    LoginUserSerializer,
     UserRegistrationSerializer, 
     CustomTokenObtainPairSerializer,
+    CustomTokenRefreshSerializer,
     UserProfileSerializer,
     PermissionSerializer,
     RoleSerializer,
@@ -41,15 +49,19 @@ class CustomTokenObtainPairView(TokenObtainPairView):
             user = serializer.validated_data['user']
             tokens = serializer.validated_data['tokens']
             
-            # Update last login
+            # One UPDATE for last_login and last_login_ip; the session
+            # record is written in the background
+            ip_address = self._get_client_ip(request)
             user.last_login = timezone.now()
-            user.save(update_fields=['last_login'])
-            
-            # Create or update session
-            self._create_user_session(request, user)
+            user.last_login_ip = ip_address
+            User.objects.filter(pk=user.pk).update(
+                last_login=user.last_login, last_login_ip=ip_address
+            )
+            record_login_session(user.pk, ip_address, request.META.get('HTTP_USER_AGENT', ''))
             
             # Prepare response data
-            user_data = UserSerializer(user).data
+            prefetch_related_objects([user], 'roles')
+            user_data = LoginUserSerializer(user).data
             
             return Response({
                 'success': True,
@@ -64,33 +76,6 @@ class CustomTokenObtainPairView(TokenObtainPairView):
             'errors': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    def _create_user_session(self, request, user):
-        """Create or update user session"""
-        try:
-            ip_address = self._get_client_ip(request)
-            user_agent = request.META.get('HTTP_USER_AGENT', '')
-            
-            # Update last login IP
-            user.last_login_ip = ip_address
-            user.save(update_fields=['last_login_ip'])
-            
-            # Generate a unique session key for JWT sessions
-            import uuid
-            session_key = f"jwt_{user.id}_{uuid.uuid4().hex[:8]}"
-            
-            # Create or update session record
-            UserSession.objects.update_or_create(
-                user=user,
-                defaults={
-                    'session_key': session_key,
-                    'ip_address': ip_address,
-                    'user_agent': user_agent,
-                    'is_active': True
-                }
-            )
-        except Exception as e:
-            logger.error(f"Error creating user session: {e}")
-    
     def _get_client_ip(self, request):
         """Get client IP address"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -105,10 +90,22 @@ class CustomTokenRefreshView(TokenRefreshView):
     """
     Custom refresh token view
     """
+    serializer_class = CustomTokenRefreshSerializer
+
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         
-        if serializer.is_valid():
+        try:
+            valid = serializer.is_valid()
+        except TokenError as e:
+            # Expired, malformed or blacklisted refresh token
+            return Response({
+                'success': False,
+                'message': 'Invalid refresh token',
+                'errors': {'refresh': [str(e)]}
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        
+        if valid:
             return Response({
                 'success': True,
                 'message': 'Token refreshed successfully',
@@ -297,7 +294,7 @@ class UserListView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         """All authenticated users can see all users (for project team management)"""
-        return User.objects.all()
+        return User.objects.prefetch_related(user_roles_prefetch())
     
     def list(self, request, *args, **kwargs):
         """Check permissions before listing users"""
@@ -476,19 +473,38 @@ def user_statistics(request):
             'active_users': active_users,
             'inactive_users': inactive_users,
             'admin_users': admin_users,
-            'new_users': recent_users
+            'new_users': recent_users,
+            'online_users': count_online_users()
         }
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def user_directory(request):
+    """
+    Slim user list for team pickers: ?q= prefix search on names, ?limit=
+    """
+    query = request.query_params.get('q', '')
+    try:
+        limit = int(request.query_params.get('limit', 20 if query else 0))
+    except ValueError:
+        limit = 20
+    
+    return Response({
+        'success': True,
+        'data': get_directory_index().search(query, limit=max(limit, 0) or None)
+    })
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def recent_users(request):
     """
     Get recent users for dashboard
     """
-    users = User.objects.order_by('-created_at')[:5]
-    serializer = UserSerializer(users, many=True)
+    users = User.objects.prefetch_related(user_roles_prefetch()).order_by('-created_at')[:5]
+    serializer = UserSerializer(users, many=True, context={'request': request})
     
     return Response({
         'success': True,
@@ -504,7 +520,7 @@ def user_roles(request, user_id):
     """
     try:
         user = User.objects.get(id=user_id)
-        roles = user.roles.all()
+        roles = user.roles.for_serialization()
         serializer = RoleSerializer(roles, many=True)
         
         return Response({
@@ -585,7 +601,7 @@ class RoleListCreateView(generics.ListCreateAPIView):
     """
     List all roles or create a new role
     """
-    queryset = Role.objects.all()
+    queryset = Role.objects.for_serialization()
     serializer_class = RoleSerializer
     permission_classes = [permissions.AllowAny]  # Temporaire pour les tests
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -599,10 +615,15 @@ class RoleDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a role
     """
-    queryset = Role.objects.all()
+    queryset = Role.objects.for_serialization()
     serializer_class = RoleSerializer
     permission_classes = [permissions.AllowAny]  # Temporaire pour les tests
     
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        # The counts were annotated before the update: reload them for the response
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+    
     def destroy(self, request, *args, **kwargs):
         """
         Prevent deletion of system roles
@@ -680,8 +701,8 @@ def role_users(request, pk):
     """
     try:
         role = Role.objects.get(pk=pk)
-        users = User.objects.filter(role=role.name)
-        serializer = UserSerializer(users, many=True)
+        users = User.objects.filter(role=role.name).prefetch_related(user_roles_prefetch())
+        serializer = UserSerializer(users, many=True, context={'request': request})
         
         return Response({
             'success': True,
@@ -777,15 +798,25 @@ def role_statistics(request):
     """
     Get role statistics
     """
-    total_roles = Role.objects.count()
-    active_roles = Role.objects.filter(is_active=True).count()
+    counts = Role.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        system=Count('id', filter=Q(is_system=True)),
+    )
+    total_roles = counts['total']
+    active_roles = counts['active']
     inactive_roles = total_roles - active_roles
-    system_roles = Role.objects.filter(is_system=True).count()
+    system_roles = counts['system']
     
-    # Count users by role
-    role_counts = {}
-    for role in Role.objects.all():
-        role_counts[role.name] = User.objects.filter(role=role.name).count()
+    # Count users by role (built-in role field named like the role)
+    role_names = list(Role.objects.values_list('name', flat=True))
+    role_counts = dict.fromkeys(role_names, 0)
+    role_counts.update(
+        User.objects.filter(role__in=role_names)
+        .values_list('role')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
     
     return Response({
         'success': True,
@@ -816,18 +847,32 @@ def clone_role(request, pk):
                 'message': 'name is required for cloned role'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create new role
-        new_role = Role.objects.create(
-            name=new_name,
-            description=new_description,
-            is_active=True,
-            is_system=False
-        )
+        if Role.objects.filter(name=new_name).exists():
+            return Response({
+                'success': False,
+                'message': f'A role named {new_name} already exists'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Copy permissions
-        new_role.permissions.set(original_role.permissions.all())
+        with transaction.atomic():
+            # Create new role
+            new_role = Role.objects.create(
+                name=new_name,
+                description=new_description,
+                is_active=True,
+                is_system=False
+            )
+            
+            # Copy permissions with one bulk insert (no m2m_changed signal:
+            # the new role has no users, only the role masks need a refresh)
+            RolePermission = Role.permissions.through
+            RolePermission.objects.bulk_create([
+                RolePermission(role_id=new_role.pk, permission_id=permission_id)
+                for permission_id in RolePermission.objects.filter(role_id=original_role.pk)
+                .values_list('permission_id', flat=True)
+            ])
+        invalidate_masks()
         
-        serializer = RoleSerializer(new_role)
+        serializer = RoleSerializer(Role.objects.for_serialization().get(pk=new_role.pk))
         return Response({
             'success': True,
             'data': serializer.data,
@@ -859,14 +904,51 @@ class DepartmentPermissionViewSet(viewsets.ModelViewSet):
             return DepartmentPermission.objects.filter(user_id=user_id)
         return DepartmentPermission.objects.all()
     
+    # Flags of a department permission; in the grid layout each cell is a
+    # bit mask of them (view=1, edit=2, create=4, delete=8)
+    PERMISSION_FLAGS = ['can_view', 'can_edit', 'can_create', 'can_delete']
+    
     @action(detail=False, methods=['get'])
     def by_user(self, request):
         """
         Get all users with their department permissions
+        
+        ?layout=grid returns a compact user x department matrix instead:
+        one row per user, one cell per department (flag mask, or null
+        without an explicit permission).
         """
-        users = User.objects.filter(is_superuser=False).order_by('username')
-        serializer = UserDepartmentPermissionsSerializer(users, many=True)
-        return Response(serializer.data)
+        users = (
+            User.objects.filter(is_superuser=False)
+            .prefetch_related('department_permissions')
+            .order_by('username')
+        )
+        if request.query_params.get('layout') != 'grid':
+            serializer = UserDepartmentPermissionsSerializer(users, many=True)
+            return Response(serializer.data)
+        
+        departments = [choice[0] for choice in DEPARTMENT_CHOICES]
+        columns = {department: index for index, department in enumerate(departments)}
+        rows = []
+        for user in users:
+            cells = [None] * len(departments)
+            for perm in user.department_permissions.all():
+                if perm.department in columns:
+                    cells[columns[perm.department]] = sum(
+                        1 << bit for bit, flag in enumerate(self.PERMISSION_FLAGS) if getattr(perm, flag)
+                    )
+            rows.append({
+                'id': user.id,
+                'username': user.username,
+                'full_name': user.get_full_name(),
+                'department': user.department,
+                'role': user.role,
+                'permissions': cells,
+            })
+        return Response({
+            'departments': departments,
+            'flags': self.PERMISSION_FLAGS,
+            'users': rows,
+        })
     
     @action(detail=False, methods=['post'])
     def bulk_update(self, request):
@@ -884,17 +966,49 @@ class DepartmentPermissionViewSet(viewsets.ModelViewSet):
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Update or create permissions for each department
+        departments = {choice[0] for choice in DEPARTMENT_CHOICES}
+        if not isinstance(permissions, dict):
+            return Response({'error': 'permissions must map departments to flags'}, status=status.HTTP_400_BAD_REQUEST)
+        invalid = [
+            department for department, perms in permissions.items()
+            if department not in departments or not isinstance(perms, dict)
+            or any(key not in self.PERMISSION_FLAGS for key in perms)
+        ]
+        if invalid:
+            return Response({'error': f"Invalid permissions for: {', '.join(map(str, invalid))}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Same coercion as the model field ("false" is False), invalid values rejected
+        flag_field = serializers.BooleanField()
+        try:
+            permissions = {
+                department: {key: flag_field.to_internal_value(value) for key, value in perms.items()}
+                for department, perms in permissions.items()
+            }
+        except serializers.ValidationError:
+            return Response({'error': 'Permission flags must be booleans'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Upsert: one INSERT ... ON CONFLICT/ON DUPLICATE KEY UPDATE per set of
+        # given flags (usually one); flags left out keep their current value,
+        # or the model default for new rows
+        groups = {}
         for department, perms in permissions.items():
-            permission, created = DepartmentPermission.objects.get_or_create(
-                user=user,
-                department=department,
-                defaults=perms
+            groups.setdefault(tuple(sorted(perms)), []).append(
+                DepartmentPermission(user=user, department=department, **perms)
             )
-            if not created:
-                for key, value in perms.items():
-                    setattr(permission, key, value)
-                permission.save()
+        conflict_target = (
+            {'unique_fields': ['user', 'department']}
+            if connection.features.supports_update_conflicts_with_target else {}
+        )
+        with transaction.atomic():
+            for flags, objs in groups.items():
+                if flags:
+                    DepartmentPermission.objects.bulk_create(
+                        objs, update_conflicts=True, update_fields=[*flags, 'updated_at'], **conflict_target
+                    )
+                else:
+                    DepartmentPermission.objects.bulk_create(objs, ignore_conflicts=True)
+        # bulk_create sends no signal: drop the cached user here
+        bump_permissions_version(user.pk)
         
         # Return updated permissions
         user_permissions = DepartmentPermission.objects.filter(user=user)
@@ -0,0 +1,344 @@
+"""
+Livraison des notifications: délais de relance, disjoncteur SMTP, pool de
+workers et files de priorité
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from queue import Empty, Queue
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import EmailNotification
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELIVERY_SETTINGS = {
+    'workers': 4,                       # Envois SMTP en parallèle
+    'retry_base_seconds': 60,           # Délai avant la première relance
+    'retry_max_seconds': 6 * 60 * 60,   # Plafond du délai de relance
+    'breaker_threshold': 5,             # Échecs consécutifs avant coupure
+    'breaker_cooldown_seconds': 300,    # Durée de la coupure
+    # Files par priorité: poids dans l'ordonnancement et envois simultanés maximum
+    'lanes': {
+        'urgent': {'weight': 8, 'concurrency': 4},
+        'high': {'weight': 4, 'concurrency': 3},
+        'medium': {'weight': 2, 'concurrency': 2},
+        'low': {'weight': 1, 'concurrency': 1},
+    },
+    'lane_batch_size': 50,              # Notifications chargées par poids et par passage
+    'claim_lease_seconds': 300,         # Durée de réservation d'une notification en cours d'envoi
+    # Les files ne reprennent que les notifications en attente récentes (ou
+    # créées après `pending_since`); les notifications programmées
+    # explicitement (send_immediately=False) sont toujours reprises
+    'pending_max_age_seconds': 24 * 60 * 60,
+    'pending_since': None,
+}
+
+
+def get_delivery_setting(name: str):
+    """Lire un paramètre de livraison (settings.NOTIFICATION_DELIVERY ou défaut)"""
+    return getattr(settings, 'NOTIFICATION_DELIVERY', {}).get(name, DEFAULT_DELIVERY_SETTINGS[name])
+
+
+def claim_lease() -> timedelta:
+    """Durée de réservation d'une notification pendant son envoi"""
+    return timedelta(seconds=get_delivery_setting('claim_lease_seconds'))
+
+
+def dispatchable(queryset, now=None):
+    """
+    Restreindre les notifications en attente à celles que les files peuvent
+    reprendre: programmées explicitement, ou créées après la borne
+    (`pending_since`, sinon `pending_max_age_seconds`). Les notifications en
+    attente plus anciennes, laissées par d'anciennes versions, ne sont pas
+    envoyées en masse.
+    """
+    now = now or timezone.now()
+    since = get_delivery_setting('pending_since')
+    if isinstance(since, str):
+        since = parse_datetime(since)
+    if since is None:
+        since = now - timedelta(seconds=get_delivery_setting('pending_max_age_seconds'))
+    queued = Q(send_immediately=False, scheduled_send_time__isnull=False)
+    return queryset.filter(queued | Q(created_at__gte=since))
+
+
+def compute_retry_delay(attempt: int) -> timedelta:
+    """
+    Délai avant la relance numéro `attempt` (1, 2, ...): backoff exponentiel
+    plafonné, avec une gigue pour étaler les relances après une panne
+    """
+    base = get_delivery_setting('retry_base_seconds')
+    ceiling = get_delivery_setting('retry_max_seconds')
+    delay = min(ceiling, base * 2 ** max(0, attempt - 1))
+    # Gigue « égale »: au moins la moitié du délai, au plus le délai complet
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+class SMTPCircuitBreaker:
+    """
+    Disjoncteur du relais SMTP
+
+    Après `threshold` échecs consécutifs, les envois sont suspendus pendant
+    `cooldown` secondes. À la réouverture, un seul échec suffit à recouper
+    (état semi-ouvert) jusqu'au premier succès. L'état est stocké dans le
+    cache Django: il est partagé entre processus si le cache l'est.
+    """
+
+    FAILURES_KEY = 'notifications:smtp_breaker:failures'
+    OPEN_KEY = 'notifications:smtp_breaker:open'
+
+    def __init__(self):
+        self.logger = logger
+        self.threshold = get_delivery_setting('breaker_threshold')
+        self.cooldown = get_delivery_setting('breaker_cooldown_seconds')
+
+    def is_open(self) -> bool:
+        """Vérifier si les envois sont suspendus"""
+        return cache.get(self.OPEN_KEY) is not None
+
+    def record_success(self):
+        """Un envoi a réussi: remettre le compteur à zéro"""
+        cache.delete(self.FAILURES_KEY)
+
+    def record_failure(self):
+        """Un envoi a échoué: couper si le seuil est atteint"""
+        cache.add(self.FAILURES_KEY, 0, None)
+        try:
+            failures = cache.incr(self.FAILURES_KEY)
+        except ValueError:
+            # Clé expirée entre add et incr
+            cache.set(self.FAILURES_KEY, 1, None)
+            failures = 1
+
+        if failures >= self.threshold:
+            cache.set(self.OPEN_KEY, True, self.cooldown)
+            # Semi-ouvert après la coupure: le prochain échec recoupe aussitôt
+            cache.set(self.FAILURES_KEY, self.threshold - 1, None)
+            self.logger.error(
+                f"Relais SMTP indisponible après {failures} échecs, "
+                f"envois suspendus pendant {self.cooldown} s"
+            )
+
+    def retry_after(self) -> timedelta:
+        """Délai à appliquer aux notifications différées par la coupure"""
+        return timedelta(seconds=self.cooldown)
+
+
+class DeliveryPool:
+    """
+    Pool de workers qui envoient des notifications en parallèle
+
+    Chaque worker consomme une file partagée puis ferme ses connexions à la
+    base en sortant. Dès que le disjoncteur s'ouvre, les notifications
+    restantes ne sont plus tentées.
+    """
+
+    def __init__(self, max_workers: int = None, breaker: SMTPCircuitBreaker = None):
+        self.logger = logger
+        self.max_workers = max_workers or get_delivery_setting('workers')
+        self.breaker = breaker or SMTPCircuitBreaker()
+
+    def deliver(self, notification_ids: Iterable[int], send: Callable[[int], bool]) -> Dict[str, int]:
+        """
+        Envoyer chaque notification avec `send` et compter les résultats
+        """
+        queue = Queue()
+        for notification_id in notification_ids:
+            queue.put(notification_id)
+
+        results = {'success': 0, 'failed': 0, 'deferred': 0}
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        notification_id = queue.get_nowait()
+                    except Empty:
+                        return
+                    if self.breaker.is_open():
+                        outcome = 'deferred'
+                    else:
+                        try:
+                            outcome = 'success' if send(notification_id) else 'failed'
+                        except Exception as e:
+                            self.logger.error(f"Erreur worker pour la notification {notification_id}: {str(e)}")
+                            outcome = 'failed'
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connections.close_all()
+
+        workers = min(self.max_workers, queue.qsize())
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notification-delivery') as executor:
+                for _ in range(workers):
+                    executor.submit(worker)
+
+        return results
+
+
+class _Lane:
+    """File d'une priorité: notifications à envoyer et envois en cours"""
+
+    def __init__(self, name: str, weight: int, concurrency: int, items: List[Tuple[int, object]]):
+        self.name = name
+        self.weight = weight
+        self.concurrency = concurrency
+        self.items = deque(items)
+        self.in_flight = 0
+        self.current_weight = 0
+        self.stats = {'success': 0, 'failed': 0, 'deferred': 0, 'max_wait_seconds': 0}
+
+
+class PriorityLaneDispatcher:
+    """
+    Envoi des notifications en attente par files de priorité
+
+    Les workers choisissent la prochaine file par round-robin pondéré lissé
+    parmi les files non vides qui n'ont pas atteint leur limite d'envois
+    simultanés: un afflux de notifications « low » n'occupe jamais plus que
+    sa limite de workers et ne retarde pas les notifications urgentes.
+    """
+
+    def __init__(self, max_workers: int = None, breaker: SMTPCircuitBreaker = None):
+        self.logger = logger
+        self.max_workers = max_workers or get_delivery_setting('workers')
+        self.breaker = breaker or SMTPCircuitBreaker()
+        self.lane_config = get_delivery_setting('lanes')
+        self.batch_size = get_delivery_setting('lane_batch_size')
+
+    def load_lanes(self, now=None) -> List[_Lane]:
+        """
+        Charger les notifications prêtes de chaque file (une requête par file,
+        servie par l'index (priority, status)), plus anciennes d'abord.
+        Chaque envoi réserve sa notification (voir `EmailNotification.objects.claim`):
+        une notification déjà prise par un autre envoi est ignorée.
+        """
+        now = now or timezone.now()
+        lanes = []
+        for name, config in self.lane_config.items():
+            ready = (
+                EmailNotification.objects
+                .filter(priority=name, status='pending', digest=False)
+                .filter(Q(scheduled_send_time__isnull=True) | Q(scheduled_send_time__lte=now))
+            )
+            items = list(
+                dispatchable(ready, now)
+                .order_by('created_at')
+                .values_list('id', 'created_at')[:self.batch_size * config['weight']]
+            )
+            lanes.append(_Lane(name, config['weight'], config['concurrency'], items))
+        return lanes
+
+    def dispatch(self, send: Callable[[int], bool], lanes: List[_Lane] = None) -> Dict[str, Dict]:
+        """
+        Envoyer les notifications des files avec `send` et retourner les
+        résultats par file
+        """
+        lanes = lanes if lanes is not None else self.load_lanes()
+        condition = threading.Condition()
+
+        def next_item():
+            """Choisir la prochaine notification (round-robin pondéré lissé)"""
+            with condition:
+                while True:
+                    ready = [lane for lane in lanes if lane.items and lane.in_flight < lane.concurrency]
+                    if ready:
+                        total = sum(lane.weight for lane in ready)
+                        for lane in ready:
+                            lane.current_weight += lane.weight
+                        lane = max(ready, key=lambda candidate: candidate.current_weight)
+                        lane.current_weight -= total
+                        lane.in_flight += 1
+                        return lane, lane.items.popleft()
+                    if not any(lane.items for lane in lanes):
+                        return None, None
+                    # Files restantes à leur limite: attendre la fin d'un envoi
+                    condition.wait()
+
+        def worker():
+            try:
+                while True:
+                    lane, item = next_item()
+                    if lane is None:
+                        return
+                    notification_id, created_at = item
+                    wait = (timezone.now() - created_at).total_seconds()
+                    if self.breaker.is_open():
+                        outcome = 'deferred'
+                    else:
+                        try:
+                            outcome = 'success' if send(notification_id) else 'failed'
+                        except Exception as e:
+                            self.logger.error(f"Erreur worker pour la notification {notification_id}: {str(e)}")
+                            outcome = 'failed'
+                    with condition:
+                        lane.in_flight -= 1
+                        lane.stats[outcome] += 1
+                        lane.stats['max_wait_seconds'] = max(lane.stats['max_wait_seconds'], int(wait))
+                        condition.notify_all()
+            finally:
+                connections.close_all()
+
+        started = time.monotonic()
+        pending = sum(len(lane.items) for lane in lanes)
+        workers = min(self.max_workers, pending)
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notification-lane') as executor:
+                for _ in range(workers):
+                    executor.submit(worker)
+
+        results = {lane.name: lane.stats for lane in lanes}
+        if pending:
+            self.logger.info(
+                f"Files de priorité: {pending} notifications traitées en "
+                f"{time.monotonic() - started:.1f} s"
+            )
+        return results
+
+
+def get_lane_stats(now=None) -> Dict[str, Dict]:
+    """
+    Profondeur et attente par file de priorité: notifications en attente,
+    ancienneté de la plus ancienne, attente moyenne des envois de la dernière heure
+    """
+    now = now or timezone.now()
+    stats = {
+        name: {'depth': 0, 'oldest_wait_seconds': 0, 'avg_wait_seconds_last_hour': None}
+        for name in get_delivery_setting('lanes')
+    }
+
+    pending = (
+        dispatchable(EmailNotification.objects.filter(status='pending', digest=False), now)
+        .values('priority')
+        .annotate(depth=Count('id'), oldest=Min('created_at'))
+    )
+    for row in pending:
+        if row['priority'] in stats:
+            stats[row['priority']]['depth'] = row['depth']
+            stats[row['priority']]['oldest_wait_seconds'] = int((now - row['oldest']).total_seconds())
+
+    sent = (
+        EmailNotification.objects
+        .filter(sent_at__gte=now - timedelta(hours=1), digest=False)
+        .values('priority')
+        .annotate(avg_wait=Avg(ExpressionWrapper(F('sent_at') - F('created_at'), output_field=DurationField())))
+    )
+    for row in sent:
+        if row['priority'] in stats and row['avg_wait'] is not None:
+            stats[row['priority']]['avg_wait_seconds_last_hour'] = round(row['avg_wait'].total_seconds(), 1)
+
+    return stats
@@ -0,0 +1,199 @@
+"""
+Service de résumés (digest) des notifications par destinataire
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .delivery import compute_retry_delay
+from .models import EmailNotification, EmailLog
+
+logger = logging.getLogger(__name__)
+
+# Clé de User.preferences contenant le mode de résumé ('hourly', 'daily', ...)
+DIGEST_PREFERENCE_KEY = 'notification_digest'
+
+# Fenêtres de regroupement par défaut, en minutes
+DEFAULT_DIGEST_WINDOWS = {
+    'hourly': 60,
+    'daily': 24 * 60,
+}
+
+
+class NotificationDigestService:
+    """
+    Service pour regrouper les notifications en attente d'un destinataire
+    en un seul email envoyé à la fin de sa fenêtre de résumé
+    """
+
+    # Les notifications urgentes ne sont jamais différées
+    IMMEDIATE_PRIORITIES = ['urgent']
+
+    def __init__(self):
+        self.logger = logger
+        self.windows = getattr(settings, 'NOTIFICATION_DIGEST_WINDOWS', DEFAULT_DIGEST_WINDOWS)
+
+    def get_digest_mode(self, user) -> Optional[str]:
+        """
+        Obtenir le mode de résumé choisi par l'utilisateur (None = envoi individuel)
+        """
+        preferences = getattr(user, 'preferences', None) or {}
+        mode = preferences.get(DIGEST_PREFERENCE_KEY)
+        return mode if mode in self.windows else None
+
+    def get_window(self, user) -> Optional[timedelta]:
+        """
+        Obtenir la fenêtre de regroupement de l'utilisateur
+        """
+        mode = self.get_digest_mode(user)
+        if not mode:
+            return None
+        return timedelta(minutes=self.windows[mode])
+
+    def should_defer(self, recipient, priority: str) -> bool:
+        """
+        Vérifier si une notification doit être regroupée dans le prochain résumé
+        """
+        if priority in self.IMMEDIATE_PRIORITIES:
+            return False
+        return self.get_digest_mode(recipient) is not None
+
+    def flush_digests(self, now=None, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Envoyer un résumé à chaque destinataire dont la fenêtre est écoulée
+        """
+        now = now or timezone.now()
+        results = {'digests_sent': 0, 'notifications_grouped': 0, 'failed': 0, 'waiting': 0}
+
+        # Une seule requête pour toutes les notifications en attente de résumé,
+        # triées par destinataire pour pouvoir les regrouper en flux
+        pending = (
+            EmailNotification.objects
+            .filter(status='pending', digest=True)
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .select_related('recipient')
+            .order_by('recipient_id', 'created_at')
+        )
+
+        for _, group in groupby(pending.iterator(), key=lambda n: n.recipient_id):
+            notifications = list(group)
+            recipient = notifications[0].recipient
+            window = self.get_window(recipient)
+
+            # Fenêtre pas encore écoulée pour la plus ancienne notification
+            # (si l'utilisateur a quitté le mode résumé, on envoie tout de suite)
+            if window and notifications[0].created_at > now - window:
+                results['waiting'] += len(notifications)
+                continue
+
+            if dry_run:
+                results['digests_sent'] += 1
+                results['notifications_grouped'] += len(notifications)
+                continue
+
+            if self._send_digest(recipient, notifications, now):
+                results['digests_sent'] += 1
+                results['notifications_grouped'] += len(notifications)
+            else:
+                results['failed'] += 1
+
+        self.logger.info(
+            f"Résumés envoyés: {results['digests_sent']} "
+            f"({results['notifications_grouped']} notifications regroupées)"
+        )
+        return results
+
+    def _send_digest(self, recipient, notifications: List[EmailNotification], now) -> bool:
+        """
+        Rendre et envoyer un résumé, puis marquer les notifications regroupées en masse
+        """
+        from .local_domain_service import LocalDomainNotificationService
+
+        ids = [notification.id for notification in notifications]
+        subject = f"[GHP PORTAIL] Résumé de vos notifications ({len(notifications)})"
+        context = {
+            'recipient': recipient,
+            'notifications': notifications,
+            'count': len(notifications),
+            'site_url': getattr(settings, 'SITE_URL', 'http://localhost:8000'),
+            'company_name': 'Groupe Hydrapharm',
+        }
+
+        try:
+            html_body = render_to_string('notifications/emails/digest.html', context)
+            body = self._render_text(notifications)
+
+            result = LocalDomainNotificationService().send_notification_local_only(
+                recipient_list=[recipient.email],
+                subject=subject,
+                body=body,
+                html_body=html_body,
+                from_email=settings.DEFAULT_FROM_EMAIL
+            )
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        if result['success']:
+            EmailNotification.objects.filter(id__in=ids).update(status='sent', sent_at=now)
+            action, details = 'sent', f"Envoyé dans un résumé de {len(ids)} notifications"
+            self.logger.info(f"Résumé envoyé à {recipient.email}: {len(ids)} notifications")
+        else:
+            self._mark_failed(notifications, result.get('error') or "Échec de l'envoi du résumé", now)
+            action, details = 'digest_failed', f"Échec du résumé: {result.get('error')}"
+            self.logger.error(f"Échec du résumé pour {recipient.email}: {result.get('error')}")
+
+        EmailLog.objects.bulk_create([
+            EmailLog(notification_id=notification_id, action=action, details=details)
+            for notification_id in ids
+        ])
+        return result['success']
+
+    def _mark_failed(self, notifications: List[EmailNotification], error_message: str, now):
+        """
+        Compter une tentative: comme pour les relances, les notifications
+        restent en attente du prochain résumé après un délai croissant, puis
+        passent en échec une fois max_retries atteint
+        """
+        exhausted = []
+        retrying = defaultdict(list)
+        for notification in notifications:
+            attempt = notification.retry_count + 1
+            if attempt >= notification.max_retries:
+                exhausted.append(notification.id)
+            else:
+                retrying[attempt].append(notification.id)
+
+        if exhausted:
+            EmailNotification.objects.filter(id__in=exhausted).update(
+                status='failed',
+                error_message=error_message,
+                retry_count=F('retry_count') + 1,
+                next_attempt_at=None
+            )
+            self.logger.error(f"{len(exhausted)} notifications passées en échec: tentatives de résumé épuisées")
+        for attempt, ids in retrying.items():
+            EmailNotification.objects.filter(id__in=ids).update(
+                error_message=error_message,
+                retry_count=F('retry_count') + 1,
+                next_attempt_at=now + compute_retry_delay(attempt)
+            )
+
+    def _render_text(self, notifications: List[EmailNotification]) -> str:
+        """
+        Version texte du résumé
+        """
+        lines = [f"Vous avez {len(notifications)} notifications en attente:", ""]
+        for notification in notifications:
+            lines.append(
+                f"• [{notification.created_at.strftime('%d/%m/%Y %H:%M')}] {notification.subject}"
+            )
+        lines.extend(["", "Consultez le portail GHP pour plus de détails."])
+        return '\n'.join(lines)
+
@@ -0,0 +1,112 @@
+"""
+Boîte de réception in-app et compteurs de notifications non lues
+"""
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, List
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import InAppNotification
+
+logger = logging.getLogger(__name__)
+
+# Durée de vie d'un compteur en cache (recalculé depuis la base à l'expiration)
+UNREAD_COUNTER_TIMEOUT = 24 * 60 * 60
+
+
+class InboxService:
+    """
+    Service pour la boîte de réception in-app
+
+    Le nombre de notifications non lues de chaque utilisateur est conservé en
+    cache et mis à jour par incréments à l'insertion et à la lecture: le badge
+    du frontend se résume à une lecture de clé.
+    """
+
+    def __init__(self):
+        self.logger = logger
+
+    def _counter_key(self, user_id: int) -> str:
+        return f"notifications:inbox:unread:{user_id}"
+
+    def get_unread_count(self, user) -> int:
+        """
+        Nombre de notifications non lues (cache, ou une requête indexée au premier appel)
+        """
+        user_id = getattr(user, 'pk', user)
+        key = self._counter_key(user_id)
+        count = cache.get(key)
+        if count is None:
+            count = InAppNotification.objects.filter(recipient_id=user_id, is_read=False).count()
+            cache.set(key, count, UNREAD_COUNTER_TIMEOUT)
+        return max(count, 0)
+
+    def _adjust_counter(self, user_id: int, delta: int):
+        """Appliquer un incrément au compteur s'il est en cache"""
+        if not delta:
+            return
+        try:
+            cache.incr(self._counter_key(user_id), delta)
+        except ValueError:
+            # Compteur absent: il sera recalculé à la prochaine lecture
+            pass
+
+    def reset_counters(self, user_ids: Iterable[int]):
+        """Oublier les compteurs en cache (recalculés à la prochaine lecture)"""
+        keys = [self._counter_key(user_id) for user_id in user_ids]
+        if keys:
+            cache.delete_many(keys)
+
+    def create_entries(self, entries: Iterable[Dict[str, Any]]) -> List[InAppNotification]:
+        """
+        Créer des notifications in-app en une seule écriture
+
+        Chaque entrée contient recipient, title, message, notification_type et,
+        en option, priority, related_object_id et related_object_type.
+        """
+        notifications = [
+            InAppNotification(
+                recipient=entry['recipient'],
+                title=entry['title'],
+                message=entry['message'],
+                notification_type=entry['notification_type'],
+                priority=entry.get('priority', 'medium'),
+                related_object_id=entry.get('related_object_id'),
+                related_object_type=entry.get('related_object_type'),
+            )
+            for entry in entries
+        ]
+        if not notifications:
+            return []
+
+        created = InAppNotification.objects.bulk_create(notifications, batch_size=500)
+
+        # Incrémenter les compteurs une fois la transaction validée
+        per_user = Counter(notification.recipient_id for notification in notifications)
+        transaction.on_commit(
+            lambda: [self._adjust_counter(user_id, count) for user_id, count in per_user.items()]
+        )
+        return created
+
+    def mark_read(self, user, notification_ids: Iterable[int]) -> int:
+        """
+        Marquer des notifications comme lues (une seule requête UPDATE)
+        """
+        updated = InAppNotification.objects.filter(
+            recipient=user, id__in=list(notification_ids), is_read=False
+        ).update(is_read=True, read_at=timezone.now())
+        self._adjust_counter(user.pk, -updated)
+        return updated
+
+    def mark_all_read(self, user) -> int:
+        """
+        Marquer toute la boîte de réception comme lue (une seule requête UPDATE)
+        """
+        updated = InAppNotification.objects.filter(
+            recipient=user, is_read=False
+        ).update(is_read=True, read_at=timezone.now())
+        cache.set(self._counter_key(user.pk), 0, UNREAD_COUNTER_TIMEOUT)
+        return updated
@@ -0,0 +1,61 @@
+"""
+Commande Django pour purger et archiver les anciennes notifications
+Usage: python manage.py prune_notifications [--dry-run] [--no-archive]
+"""
+from django.core.management.base import BaseCommand
+
+from notifications.retention import RetentionService
+
+
+class Command(BaseCommand):
+    help = 'Purge par lots les logs et notifications au-delà de la durée de rétention'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compter les lignes à purger sans rien supprimer',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Supprimer sans écrire d\'archive NDJSON compressée',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Nombre de lignes par lot de suppression',
+        )
+        parser.add_argument(
+            '--table',
+            choices=sorted(RetentionService.POLICIES),
+            help='Ne purger qu\'une seule table',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        service = RetentionService(
+            batch_size=options['batch_size'],
+            archive=False if options['no_archive'] else None,
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS('🔄 Purge des anciennes notifications...')
+        )
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING('⚠️ Mode simulation activé - Aucune ligne ne sera supprimée')
+            )
+        elif service.archive:
+            self.stdout.write(f'  📦 Archives dans {service.archive_dir}')
+
+        if options['table']:
+            results = {options['table']: service.prune(options['table'], dry_run=dry_run)}
+        else:
+            results = service.prune_all(dry_run=dry_run)
+
+        self.stdout.write('\n📊 Statistiques de l\'exécution:')
+        for name, count in results.items():
+            self.stdout.write(f'  🗑️ {name}: {count} lignes {"à purger" if dry_run else "purgées"}')
@@ -0,0 +1,35 @@
+"""
+Commande Django pour recalculer les agrégats journaliers des notifications
+Usage: python manage.py rollup_notification_stats [--days 7]
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notifications.stats_service import NotificationStatsService
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les statistiques journalières des notifications (date × type × statut × priorité)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=2,
+            help='Nombre de jours écoulés à recalculer (hier inclus)',
+        )
+
+    def handle(self, *args, **options):
+        days = max(options['days'], 1)
+        end_date = timezone.localdate() - timedelta(days=1)
+        start_date = end_date - timedelta(days=days - 1)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🔄 Agrégation des notifications du {start_date} au {end_date}...')
+        )
+
+        rows = NotificationStatsService().rollup(start_date, end_date)
+
+        self.stdout.write(f'  📊 {rows} lignes d\'agrégats écrites')
@@ -0,0 +1,74 @@
+"""
+Commande Django pour lancer le planificateur résident des notifications
+Usage: python manage.py run_scheduler
+"""
+from django.core.management.base import BaseCommand
+from notifications.scheduler import NotificationScheduler, get_job_stats
+
+
+class Command(BaseCommand):
+    help = 'Lance le planificateur des rappels, relances et résumés de notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Effectuer un seul passage puis quitter',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=30,
+            help='Intervalle maximal entre deux passages, en secondes',
+        )
+        parser.add_argument(
+            '--lease',
+            type=int,
+            default=90,
+            help='Durée du bail de leader, en secondes',
+        )
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            help='Afficher les durées d\'exécution des 7 derniers jours puis quitter',
+        )
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.display_status()
+            return
+
+        scheduler = NotificationScheduler(lease_seconds=options['lease'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🔄 Planificateur démarré sur {scheduler.node}')
+        )
+        for job in scheduler.jobs:
+            self.stdout.write(f'  🗓️ {job.name}: {job.schedule.expression}')
+
+        if options['once']:
+            runs = scheduler.tick()
+            scheduler.release_leadership()
+            for run in runs:
+                self.stdout.write(f'  ✅ {run.job_name}: {run.status} en {run.duration_ms} ms')
+            if not runs:
+                self.stdout.write(self.style.WARNING('ℹ️ Aucune tâche déclenchée'))
+            return
+
+        try:
+            scheduler.run_forever(interval=options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\n⏹️ Planificateur arrêté'))
+
+    def display_status(self):
+        """Afficher les statistiques d'exécution par tâche"""
+        self.stdout.write('\n📊 Exécutions planifiées (7 derniers jours):')
+        stats = get_job_stats()
+        if not stats:
+            self.stdout.write('  ℹ️ Aucune exécution enregistrée')
+        for job in stats:
+            self.stdout.write(
+                f'  🗓️ {job["job_name"]}: {job["runs"]} exécutions, '
+                f'{job["failures"]} échecs, moyenne {job["avg_duration_ms"]:.0f} ms, '
+                f'max {job["max_duration_ms"]} ms, dernière {job["last_run"]:%d/%m/%Y %H:%M}'
+            )
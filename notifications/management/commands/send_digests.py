@@ -0,0 +1,37 @@
+"""
+Commande Django pour envoyer les résumés de notifications
+Usage: python manage.py send_digests
+"""
+from django.core.management.base import BaseCommand
+from notifications.digest_service import NotificationDigestService
+
+
+class Command(BaseCommand):
+    help = 'Envoie les résumés de notifications aux utilisateurs en mode résumé'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Simuler l\'envoi sans vraiment envoyer les emails',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        self.stdout.write(
+            self.style.SUCCESS('🔄 Envoi des résumés de notifications...')
+        )
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING('⚠️ Mode simulation activé - Aucun email ne sera envoyé')
+            )
+
+        results = NotificationDigestService().flush_digests(dry_run=dry_run)
+
+        self.stdout.write('\n📊 Statistiques de l\'exécution:')
+        self.stdout.write(f'  📧 Résumés envoyés: {results["digests_sent"]}')
+        self.stdout.write(f'  📋 Notifications regroupées: {results["notifications_grouped"]}')
+        self.stdout.write(f'  ⏳ Notifications en attente de leur fenêtre: {results["waiting"]}')
+        self.stdout.write(f'  ❌ Échecs: {results["failed"]}')
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-19 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_alter_emailnotification_related_object_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailnotification',
+            name='digest',
+            field=models.BooleanField(default=False, verbose_name='Regroupée dans un résumé'),
+        ),
+        migrations.AddIndex(
+            model_name='emailnotification',
+            index=models.Index(fields=['digest', 'status', 'recipient'], name='notificatio_digest_4eaee7_idx'),
+        ),
+    ]
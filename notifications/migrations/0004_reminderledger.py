@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-19 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_emailnotification_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date du rappel')),
+                ('object_type', models.CharField(choices=[('project', 'Projet'), ('task', 'Tâche')], max_length=20, verbose_name="Type d'objet")),
+                ('object_id', models.PositiveIntegerField(verbose_name="ID de l'objet")),
+                ('kind', models.CharField(choices=[('approaching', 'Échéance approchante'), ('reached', 'Échéance atteinte'), ('overdue', 'En retard')], max_length=20, verbose_name='Catégorie')),
+                ('offset', models.IntegerField(verbose_name='Décalage (jours)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+            ],
+            options={
+                'verbose_name': 'Rappel émis',
+                'verbose_name_plural': 'Rappels émis',
+                'unique_together': {('date', 'object_type', 'object_id', 'kind', 'offset')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.16 on 2026-10-19 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_reminderledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerLock',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Nom')),
+                ('owner', models.CharField(max_length=255, verbose_name='Détenteur')),
+                ('expires_at', models.DateTimeField(verbose_name='Expire le')),
+            ],
+            options={
+                'verbose_name': 'Verrou du planificateur',
+                'verbose_name_plural': 'Verrous du planificateur',
+            },
+        ),
+        migrations.CreateModel(
+            name='SchedulerJobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_name', models.CharField(max_length=100, verbose_name='Tâche')),
+                ('node', models.CharField(max_length=255, verbose_name='Nœud')),
+                ('status', models.CharField(choices=[('success', 'Succès'), ('failed', 'Échec')], max_length=20, verbose_name='Statut')),
+                ('started_at', models.DateTimeField(verbose_name='Début')),
+                ('finished_at', models.DateTimeField(verbose_name='Fin')),
+                ('duration_ms', models.PositiveIntegerField(verbose_name='Durée (ms)')),
+                ('error_message', models.TextField(blank=True, verbose_name="Message d'erreur")),
+            ],
+            options={
+                'verbose_name': 'Exécution planifiée',
+                'verbose_name_plural': 'Exécutions planifiées',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['job_name', 'started_at'], name='notificatio_job_nam_501795_idx')],
+            },
+        ),
+    ]
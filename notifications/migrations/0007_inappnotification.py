@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-19 13:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0006_emailnotification_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InAppNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255, verbose_name='Titre')),
+                ('message', models.TextField(verbose_name='Message')),
+                ('notification_type', models.CharField(max_length=50, verbose_name='Type de notification')),
+                ('priority', models.CharField(default='medium', max_length=10, verbose_name='Priorité')),
+                ('related_object_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='ID objet lié')),
+                ('related_object_type', models.CharField(blank=True, max_length=100, null=True, verbose_name="Type d'objet lié")),
+                ('is_read', models.BooleanField(default=False, verbose_name='Lue')),
+                ('read_at', models.DateTimeField(blank=True, null=True, verbose_name='Lue le')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_notifications', to=settings.AUTH_USER_MODEL, verbose_name='Destinataire')),
+            ],
+            options={
+                'verbose_name': 'Notification in-app',
+                'verbose_name_plural': 'Notifications in-app',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['recipient', 'is_read', 'created_at'], name='notificatio_recipie_73c1f5_idx'), models.Index(fields=['recipient', 'created_at'], name='notificatio_recipie_2cb2ac_idx')],
+            },
+        ),
+    ]
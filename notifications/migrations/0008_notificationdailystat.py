@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_inappnotification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('notification_type', models.CharField(max_length=50, verbose_name='Type de notification')),
+                ('status', models.CharField(max_length=20, verbose_name='Statut')),
+                ('priority', models.CharField(max_length=10, verbose_name='Priorité')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Nombre')),
+            ],
+            options={
+                'verbose_name': 'Statistique journalière',
+                'verbose_name_plural': 'Statistiques journalières',
+                'ordering': ['-date'],
+                'unique_together': {('date', 'notification_type', 'status', 'priority')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0008_notificationdailystat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailnotification',
+            index=models.Index(fields=['recipient', 'created_at'], name='notificatio_recipie_9baa3a_idx'),
+        ),
+    ]
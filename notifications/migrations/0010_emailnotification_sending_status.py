@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_emailnotification_recipient_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailnotification',
+            name='status',
+            field=models.CharField(choices=[('pending', 'En attente'), ('sending', "En cours d'envoi"), ('sent', 'Envoyé'), ('failed', 'Échec'), ('delivered', 'Livré')], default='pending', max_length=20, verbose_name='Statut'),
+        ),
+    ]
@@ -1,3 +1,6 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -5,6 +8,42 @@ from django.utils import timezone
 User = get_user_model()
 
 
+class EmailNotificationQuerySet(models.QuerySet):
+    """
+    Requêtes sur les notifications email
+    """
+
+    def recent(self, days=None):
+        """
+        Limiter à la fenêtre de rétention: les requêtes fréquentes ne
+        parcourent ainsi que les lignes récentes de l'index (recipient, created_at)
+        """
+        days = days or getattr(settings, 'NOTIFICATION_RETENTION', {}).get('notification_days', 365)
+        return self.filter(created_at__gte=timezone.now() - timedelta(days=days))
+
+    def claim(self, notification_id, lease):
+        """
+        Réserver une notification avant son envoi: un seul UPDATE conditionnel,
+        qui ne réussit que pour un seul des envois concurrents (envoi immédiat,
+        files de priorité, relances). La réservation expire après `lease`.
+        Retourne True si la notification a été réservée.
+        """
+        return self.filter(id=notification_id, status__in=['pending', 'failed']).update(
+            status='sending',
+            next_attempt_at=timezone.now() + lease,
+        ) == 1
+
+    def release_expired_claims(self, now=None):
+        """
+        Rendre aux relances les réservations expirées (processus arrêté en
+        plein envoi), en comptant une tentative
+        """
+        return self.filter(status='sending', next_attempt_at__lte=now or timezone.now()).update(
+            status='failed',
+            retry_count=models.F('retry_count') + 1,
+        )
+
+
 class EmailNotification(models.Model):
     """
     Modèle pour stocker les notifications email
@@ -29,6 +68,7 @@ class EmailNotification(models.Model):
 
     STATUS_CHOICES = [
         ('pending', 'En attente'),
+        ('sending', 'En cours d\'envoi'),
         ('sent', 'Envoyé'),
         ('failed', 'Échec'),
         ('delivered', 'Livré'),
@@ -72,12 +112,16 @@ class EmailNotification(models.Model):
     
     # Configuration d'envoi
     send_immediately = models.BooleanField(default=True, verbose_name="Envoyer immédiatement")
+    digest = models.BooleanField(default=False, verbose_name="Regroupée dans un résumé")
     scheduled_send_time = models.DateTimeField(null=True, blank=True, verbose_name="Heure d'envoi programmée")
     
     # Gestion des erreurs
     error_message = models.TextField(blank=True, verbose_name="Message d'erreur")
     retry_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de tentatives")
     max_retries = models.PositiveIntegerField(default=3, verbose_name="Nombre maximum de tentatives")
+    next_attempt_at = models.DateTimeField(null=True, blank=True, verbose_name="Prochaine tentative")
+
+    objects = EmailNotificationQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Notification Email"
@@ -87,6 +131,9 @@ class EmailNotification(models.Model):
             models.Index(fields=['recipient', 'status']),
             models.Index(fields=['notification_type', 'created_at']),
             models.Index(fields=['priority', 'status']),
+            models.Index(fields=['digest', 'status', 'recipient']),
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['recipient', 'created_at']),
         ]
 
     def __str__(self):
@@ -105,15 +152,30 @@ class EmailNotification(models.Model):
         self.save(update_fields=['status', 'delivered_at'])
 
     def mark_as_failed(self, error_message=""):
-        """Marquer la notification comme échouée"""
+        """Marquer la notification comme échouée et planifier la prochaine relance"""
+        from .delivery import compute_retry_delay
         self.status = 'failed'
         self.error_message = error_message
         self.retry_count += 1
-        self.save(update_fields=['status', 'error_message', 'retry_count'])
+        self.next_attempt_at = (
+            timezone.now() + compute_retry_delay(self.retry_count)
+            if self.retry_count < self.max_retries else None
+        )
+        self.save(update_fields=['status', 'error_message', 'retry_count', 'next_attempt_at'])
+
+    def mark_as_deferred(self, error_message, retry_after):
+        """Reporter l'envoi sans consommer de tentative (relais indisponible)"""
+        self.status = 'failed'
+        self.error_message = error_message
+        self.next_attempt_at = timezone.now() + retry_after
+        self.save(update_fields=['status', 'error_message', 'next_attempt_at'])
 
     def can_retry(self):
         """Vérifier si la notification peut être réessayée"""
-        return self.retry_count < self.max_retries and self.status == 'failed'
+        return (
+            self.retry_count < self.max_retries and self.status == 'failed'
+            and (self.next_attempt_at is None or self.next_attempt_at <= timezone.now())
+        )
 
     def is_ready_to_send(self):
         """Vérifier si la notification est prête à être envoyée"""
@@ -174,4 +236,137 @@ class EmailLog(models.Model):
         ordering = ['-timestamp']
 
     def __str__(self):
-        return f"{self.notification.subject} - {self.action} ({self.timestamp})"
\ No newline at end of file
+        return f"{self.notification.subject} - {self.action} ({self.timestamp})"
+
+class ReminderLedger(models.Model):
+    """
+    Registre des rappels déjà émis: une ligne par objet, catégorie,
+    décalage et jour, pour garantir qu'un rappel n'est envoyé qu'une fois
+    """
+    OBJECT_TYPE_CHOICES = [
+        ('project', 'Projet'),
+        ('task', 'Tâche'),
+    ]
+
+    KIND_CHOICES = [
+        ('approaching', 'Échéance approchante'),
+        ('reached', 'Échéance atteinte'),
+        ('overdue', 'En retard'),
+    ]
+
+    date = models.DateField(verbose_name="Date du rappel")
+    object_type = models.CharField(max_length=20, choices=OBJECT_TYPE_CHOICES, verbose_name="Type d'objet")
+    object_id = models.PositiveIntegerField(verbose_name="ID de l'objet")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Catégorie")
+    offset = models.IntegerField(verbose_name="Décalage (jours)")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+
+    class Meta:
+        verbose_name = "Rappel émis"
+        verbose_name_plural = "Rappels émis"
+        # La date en tête permet de charger tous les rappels d'une journée
+        # avec le même index que la contrainte d'unicité
+        unique_together = ['date', 'object_type', 'object_id', 'kind', 'offset']
+
+    def __str__(self):
+        return f"{self.object_type} {self.object_id} - {self.kind} ({self.offset}j, {self.date})"
+
+
+class SchedulerLock(models.Model):
+    """
+    Bail (lease) en base permettant à un seul nœud de piloter le planificateur
+    """
+    name = models.CharField(max_length=100, primary_key=True, verbose_name="Nom")
+    owner = models.CharField(max_length=255, verbose_name="Détenteur")
+    expires_at = models.DateTimeField(verbose_name="Expire le")
+
+    class Meta:
+        verbose_name = "Verrou du planificateur"
+        verbose_name_plural = "Verrous du planificateur"
+
+    def __str__(self):
+        return f"{self.name} ({self.owner} jusqu'à {self.expires_at})"
+
+
+class SchedulerJobRun(models.Model):
+    """
+    Exécution d'une tâche planifiée, conservée pour le suivi des durées
+    """
+    STATUS_CHOICES = [
+        ('success', 'Succès'),
+        ('failed', 'Échec'),
+    ]
+
+    job_name = models.CharField(max_length=100, verbose_name="Tâche")
+    node = models.CharField(max_length=255, verbose_name="Nœud")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, verbose_name="Statut")
+    started_at = models.DateTimeField(verbose_name="Début")
+    finished_at = models.DateTimeField(verbose_name="Fin")
+    duration_ms = models.PositiveIntegerField(verbose_name="Durée (ms)")
+    error_message = models.TextField(blank=True, verbose_name="Message d'erreur")
+
+    class Meta:
+        verbose_name = "Exécution planifiée"
+        verbose_name_plural = "Exécutions planifiées"
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['job_name', 'started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.job_name} - {self.status} ({self.duration_ms} ms)"
+
+
+class InAppNotification(models.Model):
+    """
+    Notification affichée dans la boîte de réception du portail, avec son
+    propre état lu / non lu indépendant de l'envoi de l'email
+    """
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='inbox_notifications',
+        verbose_name="Destinataire"
+    )
+    title = models.CharField(max_length=255, verbose_name="Titre")
+    message = models.TextField(verbose_name="Message")
+    notification_type = models.CharField(max_length=50, verbose_name="Type de notification")
+    priority = models.CharField(max_length=10, default='medium', verbose_name="Priorité")
+    related_object_id = models.PositiveIntegerField(null=True, blank=True, verbose_name="ID objet lié")
+    related_object_type = models.CharField(max_length=100, null=True, blank=True, verbose_name="Type d'objet lié")
+    is_read = models.BooleanField(default=False, verbose_name="Lue")
+    read_at = models.DateTimeField(null=True, blank=True, verbose_name="Lue le")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créée le")
+
+    class Meta:
+        verbose_name = "Notification in-app"
+        verbose_name_plural = "Notifications in-app"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', 'created_at']),
+            models.Index(fields=['recipient', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.recipient} ({'lue' if self.is_read else 'non lue'})"
+
+
+class NotificationDailyStat(models.Model):
+    """
+    Agrégat journalier des notifications (date × type × statut × priorité),
+    pour les tableaux de bord sur de longues périodes sans parcourir la table brute
+    """
+    date = models.DateField(verbose_name="Date")
+    notification_type = models.CharField(max_length=50, verbose_name="Type de notification")
+    status = models.CharField(max_length=20, verbose_name="Statut")
+    priority = models.CharField(max_length=10, verbose_name="Priorité")
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre")
+
+    class Meta:
+        verbose_name = "Statistique journalière"
+        verbose_name_plural = "Statistiques journalières"
+        ordering = ['-date']
+        unique_together = ['date', 'notification_type', 'status', 'priority']
+
+    def __str__(self):
+        return f"{self.date} {self.notification_type}/{self.status}/{self.priority}: {self.count}"
@@ -2,9 +2,10 @@
 Service de rappels automatiques pour projets et tâches
 """
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
-from datetime import timedelta
-from typing import List, Dict, Any
+from datetime import datetime, time, timedelta
+from typing import List, Dict, Any, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,118 +28,184 @@ class ReminderService:
         }
     }
     
+    # Statuts pour lesquels un rappel a encore un sens
+    ACTIVE_STATUSES = {
+        'project': ['planification', 'en_cours', 'en_attente', 'en_retard'],
+        'task': ['not_started', 'in_progress', 'on_hold'],
+    }
+    
     def __init__(self):
         self.logger = logger
     
-    def process_project_reminders(self):
+    def get_offsets(self, object_type: str) -> Dict[int, str]:
         """
-        Traiter les rappels pour tous les projets
+        Décalages en jours (échéance - aujourd'hui) déclenchant un rappel
+        """
+        schedule = self.REMINDER_SCHEDULE[object_type]
+        offsets = {days: 'approaching' for days in schedule['approaching']}
+        offsets.update({-days: 'overdue' for days in schedule['overdue']})
+        offsets[0] = 'reached'
+        return offsets
+    
+    def get_due_projects(self, today=None) -> List[Tuple[Any, str, int]]:
+        """
+        Projets à rappeler aujourd'hui, en une seule requête
+        
+        Retourne des tuples (projet, catégorie, jours) où la catégorie vaut
+        'approaching', 'reached' ou 'overdue'.
         """
-        from notifications.services import ProjectNotificationService
         from projects.models import Project
         
-        service = ProjectNotificationService()
-        today = timezone.now().date()
+        today = today or timezone.localdate()
+        offsets = self.get_offsets('project')
         
-        # Projets avec échéance approchante
-        for days_before in self.REMINDER_SCHEDULE['project']['approaching']:
-            target_date = today + timedelta(days=days_before)
-            
-            projects = Project.objects.filter(
-                deadline__date=target_date,
-                status__in=['active', 'in_progress', 'pending']
+        projects = (
+            Project.objects
+            .filter(
+                deadline__in=[today + timedelta(days=offset) for offset in offsets],
+                status__in=self.ACTIVE_STATUSES['project']
             )
-            
-            for project in projects:
-                try:
-                    service.notify_project_deadline_approaching(project, days_before)
-                    self.logger.info(f"Rappel projet approchant envoyé: {project.name} ({days_before} jours)")
-                except Exception as e:
-                    self.logger.error(f"Erreur rappel projet approchant: {str(e)}")
+            .select_related('manager')
+            .prefetch_related('team')
+        )
         
-        # Projets en retard
-        for days_overdue in self.REMINDER_SCHEDULE['project']['overdue']:
-            target_date = today - timedelta(days=days_overdue)
-            
-            projects = Project.objects.filter(
-                deadline__date=target_date,
-                status__in=['active', 'in_progress', 'pending']
-            )
-            
-            for project in projects:
-                try:
-                    service.notify_project_overdue(project, days_overdue)
-                    self.logger.info(f"Rappel projet en retard envoyé: {project.name} ({days_overdue} jours)")
-                except Exception as e:
-                    self.logger.error(f"Erreur rappel projet en retard: {str(e)}")
+        due = []
+        for project in projects:
+            offset = (project.deadline - today).days
+            due.append((project, offsets[offset], abs(offset)))
+        return due
+    
+    def get_due_tasks(self, today=None) -> List[Tuple[Any, str, int]]:
+        """
+        Tâches à rappeler aujourd'hui, en une seule requête
         
-        # Projets dont l'échéance est aujourd'hui
-        projects_today = Project.objects.filter(
-            deadline__date=today,
-            status__in=['active', 'in_progress', 'pending']
+        L'échéance étant une date/heure, chaque jour cible devient un intervalle
+        [début, fin[ pour rester compatible avec un index sur due_date.
+        """
+        from projects.models import Task
+        
+        today = today or timezone.localdate()
+        offsets = self.get_offsets('task')
+        
+        windows = Q()
+        for offset in offsets:
+            start = self._start_of_day(today + timedelta(days=offset))
+            windows |= Q(due_date__gte=start, due_date__lt=start + timedelta(days=1))
+        
+        tasks = (
+            Task.objects
+            .filter(windows, status__in=self.ACTIVE_STATUSES['task'])
+            .select_related('assignee', 'project__manager')
         )
         
-        for project in projects_today:
-            try:
-                service.notify_project_deadline_reached(project)
-                self.logger.info(f"Rappel échéance projet atteinte: {project.name}")
-            except Exception as e:
-                self.logger.error(f"Erreur rappel échéance projet: {str(e)}")
+        due = []
+        for task in tasks:
+            offset = (timezone.localdate(task.due_date) - today).days
+            if offset in offsets:
+                due.append((task, offsets[offset], abs(offset)))
+        return due
+    
+    def get_already_sent(self, object_type: str, today=None) -> set:
+        """
+        Rappels déjà inscrits au registre pour la journée, sous forme de
+        triplets (id objet, catégorie, jours), chargés en une seule requête
+        """
+        from notifications.models import ReminderLedger
+        
+        today = today or timezone.localdate()
+        return set(
+            ReminderLedger.objects
+            .filter(date=today, object_type=object_type)
+            .values_list('object_id', 'kind', 'offset')
+        )
+    
+    def process_project_reminders(self, today=None, dry_run=False, force=False) -> Dict[str, int]:
+        """
+        Traiter les rappels pour tous les projets
+        """
+        from notifications.services import ProjectNotificationService
+        
+        service = ProjectNotificationService()
+        handlers = {
+            'approaching': service.notify_project_deadline_approaching,
+            'reached': lambda project, days: service.notify_project_deadline_reached(project),
+            'overdue': service.notify_project_overdue,
+        }
+        return self._process(
+            'project', self.get_due_projects(today), service, handlers, today, dry_run, force
+        )
     
-    def process_task_reminders(self):
+    def process_task_reminders(self, today=None, dry_run=False, force=False) -> Dict[str, int]:
         """
         Traiter les rappels pour toutes les tâches
         """
         from notifications.services import TaskNotificationService
-        from projects.models import Task
         
         service = TaskNotificationService()
-        today = timezone.now().date()
+        handlers = {
+            'approaching': service.notify_task_deadline_approaching,
+            'reached': lambda task, days: service.notify_task_deadline_reached(task),
+            'overdue': service.notify_task_overdue,
+        }
+        return self._process(
+            'task', self.get_due_tasks(today), service, handlers, today, dry_run, force
+        )
+    
+    def _process(self, object_type, due, service, handlers, today=None,
+                 dry_run=False, force=False) -> Dict[str, int]:
+        """
+        Émettre les rappels absents du registre, puis les y inscrire
         
-        # Tâches avec échéance approchante
-        for days_before in self.REMINDER_SCHEDULE['task']['approaching']:
-            target_date = today + timedelta(days=days_before)
-            
-            tasks = Task.objects.filter(
-                due_date__date=target_date,
-                status__in=['pending', 'in_progress', 'assigned']
-            )
-            
-            for task in tasks:
-                try:
-                    service.notify_task_deadline_approaching(task, days_before)
-                    self.logger.info(f"Rappel tâche approchante envoyé: {task.title} ({days_before} jours)")
-                except Exception as e:
-                    self.logger.error(f"Erreur rappel tâche approchante: {str(e)}")
+        force ignore le registre (les rappels sont renvoyés), dry_run
+        n'émet rien et n'écrit rien.
+        """
+        from notifications.models import ReminderLedger
         
-        # Tâches en retard
-        for days_overdue in self.REMINDER_SCHEDULE['task']['overdue']:
-            target_date = today - timedelta(days=days_overdue)
-            
-            tasks = Task.objects.filter(
-                due_date__date=target_date,
-                status__in=['pending', 'in_progress', 'assigned']
-            )
+        today = today or timezone.localdate()
+        already_sent = set() if force else self.get_already_sent(object_type, today)
+        stats = {'checked': len(due), 'sent': 0, 'skipped': 0, 'errors': 0}
+        entries = []
+        
+        # Le registre n'est validé qu'avec les notifications: si leur écriture
+        # groupée échoue, les rappels seront réémis au prochain passage. Les
+        # emails ne partent qu'après la validation (create_notifications_bulk):
+        # une erreur SMTP n'annule pas le registre des rappels déjà émis.
+        try:
+            with transaction.atomic(), service.batch(raise_errors=True):
+                for obj, kind, days in due:
+                    if (obj.id, kind, days) in already_sent:
+                        stats['skipped'] += 1
+                        continue
+                    if dry_run:
+                        stats['sent'] += 1
+                        continue
+                    try:
+                        handlers[kind](obj, days)
+                        stats['sent'] += 1
+                        entries.append(ReminderLedger(
+                            date=today, object_type=object_type, object_id=obj.id,
+                            kind=kind, offset=days
+                        ))
+                    except Exception as e:
+                        stats['errors'] += 1
+                        self.logger.error(f"Erreur rappel {object_type} {obj.id} ({kind}): {str(e)}")
             
-            for task in tasks:
-                try:
-                    service.notify_task_overdue(task, days_overdue)
-                    self.logger.info(f"Rappel tâche en retard envoyé: {task.title} ({days_overdue} jours)")
-                except Exception as e:
-                    self.logger.error(f"Erreur rappel tâche en retard: {str(e)}")
+                # Insertion ou ignore: un passage concurrent ou forcé ne crée pas de doublon
+                ReminderLedger.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+        except Exception as e:
+            self.logger.error(f"Erreur écriture des rappels {object_type}: {str(e)}")
+            stats['errors'] += stats['sent']
+            stats['sent'] = 0
         
-        # Tâches dont l'échéance est aujourd'hui
-        tasks_today = Task.objects.filter(
-            due_date__date=today,
-            status__in=['pending', 'in_progress', 'assigned']
+        self.logger.info(
+            f"Rappels {object_type}: {stats['sent']} envoyés, "
+            f"{stats['skipped']} déjà envoyés, {stats['errors']} erreurs"
         )
-        
-        for task in tasks_today:
-            try:
-                service.notify_task_deadline_reached(task)
-                self.logger.info(f"Rappel échéance tâche atteinte: {task.title}")
-            except Exception as e:
-                self.logger.error(f"Erreur rappel échéance tâche: {str(e)}")
+        return stats
+    
+    def _start_of_day(self, day) -> datetime:
+        """Début de journée dans le fuseau courant"""
+        return timezone.make_aware(datetime.combine(day, time.min))
     
     def process_all_reminders(self):
         """
@@ -164,77 +231,16 @@ class ReminderService:
         """
         Obtenir les statistiques des rappels
         """
-        from projects.models import Project, Task
-        
-        today = timezone.now().date()
-        
-        # Statistiques projets
-        projects_approaching = 0
-        projects_overdue = 0
-        projects_today = 0
+        stats = {}
+        for object_type, due in (('projects', self.get_due_projects()), ('tasks', self.get_due_tasks())):
+            counts = {'approaching': 0, 'overdue': 0, 'today': 0}
+            for _, kind, _ in due:
+                counts['today' if kind == 'reached' else kind] += 1
+            counts['total'] = len(due)
+            stats[object_type] = counts
         
-        for days_before in self.REMINDER_SCHEDULE['project']['approaching']:
-            target_date = today + timedelta(days=days_before)
-            count = Project.objects.filter(
-                deadline=target_date,
-                status__in=['active', 'in_progress', 'pending']
-            ).count()
-            projects_approaching += count
-        
-        for days_overdue in self.REMINDER_SCHEDULE['project']['overdue']:
-            target_date = today - timedelta(days=days_overdue)
-            count = Project.objects.filter(
-                deadline=target_date,
-                status__in=['active', 'in_progress', 'pending']
-            ).count()
-            projects_overdue += count
-        
-        projects_today = Project.objects.filter(
-            deadline=today,
-            status__in=['active', 'in_progress', 'pending']
-        ).count()
-        
-        # Statistiques tâches
-        tasks_approaching = 0
-        tasks_overdue = 0
-        tasks_today = 0
-        
-        for days_before in self.REMINDER_SCHEDULE['task']['approaching']:
-            target_date = today + timedelta(days=days_before)
-            count = Task.objects.filter(
-                due_date=target_date,
-                status__in=['pending', 'in_progress', 'assigned']
-            ).count()
-            tasks_approaching += count
-        
-        for days_overdue in self.REMINDER_SCHEDULE['task']['overdue']:
-            target_date = today - timedelta(days=days_overdue)
-            count = Task.objects.filter(
-                due_date=target_date,
-                status__in=['pending', 'in_progress', 'assigned']
-            ).count()
-            tasks_overdue += count
-        
-        tasks_today = Task.objects.filter(
-            due_date=today,
-            status__in=['pending', 'in_progress', 'assigned']
-        ).count()
-        
-        return {
-            'projects': {
-                'approaching': projects_approaching,
-                'overdue': projects_overdue,
-                'today': projects_today,
-                'total': projects_approaching + projects_overdue + projects_today
-            },
-            'tasks': {
-                'approaching': tasks_approaching,
-                'overdue': tasks_overdue,
-                'today': tasks_today,
-                'total': tasks_approaching + tasks_overdue + tasks_today
-            },
-            'schedule': self.REMINDER_SCHEDULE
-        }
+        stats['schedule'] = self.REMINDER_SCHEDULE
+        return stats
     
     def send_immediate_reminders(self, project_id=None, task_id=None):
         """
@@ -249,9 +255,9 @@ class ReminderService:
                 service = ProjectNotificationService()
                 
                 # Calculer les jours restants
-                today = timezone.now().date()
+                today = timezone.localdate()
                 if project.deadline:
-                    days_remaining = (project.deadline.date() - today).days
+                    days_remaining = (project.deadline - today).days
                     
                     if days_remaining > 0:
                         service.notify_project_deadline_approaching(project, days_remaining)
@@ -276,9 +282,9 @@ class ReminderService:
                 service = TaskNotificationService()
                 
                 # Calculer les jours restants
-                today = timezone.now().date()
+                today = timezone.localdate()
                 if task.due_date:
-                    days_remaining = (task.due_date.date() - today).days
+                    days_remaining = (timezone.localdate(task.due_date) - today).days
                     
                     if days_remaining > 0:
                         service.notify_task_deadline_approaching(task, days_remaining)
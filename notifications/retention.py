@@ -0,0 +1,139 @@
+"""
+Rétention des notifications: purge par lots de clés primaires et archivage
+en NDJSON compressé
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .inbox import InboxService
+from .models import (
+    EmailLog, EmailNotification, InAppNotification, ReminderLedger, SchedulerJobRun,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION = {
+    'email_log_days': 90,
+    'notification_days': 365,
+    'inbox_days': 180,
+    'reminder_ledger_days': 30,
+    'scheduler_run_days': 30,
+    'batch_size': 1000,
+    'archive': True,
+    'archive_dir': os.path.join(settings.BASE_DIR, 'archives', 'notifications'),
+}
+
+
+def get_retention_setting(name: str):
+    """Lire un paramètre de rétention (settings.NOTIFICATION_RETENTION ou défaut)"""
+    return getattr(settings, 'NOTIFICATION_RETENTION', {}).get(name, DEFAULT_RETENTION[name])
+
+
+class RetentionService:
+    """
+    Service de purge des tables de notifications
+
+    Chaque table est parcourue par ordre de clé primaire croissante, donc des
+    lignes les plus anciennes vers les plus récentes, par lots bornés: chaque
+    suppression est une courte requête `DELETE ... WHERE id IN (...)` qui ne
+    verrouille jamais la table entière.
+    """
+
+    # (modèle, champ de date, clé de rétention, filtre supplémentaire)
+    POLICIES = {
+        'email_logs': (EmailLog, 'timestamp', 'email_log_days', {}),
+        'email_notifications': (
+            EmailNotification, 'created_at', 'notification_days',
+            {'status__in': ['sent', 'delivered', 'failed']},
+        ),
+        'inbox_notifications': (InAppNotification, 'created_at', 'inbox_days', {}),
+        'reminder_ledger': (ReminderLedger, 'created_at', 'reminder_ledger_days', {}),
+        'scheduler_runs': (SchedulerJobRun, 'started_at', 'scheduler_run_days', {}),
+    }
+
+    def __init__(self, batch_size: Optional[int] = None, archive: Optional[bool] = None,
+                 archive_dir: Optional[str] = None):
+        self.logger = logger
+        self.batch_size = batch_size or get_retention_setting('batch_size')
+        self.archive = get_retention_setting('archive') if archive is None else archive
+        self.archive_dir = archive_dir or get_retention_setting('archive_dir')
+
+    def prune_all(self, dry_run: bool = False, now=None) -> Dict[str, int]:
+        """
+        Appliquer toutes les politiques de rétention
+        """
+        now = now or timezone.now()
+        return {name: self.prune(name, dry_run=dry_run, now=now) for name in self.POLICIES}
+
+    def prune(self, name: str, dry_run: bool = False, now=None) -> int:
+        """
+        Purger (et archiver) les lignes d'une table plus anciennes que sa rétention
+        """
+        model, date_field, retention_key, extra_filter = self.POLICIES[name]
+        now = now or timezone.now()
+        cutoff = now - timedelta(days=get_retention_setting(retention_key))
+
+        archive_file = path = None
+        if self.archive and not dry_run:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            path = os.path.join(self.archive_dir, f"{name}-{now:%Y%m%d-%H%M%S}.ndjson.gz")
+            archive_file = gzip.open(path, 'at', encoding='utf-8')
+
+        last_pk = 0
+        total = 0
+        try:
+            while True:
+                # Lot suivant par clé primaire: servi par l'index primaire,
+                # sans balayer la table sur le champ de date
+                batch = list(
+                    model.objects
+                    .filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .values_list('pk', date_field)[:self.batch_size]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+
+                expired = [pk for pk, moment in batch if moment < cutoff]
+                if expired and extra_filter:
+                    expired = list(
+                        model.objects.filter(pk__in=expired, **extra_filter).values_list('pk', flat=True)
+                    )
+
+                if expired and not dry_run:
+                    if archive_file:
+                        for row in model.objects.filter(pk__in=expired).order_by('pk').values():
+                            archive_file.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                    unread_recipients = (
+                        set(model.objects.filter(pk__in=expired, is_read=False).values_list('recipient_id', flat=True))
+                        if model is InAppNotification else ()
+                    )
+                    model.objects.filter(pk__in=expired).delete()
+                    # Les badges non lus en cache comptaient les lignes supprimées
+                    InboxService().reset_counters(unread_recipients)
+                total += len(expired)
+
+                # Les clés croissent avec le temps: un lot entièrement récent
+                # signifie qu'il ne reste plus rien d'expiré
+                if batch[0][1] >= cutoff:
+                    break
+        finally:
+            if archive_file:
+                archive_file.close()
+                if not total:
+                    os.remove(path)
+
+        self.logger.info(
+            f"Rétention {name}: {total} lignes {'à purger' if dry_run else 'purgées'} "
+            f"(antérieures au {cutoff:%d/%m/%Y})"
+        )
+        return total
@@ -0,0 +1,368 @@
+"""
+Planificateur résident des tâches de notification (rappels, relances, résumés)
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import SchedulerLock, SchedulerJobRun
+
+logger = logging.getLogger(__name__)
+
+# Nom du bail détenu par le nœud leader
+LEADER_LOCK_NAME = 'notifications-scheduler'
+
+# Tâches par défaut: expression cron (minute heure jour mois jour_semaine)
+# et chemin de la fonction à appeler. Surchargeable par settings.SCHEDULER_JOBS.
+DEFAULT_SCHEDULER_JOBS = {
+    'reminders': {
+        'schedule': '0 7 * * *',
+        'callable': 'notifications.scheduler.run_reminders',
+    },
+    'retry_failed': {
+        'schedule': '*/15 * * * *',
+        'callable': 'notifications.scheduler.run_retry_failed',
+    },
+    'digests': {
+        'schedule': '*/5 * * * *',
+        'callable': 'notifications.scheduler.run_digests',
+    },
+    'pending': {
+        'schedule': '* * * * *',
+        'callable': 'notifications.scheduler.run_pending',
+    },
+    'stats_rollup': {
+        'schedule': '10 0 * * *',
+        'callable': 'notifications.scheduler.run_stats_rollup',
+    },
+    'prune': {
+        'schedule': '30 2 * * *',
+        'callable': 'notifications.scheduler.run_prune',
+    },
+}
+
+
+def run_reminders():
+    from .reminder_service import ReminderService
+    ReminderService().process_all_reminders()
+
+
+def run_retry_failed():
+    from .services import EmailNotificationService
+    return EmailNotificationService().retry_failed_notifications()
+
+
+def run_pending():
+    from .services import EmailNotificationService
+    return EmailNotificationService().send_pending_notifications()
+
+
+def run_stats_rollup():
+    from .stats_service import NotificationStatsService
+    # Recalculer aussi l'avant-veille: les statuts évoluent après la création
+    yesterday = timezone.localdate() - timedelta(days=1)
+    return NotificationStatsService().rollup(yesterday - timedelta(days=1), yesterday)
+
+
+def run_prune():
+    from .retention import RetentionService
+    return RetentionService().prune_all()
+
+
+def run_digests():
+    from .digest_service import NotificationDigestService
+    return NotificationDigestService().flush_digests()
+
+
+class CronSchedule:
+    """
+    Expression cron à cinq champs: *, */n, a-b, a-b/n et listes séparées par des virgules
+    """
+
+    # (minimum, maximum) de chaque champ
+    FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Expression cron invalide: {expression}")
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = [
+            self._parse_field(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        ]
+        # Comme cron: si jour du mois et jour de semaine sont tous deux restreints,
+        # il suffit que l'un des deux corresponde
+        self.days_restricted = parts[2] != '*'
+        self.weekdays_restricted = parts[4] != '*'
+
+    def _parse_field(self, field: str, low: int, high: int) -> set:
+        values = set()
+        for item in field.split(','):
+            step = 1
+            if '/' in item:
+                item, step = item.split('/')
+                step = int(step)
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start, end = (int(value) for value in item.split('-'))
+            else:
+                start = int(item)
+                end = high if step > 1 else start
+            if start < low or end > high or step < 1:
+                raise ValueError(f"Champ cron hors limites: {field}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def matches(self, moment) -> bool:
+        """Vérifier si la minute donnée (heure locale) déclenche la tâche"""
+        if moment.minute not in self.minutes or moment.hour not in self.hours:
+            return False
+        if moment.month not in self.months:
+            return False
+
+        day_match = moment.day in self.days
+        # weekday(): lundi = 0, cron: dimanche = 0
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+
+class ScheduledJob:
+    """
+    Tâche planifiée: un nom, une expression cron et une fonction
+    """
+
+    def __init__(self, name: str, schedule: str, func: Callable):
+        self.name = name
+        self.schedule = CronSchedule(schedule)
+        self.func = func
+
+
+class LeaseHeartbeat:
+    """
+    Renouvellement du bail de leader pendant l'exécution d'une tâche
+
+    Un thread prolonge le bail toutes les `interval` secondes tant que la
+    tâche tourne; s'il constate que le bail a été repris par un autre nœud,
+    il s'arrête et `lost` passe à True.
+    """
+
+    def __init__(self, scheduler: 'NotificationScheduler', interval: float):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                if not self.scheduler.renew_leadership():
+                    self.lost = True
+                    self.scheduler.logger.warning(
+                        f"Bail de leader repris pendant une tâche de {self.scheduler.node}"
+                    )
+                    return
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name='scheduler-heartbeat', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+class NotificationScheduler:
+    """
+    Boucle résidente qui déclenche les tâches planifiées
+
+    Un bail en base (SchedulerLock) désigne un seul nœud leader: les autres
+    nœuds tournent à vide et prennent le relais si le bail expire.
+    """
+
+    def __init__(self, jobs: Optional[Dict[str, Dict[str, str]]] = None,
+                 lease_seconds: int = 90, node: Optional[str] = None):
+        self.logger = logger
+        self.node = node or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease = timedelta(seconds=lease_seconds)
+        config = jobs or getattr(settings, 'SCHEDULER_JOBS', DEFAULT_SCHEDULER_JOBS)
+        self.jobs = [
+            ScheduledJob(name, job['schedule'], import_string(job['callable']))
+            for name, job in config.items()
+        ]
+        self.last_tick = None
+
+    def acquire_leadership(self) -> bool:
+        """
+        Prendre ou renouveler le bail de leader (une requête dans le cas courant)
+        """
+        now = timezone.now()
+        expires_at = now + self.lease
+
+        renewed = SchedulerLock.objects.filter(
+            Q(owner=self.node) | Q(expires_at__lt=now),
+            name=LEADER_LOCK_NAME
+        ).update(owner=self.node, expires_at=expires_at)
+        if renewed:
+            return True
+
+        try:
+            with transaction.atomic():
+                SchedulerLock.objects.create(
+                    name=LEADER_LOCK_NAME, owner=self.node, expires_at=expires_at
+                )
+            return True
+        except IntegrityError:
+            # Un autre nœud détient un bail valide
+            return False
+
+    def renew_leadership(self) -> bool:
+        """Prolonger le bail s'il est encore détenu par ce nœud (sans reprendre un bail expiré)"""
+        return SchedulerLock.objects.filter(
+            name=LEADER_LOCK_NAME, owner=self.node, expires_at__gte=timezone.now()
+        ).update(expires_at=timezone.now() + self.lease) == 1
+
+    def holds_leadership(self) -> bool:
+        """Vérifier que ce nœud détient toujours un bail valide"""
+        return SchedulerLock.objects.filter(
+            name=LEADER_LOCK_NAME, owner=self.node, expires_at__gte=timezone.now()
+        ).exists()
+
+    def release_leadership(self):
+        """Libérer le bail pour qu'un autre nœud reprenne sans attendre l'expiration"""
+        SchedulerLock.objects.filter(name=LEADER_LOCK_NAME, owner=self.node).delete()
+
+    def due_jobs(self, now) -> List[ScheduledJob]:
+        """
+        Tâches à déclencher depuis le dernier passage, sans rater de minute
+        """
+        current = timezone.localtime(now).replace(second=0, microsecond=0)
+        if self.last_tick is None:
+            minutes = [current]
+        else:
+            # Rattraper au plus une heure de minutes manquées (pause, bail perdu...)
+            start = max(self.last_tick + timedelta(minutes=1), current - timedelta(hours=1))
+            minutes = []
+            while start <= current:
+                minutes.append(start)
+                start += timedelta(minutes=1)
+        self.last_tick = current
+
+        return [
+            job for job in self.jobs
+            if any(job.schedule.matches(minute) for minute in minutes)
+        ]
+
+    def run_job(self, job: ScheduledJob) -> Optional[SchedulerJobRun]:
+        """
+        Exécuter une tâche, le bail renouvelé en arrière-plan, et enregistrer
+        sa durée. Si le bail est perdu avant ou pendant la tâche, rien n'est
+        enregistré (le nouveau leader est responsable des tâches): retourne None.
+        """
+        if not self.renew_leadership():
+            self.logger.warning(f"Bail de leader perdu par {self.node}, {job.name} non lancée")
+            return None
+
+        started_at = timezone.now()
+        start = time.monotonic()
+        status, error_message = 'success', ''
+
+        # Renouveler au tiers du bail: deux renouvellements peuvent échouer
+        # avant qu'il n'expire
+        with LeaseHeartbeat(self, self.lease.total_seconds() / 3) as heartbeat:
+            try:
+                job.func()
+            except Exception as e:
+                status, error_message = 'failed', str(e)
+                self.logger.error(f"Tâche planifiée {job.name} en échec: {error_message}")
+
+        duration_ms = int((time.monotonic() - start) * 1000)
+        self.logger.info(f"Tâche planifiée {job.name}: {status} en {duration_ms} ms")
+
+        if heartbeat.lost or not self.holds_leadership():
+            self.logger.warning(
+                f"Bail de leader perdu par {self.node} pendant {job.name}, exécution non enregistrée"
+            )
+            return None
+
+        return SchedulerJobRun.objects.create(
+            job_name=job.name,
+            node=self.node,
+            status=status,
+            started_at=started_at,
+            finished_at=timezone.now(),
+            duration_ms=duration_ms,
+            error_message=error_message
+        )
+
+    def tick(self, now=None) -> List[SchedulerJobRun]:
+        """
+        Un passage: renouveler le bail puis lancer les tâches échues
+        """
+        close_old_connections()
+        now = now or timezone.now()
+
+        if not self.acquire_leadership():
+            # Suiveur: ne rien rattraper lors d'une future prise de relais
+            self.last_tick = None
+            return []
+
+        runs = []
+        for job in self.due_jobs(now):
+            run = self.run_job(job)
+            if run is None:
+                # Bail perdu: le nouveau leader reprend les tâches restantes
+                self.last_tick = None
+                break
+            runs.append(run)
+        return runs
+
+    def run_forever(self, interval: int = 30):
+        """
+        Boucle principale, alignée sur le passage des minutes
+        """
+        self.logger.info(f"Planificateur démarré sur {self.node}")
+        try:
+            while True:
+                self.tick()
+                time.sleep(max(1, min(interval, 60 - timezone.now().second)))
+        finally:
+            self.release_leadership()
+            self.logger.info(f"Planificateur arrêté sur {self.node}")
+
+
+def get_job_stats(since=None) -> List[Dict]:
+    """
+    Durées et échecs par tâche planifiée (une requête groupée)
+    """
+    since = since or timezone.now() - timedelta(days=7)
+    return list(
+        SchedulerJobRun.objects
+        .filter(started_at__gte=since)
+        .values('job_name')
+        .annotate(
+            runs=Count('id'),
+            failures=Count('id', filter=Q(status='failed')),
+            avg_duration_ms=Avg('duration_ms'),
+            max_duration_ms=Max('duration_ms'),
+            last_run=Max('started_at'),
+        )
+        .order_by('job_name')
+    )
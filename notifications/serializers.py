@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import EmailNotification, EmailTemplate, EmailLog
+from .models import EmailNotification, EmailTemplate, EmailLog, InAppNotification
 
 User = get_user_model()
 
@@ -36,6 +36,7 @@ class EmailNotificationSerializer(serializers.ModelSerializer):
             'related_object_id',
             'related_object_type',
             'send_immediately',
+            'digest',
             'scheduled_send_time',
             'error_message',
             'retry_count',
@@ -46,6 +47,7 @@ class EmailNotificationSerializer(serializers.ModelSerializer):
             'created_at',
             'sent_at',
             'delivered_at',
+            'digest',
             'error_message',
             'retry_count',
         ]
@@ -106,6 +108,27 @@ class EmailLogSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'timestamp']
 
 
+class InAppNotificationSerializer(serializers.ModelSerializer):
+    """
+    Serializer pour les notifications de la boîte de réception
+    """
+    class Meta:
+        model = InAppNotification
+        fields = [
+            'id',
+            'title',
+            'message',
+            'notification_type',
+            'priority',
+            'related_object_id',
+            'related_object_type',
+            'is_read',
+            'read_at',
+            'created_at',
+        ]
+        read_only_fields = fields
+
+
 class NotificationStatsSerializer(serializers.Serializer):
     """
     Serializer pour les statistiques des notifications
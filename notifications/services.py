@@ -1,10 +1,13 @@
 import logging
+from contextlib import contextmanager
 from django.core.mail import send_mail, EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils import timezone
-from django.db import transaction
+from django.db import connection, transaction
 from .models import EmailNotification, EmailTemplate, EmailLog
+from .inbox import InboxService
+from .delivery import DeliveryPool, PriorityLaneDispatcher, SMTPCircuitBreaker, claim_lease, get_lane_stats
 from typing import List, Dict, Any, Optional
 import json
 
@@ -36,6 +39,17 @@ class EmailNotificationService:
         Créer une nouvelle notification email (domaines locaux uniquement)
         """
         try:
+            # Boîte de réception in-app, indépendante du domaine de l'email
+            InboxService().create_entries([{
+                'recipient': recipient,
+                'title': subject,
+                'message': message,
+                'notification_type': notification_type,
+                'priority': priority,
+                'related_object_id': related_object_id,
+                'related_object_type': related_object_type,
+            }])
+            
             # Vérifier si le destinataire est d'un domaine local
             from .local_domain_service import LocalDomainEmailService
             local_service = LocalDomainEmailService()
@@ -44,6 +58,12 @@ class EmailNotificationService:
                 self.logger.warning(f"Destinataire externe ignoré: {recipient.email}")
                 return None
             
+            # Regrouper dans le prochain résumé si le destinataire l'a choisi
+            from .digest_service import NotificationDigestService
+            digest = NotificationDigestService().should_defer(recipient, priority)
+            if digest:
+                send_immediately = False
+            
             notification = EmailNotification.objects.create(
                 recipient=recipient,
                 subject=subject,
@@ -51,6 +71,7 @@ class EmailNotificationService:
                 notification_type=notification_type,
                 priority=priority,
                 send_immediately=send_immediately,
+                digest=digest,
                 scheduled_send_time=scheduled_send_time,
                 related_object_id=related_object_id,
                 related_object_type=related_object_type
@@ -60,14 +81,14 @@ class EmailNotificationService:
             EmailLog.objects.create(
                 notification=notification,
                 action='created',
-                details=f"Notification créée pour {recipient.email} (domaine local)"
+                details=f"Notification créée pour {recipient.email} (domaine local{', résumé' if digest else ''})"
             )
             
             self.logger.info(f"Notification créée: {notification.id} pour {recipient.email} (domaine local)")
             
-            # Envoyer immédiatement si demandé
+            # Envoyer immédiatement si demandé, une fois la transaction validée
             if send_immediately:
-                self.send_notification(notification.id)
+                transaction.on_commit(lambda: self.send_notification(notification.id))
                 
             return notification
             
@@ -75,13 +96,133 @@ class EmailNotificationService:
             self.logger.error(f"Erreur lors de la création de la notification: {str(e)}")
             return None
 
+    def create_notifications_bulk(self, specs: List[Dict[str, Any]], raise_errors: bool = False) -> List[EmailNotification]:
+        """
+        Créer plusieurs notifications en une seule écriture (domaines locaux uniquement)
+
+        Chaque élément de specs contient les arguments de create_notification.
+        Avec raise_errors, un échec de l'écriture est propagé au lieu d'être
+        journalisé (l'appelant peut alors annuler sa transaction). Les envois
+        immédiats partent après la validation de la transaction de l'appelant.
+        """
+        from .local_domain_service import LocalDomainEmailService
+        from .digest_service import NotificationDigestService
+        local_service = LocalDomainEmailService()
+        digest_service = NotificationDigestService()
+
+        try:
+            # Boîte de réception in-app, indépendante du domaine de l'email
+            InboxService().create_entries(
+                {
+                    'recipient': spec['recipient'],
+                    'title': spec['subject'],
+                    'message': spec['message'],
+                    'notification_type': spec['notification_type'],
+                    'priority': spec.get('priority', 'medium'),
+                    'related_object_id': spec.get('related_object_id'),
+                    'related_object_type': spec.get('related_object_type'),
+                }
+                for spec in specs
+            )
+        except Exception as e:
+            if raise_errors:
+                raise
+            self.logger.error(f"Erreur lors de la création des notifications in-app: {str(e)}")
+
+        notifications = []
+        for spec in specs:
+            recipient = spec['recipient']
+            if not local_service.is_local_domain(recipient.email):
+                self.logger.warning(f"Destinataire externe ignoré: {recipient.email}")
+                continue
+
+            priority = spec.get('priority', 'medium')
+            digest = digest_service.should_defer(recipient, priority)
+            notifications.append(EmailNotification(
+                recipient=recipient,
+                subject=spec['subject'],
+                message=spec['message'],
+                notification_type=spec['notification_type'],
+                priority=priority,
+                send_immediately=spec.get('send_immediately', False) and not digest,
+                digest=digest,
+                scheduled_send_time=spec.get('scheduled_send_time'),
+                related_object_id=spec.get('related_object_id'),
+                related_object_type=spec.get('related_object_type')
+            ))
+
+        if not notifications:
+            return []
+
+        try:
+            with transaction.atomic():
+                if connection.features.can_return_rows_from_bulk_insert:
+                    created = EmailNotification.objects.bulk_create(notifications, batch_size=500)
+                else:
+                    # MySQL ne renvoie pas les identifiants d'une insertion
+                    # groupée: les logs et l'envoi immédiat en ont besoin
+                    for notification in notifications:
+                        notification.save(force_insert=True)
+                    created = notifications
+                EmailLog.objects.bulk_create([
+                    EmailLog(
+                        notification=notification,
+                        action='created',
+                        details=f"Notification créée pour {notification.recipient.email} "
+                                f"(domaine local{', résumé' if notification.digest else ''})"
+                    )
+                    for notification in created
+                ], batch_size=500)
+        except Exception as e:
+            if raise_errors:
+                raise
+            self.logger.error(f"Erreur lors de la création groupée des notifications: {str(e)}")
+            return []
+
+        self.logger.info(f"{len(created)} notifications créées en lot")
+
+        immediate = [notification.id for notification in created if notification.send_immediately]
+        if immediate:
+            # Après validation: une erreur SMTP ne peut pas annuler les
+            # écritures de l'appelant, ni un envoi partir pour une transaction annulée
+            transaction.on_commit(lambda: self._send_each(immediate))
+
+        return created
+
+    def _send_each(self, notification_ids: List[int]):
+        """Envoyer les notifications une à une: un échec n'arrête pas les suivantes"""
+        for notification_id in notification_ids:
+            try:
+                self.send_notification(notification_id)
+            except Exception as e:
+                self.logger.error(f"Erreur lors de l'envoi de la notification {notification_id}: {str(e)}")
+
     def send_notification(self, notification_id: int) -> bool:
         """
         Envoyer une notification email
         """
         try:
+            # Réserver la notification: un autre envoi (immédiat, files de
+            # priorité, relances) a pu la prendre entre-temps
+            if not EmailNotification.objects.claim(notification_id, claim_lease()):
+                if EmailNotification.objects.filter(id=notification_id).exists():
+                    self.logger.info(f"Notification {notification_id} déjà envoyée ou en cours d'envoi")
+                    return False
+                raise EmailNotification.DoesNotExist
             notification = EmailNotification.objects.get(id=notification_id)
             
+            # Ne pas solliciter le relais SMTP pendant une coupure du disjoncteur
+            breaker = SMTPCircuitBreaker()
+            if breaker.is_open():
+                notification.mark_as_deferred("Relais SMTP indisponible", breaker.retry_after())
+                EmailLog.objects.create(
+                    notification=notification,
+                    action='deferred',
+                    details="Envoi reporté: relais SMTP indisponible"
+                )
+                self.logger.warning(f"Notification {notification_id} reportée: relais SMTP indisponible")
+                return False
+            
             # Forcer l'envoi pour toutes les notifications
             # if not notification.is_ready_to_send():
             #     self.logger.warning(f"Notification {notification_id} pas prête à être envoyée")
@@ -169,15 +310,20 @@ class EmailNotificationService:
             )
             
             if result['success']:
+                SMTPCircuitBreaker().record_success()
                 self.logger.info(f"Email envoyé aux domaines locaux: {result['local_sent']}")
                 if result['external_skipped']:
                     self.logger.info(f"Domaines externes ignorés: {result['external_skipped']}")
                 return True
             else:
+                # Un destinataire non local n'indique pas une panne du relais
+                if not result['error'] or not result['error'].startswith('Aucun destinataire local'):
+                    SMTPCircuitBreaker().record_failure()
                 self.logger.error(f"Échec envoi domaines locaux: {result['error']}")
                 return False
             
         except Exception as e:
+            SMTPCircuitBreaker().record_failure()
             self.logger.error(f"Erreur lors de l'envoi de l'email: {str(e)}")
             return False
     
@@ -257,78 +403,77 @@ class EmailNotificationService:
 
     def send_bulk_notifications(self, notification_ids: List[int]) -> Dict[str, int]:
         """
-        Envoyer plusieurs notifications en lot
+        Envoyer plusieurs notifications en lot, en parallèle via le pool de workers
         """
-        results = {'success': 0, 'failed': 0}
-        
-        for notification_id in notification_ids:
-            try:
-                success = self.send_notification(notification_id)
-                if success:
-                    results['success'] += 1
-                else:
-                    results['failed'] += 1
-            except Exception as e:
-                self.logger.error(f"Erreur lors de l'envoi de la notification {notification_id}: {str(e)}")
-                results['failed'] += 1
-        
-        return results
+        return DeliveryPool().deliver(notification_ids, self.send_notification)
 
-    def retry_failed_notifications(self) -> Dict[str, int]:
+    def retry_failed_notifications(self, limit: int = 500) -> Dict[str, int]:
         """
-        Réessayer les notifications échouées
+        Réessayer les notifications échouées dont la prochaine tentative est échue
         """
         from django.db import models
-        failed_notifications = EmailNotification.objects.filter(
-            status='failed'
-        ).exclude(
-            retry_count__gte=models.F('max_retries')
-        )
         
-        results = {'success': 0, 'failed': 0}
-        
-        for notification in failed_notifications:
-            try:
-                success = self.send_notification(notification.id)
-                if success:
-                    results['success'] += 1
-                else:
-                    results['failed'] += 1
-            except Exception as e:
-                self.logger.error(f"Erreur lors de la retry de la notification {notification.id}: {str(e)}")
-                results['failed'] += 1
+        if SMTPCircuitBreaker().is_open():
+            self.logger.warning("Relais SMTP indisponible, relances reportées")
+            return {'success': 0, 'failed': 0, 'deferred': 0}
+        
+        now = timezone.now()
+        released = EmailNotification.objects.release_expired_claims(now)
+        if released:
+            self.logger.warning(f"{released} réservations d'envoi expirées rendues aux relances")
+        due_ids = list(
+            EmailNotification.objects
+            .filter(status='failed', retry_count__lt=models.F('max_retries'))
+            .filter(models.Q(next_attempt_at__lte=now) | models.Q(next_attempt_at__isnull=True))
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:limit]
+        )
         
+        results = DeliveryPool().deliver(due_ids, self.send_notification)
+        self.logger.info(
+            f"Relances: {results['success']} réussies, {results['failed']} échouées, "
+            f"{results['deferred']} reportées"
+        )
         return results
 
-    def get_notification_stats(self) -> Dict[str, Any]:
+    def send_pending_notifications(self, max_rounds: int = 10) -> Dict[str, Dict]:
         """
-        Obtenir les statistiques des notifications
+        Envoyer les notifications en attente par files de priorité
         """
-        from django.db.models import Count
-        
-        stats = {
-            'total': EmailNotification.objects.count(),
-            'pending': EmailNotification.objects.filter(status='pending').count(),
-            'sent': EmailNotification.objects.filter(status='sent').count(),
-            'failed': EmailNotification.objects.filter(status='failed').count(),
-            'delivered': EmailNotification.objects.filter(status='delivered').count(),
-        }
+        dispatcher = PriorityLaneDispatcher()
+        totals = {}
         
-        # Statistiques par type
-        stats['by_type'] = dict(
-            EmailNotification.objects.values('notification_type')
-            .annotate(count=Count('id'))
-            .values_list('notification_type', 'count')
-        )
-        
-        # Statistiques par priorité
-        stats['by_priority'] = dict(
-            EmailNotification.objects.values('priority')
-            .annotate(count=Count('id'))
-            .values_list('priority', 'count')
-        )
-        
-        return stats
+        for _ in range(max_rounds):
+            if SMTPCircuitBreaker().is_open():
+                self.logger.warning("Relais SMTP indisponible, envois en attente reportés")
+                break
+            
+            lanes = dispatcher.load_lanes()
+            if not any(lane.items for lane in lanes):
+                break
+            
+            for lane, stats in dispatcher.dispatch(self.send_notification, lanes).items():
+                lane_totals = totals.setdefault(lane, dict.fromkeys(stats, 0))
+                for key, value in stats.items():
+                    if key == 'max_wait_seconds':
+                        lane_totals[key] = max(lane_totals[key], value)
+                    else:
+                        lane_totals[key] += value
+        
+        return totals
+
+    def get_queue_stats(self) -> Dict[str, Dict]:
+        """
+        Profondeur et temps d'attente de chaque file de priorité
+        """
+        return get_lane_stats()
+
+    def get_notification_stats(self) -> Dict[str, Any]:
+        """
+        Obtenir les statistiques des notifications (une requête, en cache)
+        """
+        from .stats_service import NotificationStatsService
+        return NotificationStatsService().get_global_stats()
 
 
 # =============================================================================
@@ -343,6 +488,24 @@ class ModuleNotificationService:
     def __init__(self, module_name: str):
         self.module_name = module_name
         self.email_service = EmailNotificationService()
+        self.logger = logger
+        self._batch = None
+
+    @contextmanager
+    def batch(self, raise_errors=False):
+        """
+        Regrouper toutes les notifications émises dans le bloc en une seule
+        écriture groupée à la sortie du bloc (raise_errors: voir
+        create_notifications_bulk)
+        """
+        self._batch = []
+        try:
+            yield self
+            specs = self._batch
+            self._batch = None
+            self.email_service.create_notifications_bulk(specs, raise_errors=raise_errors)
+        finally:
+            self._batch = None
     
     def notify_generic(
         self,
@@ -379,6 +542,23 @@ class ModuleNotificationService:
             external_emails = [r.email for r in external_recipients]
             self.logger.info(f"Destinataires externes ignorés pour {self.module_name}: {external_emails}")
         
+        if self._batch is not None:
+            # Mode lot: les notifications seront créées à la sortie de batch()
+            self._batch.extend(
+                {
+                    'recipient': recipient,
+                    'subject': f"[{self.module_name.upper()}] {subject}",
+                    'message': message,
+                    'notification_type': notification_type,
+                    'priority': priority,
+                    'related_object_id': related_object_id,
+                    'related_object_type': related_object_type,
+                    'send_immediately': send_immediately,
+                }
+                for recipient in local_recipients
+            )
+            return []
+        
         notifications = []
         for recipient in local_recipients:
             notification = self.email_service.create_notification(
@@ -561,18 +741,7 @@ class ProjectNotificationService(ModuleNotificationService):
         """
         
         # Notifier tous les membres du projet
-        recipients = []
-        
-        # Vérifier si le projet a un champ members
-        if hasattr(project, 'members'):
-            if hasattr(project.members, 'all'):
-                recipients = list(project.members.all())
-            else:
-                recipients = list(project.members)
-        
-        # Ajouter le manager si pas déjà dans la liste
-        if hasattr(project, 'manager') and project.manager and project.manager not in recipients:
-            recipients.append(project.manager)
+        recipients = self._get_project_recipients(project)
         
         for member in recipients:
             self.notify_generic(
@@ -603,18 +772,7 @@ class ProjectNotificationService(ModuleNotificationService):
         """
         
         # Notifier tous les membres du projet
-        recipients = []
-        
-        # Vérifier si le projet a un champ members
-        if hasattr(project, 'members'):
-            if hasattr(project.members, 'all'):
-                recipients = list(project.members.all())
-            else:
-                recipients = list(project.members)
-        
-        # Ajouter le manager si pas déjà dans la liste
-        if hasattr(project, 'manager') and project.manager and project.manager not in recipients:
-            recipients.append(project.manager)
+        recipients = self._get_project_recipients(project)
         
         for member in recipients:
             self.notify_generic(
@@ -646,18 +804,7 @@ class ProjectNotificationService(ModuleNotificationService):
         """
         
         # Notifier tous les membres du projet
-        recipients = []
-        
-        # Vérifier si le projet a un champ members
-        if hasattr(project, 'members'):
-            if hasattr(project.members, 'all'):
-                recipients = list(project.members.all())
-            else:
-                recipients = list(project.members)
-        
-        # Ajouter le manager si pas déjà dans la liste
-        if hasattr(project, 'manager') and project.manager and project.manager not in recipients:
-            recipients.append(project.manager)
+        recipients = self._get_project_recipients(project)
         
         for member in recipients:
             self.notify_generic(
@@ -671,6 +818,15 @@ class ProjectNotificationService(ModuleNotificationService):
                 send_immediately=False
             )
     
+    def _get_project_recipients(self, project):
+        """Membres de l'équipe et chef de projet (utilise les données préchargées)"""
+        recipients = list(project.team.all()) if hasattr(project, 'team') else []
+        
+        # Ajouter le manager si pas déjà dans la liste
+        if getattr(project, 'manager', None) and project.manager not in recipients:
+            recipients.append(project.manager)
+        return recipients
+    
     def _format_project_team(self, project):
         """Formater l'équipe du projet"""
         team_members = []
@@ -729,7 +885,7 @@ class TaskNotificationService(ModuleNotificationService):
         • Échéance: {task.due_date.strftime('%d/%m/%Y') if hasattr(task, 'due_date') and task.due_date else 'Non définie'}
         • Priorité: {getattr(task, 'priority', 'Moyenne')}
         
-        👤 **Assigné à:** {task.assigned_to.get_full_name() if hasattr(task, 'assigned_to') and task.assigned_to else 'Non assigné'}
+        👤 **Assigné à:** {self._get_task_assignee(task).get_full_name() if self._get_task_assignee(task) else 'Non assigné'}
         📁 **Projet:** {task.project.name if hasattr(task, 'project') and task.project else 'Aucun projet'}
         
         🔗 **Accès direct:** Vous pouvez accéder à la tâche directement depuis cette notification.
@@ -737,8 +893,9 @@ class TaskNotificationService(ModuleNotificationService):
         
         # Notifier l'assigné et le créateur
         recipients = []
-        if hasattr(task, 'assigned_to') and task.assigned_to:
-            recipients.append(task.assigned_to)
+        assignee = self._get_task_assignee(task)
+        if assignee:
+            recipients.append(assignee)
         if creator not in recipients:
             recipients.append(creator)
         
@@ -777,10 +934,12 @@ class TaskNotificationService(ModuleNotificationService):
         
         # Notifier l'assigné et le créateur
         recipients = []
-        if hasattr(task, 'assigned_to') and task.assigned_to:
-            recipients.append(task.assigned_to)
-        if hasattr(task, 'created_by') and task.created_by:
-            recipients.append(task.created_by)
+        assignee = self._get_task_assignee(task)
+        if assignee:
+            recipients.append(assignee)
+        creator = getattr(task, 'created_by', None) or getattr(task, 'reporter', None)
+        if creator and creator not in recipients:
+            recipients.append(creator)
         
         for recipient in recipients:
             self.notify_generic(
@@ -801,6 +960,7 @@ class TaskNotificationService(ModuleNotificationService):
         priority = 'urgent' if days_before <= 1 else 'high' if days_before <= 3 else 'medium'
         emoji = '🚨' if days_before <= 1 else '⚠️' if days_before <= 3 else '📅'
         
+        assignee = self._get_task_assignee(task)
         subject = f"{emoji} Rappel échéance tâche: {task.title}"
         message = f"""
         {emoji} **Attention!** L'échéance de la tâche "{task.title}" approche.
@@ -808,15 +968,15 @@ class TaskNotificationService(ModuleNotificationService):
         📅 **Échéance:** {task.due_date.strftime('%d/%m/%Y') if hasattr(task, 'due_date') and task.due_date else 'Non définie'}
         ⏰ **Jours restants:** {days_before} jour{'s' if days_before > 1 else ''}
         📊 **Statut:** {getattr(task, 'status', 'En cours')}
-        👤 **Assigné à:** {task.assigned_to.get_full_name() if hasattr(task, 'assigned_to') and task.assigned_to else 'Non assigné'}
+        👤 **Assigné à:** {assignee.get_full_name() if assignee else 'Non assigné'}
         
         🔗 **Action requise:** Vérifiez l'avancement de la tâche et prenez les mesures nécessaires.
         """
         
         # Notifier l'assigné
-        if hasattr(task, 'assigned_to') and task.assigned_to:
+        if assignee:
             self.notify_generic(
-                recipients=[task.assigned_to],
+                recipients=[assignee],
                 subject=subject,
                 message=message,
                 notification_type='task_deadline_approaching',
@@ -830,21 +990,22 @@ class TaskNotificationService(ModuleNotificationService):
         """
         Notifier que l'échéance de la tâche est atteinte
         """
+        assignee = self._get_task_assignee(task)
         subject = f"⏰ Échéance atteinte: {task.title}"
         message = f"""
         ⏰ **L'échéance de la tâche "{task.title}" est atteinte aujourd'hui!**
         
         📅 **Date d'échéance:** {task.due_date.strftime('%d/%m/%Y') if hasattr(task, 'due_date') and task.due_date else 'Non définie'}
         📊 **Statut actuel:** {getattr(task, 'status', 'En cours')}
-        👤 **Assigné à:** {task.assigned_to.get_full_name() if hasattr(task, 'assigned_to') and task.assigned_to else 'Non assigné'}
+        👤 **Assigné à:** {assignee.get_full_name() if assignee else 'Non assigné'}
         
         🔗 **Action urgente:** Vérifiez immédiatement l'état de la tâche et mettez à jour le statut.
         """
         
         # Notifier l'assigné
-        if hasattr(task, 'assigned_to') and task.assigned_to:
+        if assignee:
             self.notify_generic(
-                recipients=[task.assigned_to],
+                recipients=[assignee],
                 subject=subject,
                 message=message,
                 notification_type='task_deadline_reached',
@@ -858,6 +1019,7 @@ class TaskNotificationService(ModuleNotificationService):
         """
         Notifier qu'une tâche est en retard
         """
+        assignee = self._get_task_assignee(task)
         subject = f"🚨 Tâche en retard: {task.title}"
         message = f"""
         🚨 **URGENT!** La tâche "{task.title}" est en retard.
@@ -865,18 +1027,18 @@ class TaskNotificationService(ModuleNotificationService):
         📅 **Échéance prévue:** {task.due_date.strftime('%d/%m/%Y') if hasattr(task, 'due_date') and task.due_date else 'Non définie'}
         ⏰ **Retard:** {days_overdue} jour{'s' if days_overdue > 1 else ''}
         📊 **Statut:** {getattr(task, 'status', 'En cours')}
-        👤 **Assigné à:** {task.assigned_to.get_full_name() if hasattr(task, 'assigned_to') and task.assigned_to else 'Non assigné'}
+        👤 **Assigné à:** {assignee.get_full_name() if assignee else 'Non assigné'}
         
         🔗 **Action immédiate:** Contactez l'assigné et prenez des mesures correctives.
         """
         
         # Notifier l'assigné et le chef de projet
         recipients = []
-        if hasattr(task, 'assigned_to') and task.assigned_to:
-            recipients.append(task.assigned_to)
-        if hasattr(task, 'project') and task.project and hasattr(task.project, 'project_manager'):
-            if task.project.project_manager and task.project.project_manager not in recipients:
-                recipients.append(task.project.project_manager)
+        if assignee:
+            recipients.append(assignee)
+        manager = getattr(getattr(task, 'project', None), 'manager', None)
+        if manager and manager not in recipients:
+            recipients.append(manager)
         
         for recipient in recipients:
             self.notify_generic(
@@ -925,6 +1087,10 @@ class TaskNotificationService(ModuleNotificationService):
                 send_immediately=False
             )
     
+    def _get_task_assignee(self, task):
+        """Assigné de la tâche"""
+        return getattr(task, 'assignee', None) or getattr(task, 'assigned_to', None)
+    
     def _format_task_changes(self, changes):
         """Formater les changements de tâche"""
         if not changes:
@@ -0,0 +1,174 @@
+"""
+Service de statistiques des notifications: agrégation en une requête,
+cache court et agrégats journaliers
+"""
+import logging
+from datetime import datetime, time, timedelta
+from typing import Any, Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import EmailNotification, NotificationDailyStat
+
+logger = logging.getLogger(__name__)
+
+STATUSES = [status for status, _ in EmailNotification.STATUS_CHOICES]
+
+
+class NotificationStatsService:
+    """
+    Service pour calculer les statistiques des notifications
+    """
+
+    GLOBAL_CACHE_KEY = 'notifications:stats:global'
+
+    def __init__(self):
+        self.logger = logger
+        self.ttl = getattr(settings, 'NOTIFICATION_STATS_CACHE_TTL', 60)
+
+    def get_global_stats(self) -> Dict[str, Any]:
+        """
+        Statistiques globales, mises en cache quelques secondes: les jours
+        déjà agrégés sont lus dans NotificationDailyStat, seuls les jours
+        non agrégés (aujourd'hui, hier avant le passage du rollup, historique
+        antérieur au premier agrégat) sont comptés dans la table brute, par
+        plages de l'index created_at
+        """
+        stats = cache.get(self.GLOBAL_CACHE_KEY)
+        if stats is not None:
+            return stats
+
+        stats = {'total': 0, **dict.fromkeys(STATUSES, 0), 'by_type': {}, 'by_priority': {}}
+        today = timezone.localdate()
+        rolled_up = NotificationDailyStat.objects.filter(date__lt=today)
+        bounds = rolled_up.aggregate(first=Min('date'), last=Max('date'))
+
+        raw = EmailNotification.objects.order_by()
+        if bounds['first'] is None:
+            raw_ranges = [raw]
+        else:
+            rollup_rows = (
+                rolled_up
+                .order_by()
+                .values('notification_type', 'priority', 'status')
+                .annotate(count=Sum('count'))
+            )
+            for row in rollup_rows:
+                self._accumulate(stats, row)
+            raw_ranges = [
+                raw.filter(created_at__lt=self._day_start(bounds['first'])),
+                raw.filter(created_at__gte=self._day_start(bounds['last'] + timedelta(days=1))),
+            ]
+
+        for queryset in raw_ranges:
+            rows = queryset.values('notification_type', 'priority', 'status').annotate(count=Count('id'))
+            for row in rows:
+                self._accumulate(stats, row)
+
+        cache.set(self.GLOBAL_CACHE_KEY, stats, self.ttl)
+        return stats
+
+    @staticmethod
+    def _day_start(day):
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def get_user_stats(self, user) -> Dict[str, int]:
+        """
+        Statistiques d'un utilisateur: une agrégation conditionnelle, en cache
+        """
+        key = f'notifications:stats:user:{user.pk}'
+        stats = cache.get(key)
+        if stats is not None:
+            return stats
+
+        stats = EmailNotification.objects.recent().filter(recipient=user).aggregate(
+            user_total=Count('id'),
+            user_pending=Count('id', filter=Q(status='pending')),
+            user_sent=Count('id', filter=Q(status='sent')),
+            user_failed=Count('id', filter=Q(status='failed')),
+        )
+        cache.set(key, stats, self.ttl)
+        return stats
+
+    def rollup(self, start_date, end_date=None) -> int:
+        """
+        Recalculer les agrégats journaliers de start_date à end_date inclus
+        (une requête de lecture, puis remplacement des lignes en une transaction)
+        """
+        end_date = end_date or start_date
+        start = timezone.make_aware(datetime.combine(start_date, time.min))
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+
+        rows = (
+            EmailNotification.objects
+            .filter(created_at__gte=start, created_at__lt=end)
+            .annotate(day=TruncDate('created_at'))
+            .order_by()
+            .values('day', 'notification_type', 'status', 'priority')
+            .annotate(count=Count('id'))
+        )
+        entries = [
+            NotificationDailyStat(
+                date=row['day'],
+                notification_type=row['notification_type'],
+                status=row['status'],
+                priority=row['priority'],
+                count=row['count'],
+            )
+            for row in rows
+        ]
+
+        with transaction.atomic():
+            NotificationDailyStat.objects.filter(date__gte=start_date, date__lte=end_date).delete()
+            NotificationDailyStat.objects.bulk_create(entries, batch_size=1000)
+
+        self.logger.info(f"Agrégats journaliers recalculés du {start_date} au {end_date}: {len(entries)} lignes")
+        return len(entries)
+
+    def get_history(self, days: int = 30) -> Dict[str, Any]:
+        """
+        Statistiques des `days` derniers jours lues dans les agrégats journaliers
+        (jours écoulés) complétés par la table brute pour aujourd'hui uniquement
+        """
+        today = timezone.localdate()
+        start_date = today - timedelta(days=days - 1)
+
+        stats = {'total': 0, **dict.fromkeys(STATUSES, 0), 'by_type': {}, 'by_priority': {}, 'by_day': {}}
+
+        rollup_rows = (
+            NotificationDailyStat.objects
+            .filter(date__gte=start_date, date__lt=today)
+            .values('date', 'notification_type', 'priority', 'status')
+            .annotate(count=Sum('count'))
+        )
+        today_start = timezone.make_aware(datetime.combine(today, time.min))
+        today_rows = (
+            EmailNotification.objects
+            .filter(created_at__gte=today_start)
+            .order_by()
+            .values('notification_type', 'priority', 'status')
+            .annotate(count=Count('id'))
+        )
+
+        for row in rollup_rows:
+            self._accumulate(stats, row, row['date'])
+        for row in today_rows:
+            self._accumulate(stats, row, today)
+
+        stats['by_day'] = {day.isoformat(): count for day, count in sorted(stats['by_day'].items())}
+        return stats
+
+    def _accumulate(self, stats: Dict[str, Any], row: Dict[str, Any], day=None):
+        """Ajouter une ligne groupée aux totaux"""
+        count = row['count']
+        stats['total'] += count
+        stats[row['status']] = stats.get(row['status'], 0) + count
+        stats['by_type'][row['notification_type']] = stats['by_type'].get(row['notification_type'], 0) + count
+        stats['by_priority'][row['priority']] = stats['by_priority'].get(row['priority'], 0) + count
+        if day is not None:
+            stats['by_day'][day] = stats['by_day'].get(day, 0) + count
@@ -1,3 +1,281 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import count
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .delivery import PriorityLaneDispatcher, _Lane, claim_lease, dispatchable
+from .models import EmailNotification, SchedulerJobRun, SchedulerLock
+from .scheduler import LEADER_LOCK_NAME, CronSchedule, LeaseHeartbeat, NotificationScheduler, ScheduledJob
+
+User = get_user_model()
+
+
+class CronScheduleTests(TestCase):
+    """
+    Correspondance des expressions cron avec une minute donnée
+    """
+
+    def at(self, day, hour, minute):
+        # 2026-10-19 est un lundi
+        return datetime(2026, 10, day, hour, minute)
+
+    def test_step_on_minutes(self):
+        schedule = CronSchedule('*/15 * * * *')
+        self.assertTrue(schedule.matches(self.at(19, 10, 0)))
+        self.assertTrue(schedule.matches(self.at(19, 10, 45)))
+        self.assertFalse(schedule.matches(self.at(19, 10, 5)))
+
+    def test_fixed_time(self):
+        schedule = CronSchedule('0 7 * * *')
+        self.assertTrue(schedule.matches(self.at(20, 7, 0)))
+        self.assertFalse(schedule.matches(self.at(20, 7, 1)))
+        self.assertFalse(schedule.matches(self.at(20, 8, 0)))
+
+    def test_ranges_lists_and_steps(self):
+        self.assertEqual(CronSchedule('10-30/10 * * * *').minutes, {10, 20, 30})
+        self.assertEqual(CronSchedule('5/15 * * * *').minutes, {5, 20, 35, 50})
+        self.assertEqual(CronSchedule('1,2,40-42 * * * *').minutes, {1, 2, 40, 41, 42})
+
+    def test_weekdays_sunday_is_zero(self):
+        schedule = CronSchedule('0 9 * * 1-5')
+        self.assertTrue(schedule.matches(self.at(19, 9, 0)))   # lundi
+        self.assertFalse(schedule.matches(self.at(25, 9, 0)))  # dimanche
+        self.assertTrue(CronSchedule('0 9 * * 0').matches(self.at(25, 9, 0)))
+
+    def test_day_of_month_or_weekday(self):
+        # Comme cron: les deux champs restreints, l'un ou l'autre suffit
+        schedule = CronSchedule('0 0 1 * 0')
+        self.assertTrue(schedule.matches(datetime(2026, 10, 1, 0, 0)))   # jeudi 1er
+        self.assertTrue(schedule.matches(self.at(25, 0, 0)))             # dimanche
+        self.assertFalse(schedule.matches(self.at(19, 0, 0)))            # lundi 19
+
+    def test_invalid_expressions(self):
+        for expression in ('* * *', '60 * * * *', '*/0 * * * *', '0 24 * * *', '0 0 0 * *'):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    CronSchedule(expression)
+
+
+class SchedulerLeaseTests(TestCase):
+    """
+    Bail de leader: exclusion, expiration, reprise et exécutions perdues
+    """
+
+    def make_scheduler(self, node):
+        return NotificationScheduler(jobs={}, lease_seconds=90, node=node)
+
+    def expire_lease(self):
+        SchedulerLock.objects.filter(name=LEADER_LOCK_NAME).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def take_over(self, node='other'):
+        SchedulerLock.objects.filter(name=LEADER_LOCK_NAME).update(
+            owner=node, expires_at=timezone.now() + timedelta(seconds=90)
+        )
+
+    def test_single_leader(self):
+        first, second = self.make_scheduler('a'), self.make_scheduler('b')
+        self.assertTrue(first.acquire_leadership())
+        self.assertFalse(second.acquire_leadership())
+        # Le leader renouvelle son propre bail
+        self.assertTrue(first.acquire_leadership())
+        self.assertTrue(first.renew_leadership())
+
+    def test_expired_lease_is_taken_over(self):
+        first, second = self.make_scheduler('a'), self.make_scheduler('b')
+        first.acquire_leadership()
+        self.expire_lease()
+
+        self.assertTrue(second.acquire_leadership())
+        self.assertEqual(SchedulerLock.objects.get(name=LEADER_LOCK_NAME).owner, 'b')
+        self.assertFalse(first.renew_leadership())
+        self.assertFalse(first.holds_leadership())
+        self.assertFalse(first.acquire_leadership())
+
+    def test_expired_lease_is_not_renewed(self):
+        scheduler = self.make_scheduler('a')
+        scheduler.acquire_leadership()
+        self.expire_lease()
+        # Un bail expiré se reprend par acquire_leadership, pas par renew
+        self.assertFalse(scheduler.renew_leadership())
+
+    def test_run_recorded_while_lease_held(self):
+        scheduler = self.make_scheduler('a')
+        scheduler.acquire_leadership()
+        run = scheduler.run_job(ScheduledJob('noop', '* * * * *', lambda: None))
+        self.assertIsNotNone(run)
+        self.assertEqual(run.status, 'success')
+        self.assertEqual(run.node, 'a')
+
+    def test_run_not_recorded_after_takeover(self):
+        scheduler = self.make_scheduler('a')
+        scheduler.acquire_leadership()
+        run = scheduler.run_job(ScheduledJob('stolen', '* * * * *', self.take_over))
+        self.assertIsNone(run)
+        self.assertFalse(SchedulerJobRun.objects.exists())
+
+    def test_job_not_started_without_lease(self):
+        calls = []
+        scheduler = self.make_scheduler('a')
+        scheduler.acquire_leadership()
+        self.take_over()
+        self.assertIsNone(scheduler.run_job(ScheduledJob('late', '* * * * *', lambda: calls.append(1))))
+        self.assertEqual(calls, [])
+
+    def test_tick_stops_after_lost_lease(self):
+        calls = []
+        scheduler = self.make_scheduler('a')
+        scheduler.jobs = [
+            ScheduledJob('stolen', '* * * * *', self.take_over),
+            ScheduledJob('next', '* * * * *', lambda: calls.append('next')),
+        ]
+        self.assertEqual(scheduler.tick(), [])
+        self.assertEqual(calls, [])
+        self.assertIsNone(scheduler.last_tick)
+
+
+class LeaseHeartbeatTests(TestCase):
+    """
+    Renouvellement du bail pendant une tâche
+    """
+
+    def make_scheduler(self, renewals):
+        calls = []
+
+        def renew_leadership():
+            calls.append(1)
+            return renewals(len(calls))
+
+        scheduler = SimpleNamespace(
+            renew_leadership=renew_leadership, node='a', logger=SimpleNamespace(warning=lambda message: None)
+        )
+        return scheduler, calls
+
+    def test_renews_while_running(self):
+        scheduler, calls = self.make_scheduler(lambda n: True)
+        with LeaseHeartbeat(scheduler, 0.01) as heartbeat:
+            time.sleep(0.1)
+        self.assertGreaterEqual(len(calls), 2)
+        self.assertFalse(heartbeat.lost)
+
+    def test_stops_when_lease_lost(self):
+        scheduler, calls = self.make_scheduler(lambda n: n < 2)
+        with LeaseHeartbeat(scheduler, 0.01) as heartbeat:
+            time.sleep(0.1)
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(heartbeat.lost)
+
+
+class PriorityLaneTests(TestCase):
+    """
+    Ordonnancement des files: round-robin pondéré et limite d'envois simultanés
+    """
+
+    CONFIG = [('urgent', 8, 4), ('high', 4, 3), ('medium', 2, 2), ('low', 1, 1)]
+
+    def make_lanes(self, size, config=CONFIG):
+        now = timezone.now()
+        ids = count(1)
+        lanes = [
+            _Lane(name, weight, concurrency, [(next(ids), now) for _ in range(size)])
+            for name, weight, concurrency in config
+        ]
+        lane_of = {item[0]: lane.name for lane in lanes for item in lane.items}
+        return lanes, lane_of
+
+    def make_dispatcher(self, workers):
+        return PriorityLaneDispatcher(max_workers=workers, breaker=SimpleNamespace(is_open=lambda: False))
+
+    def test_weighted_share(self):
+        lanes, lane_of = self.make_lanes(60)
+        order = []
+
+        def send(notification_id):
+            order.append(lane_of[notification_id])
+            return True
+
+        results = self.make_dispatcher(1).dispatch(send, lanes)
+
+        # Chaque cycle de 15 envois respecte les poids 8/4/2/1: « low » n'est jamais affamée
+        for start in (0, 15, 30):
+            cycle = order[start:start + 15]
+            self.assertEqual(
+                {name: cycle.count(name) for name, _, _ in self.CONFIG},
+                {'urgent': 8, 'high': 4, 'medium': 2, 'low': 1},
+            )
+        self.assertEqual(
+            {name: stats['success'] for name, stats in results.items()},
+            dict.fromkeys(lane_of.values(), 60),
+        )
+
+    def test_concurrency_limit_per_lane(self):
+        lanes, lane_of = self.make_lanes(12, [('urgent', 1, 4), ('low', 8, 1)])
+        lock = threading.Lock()
+        in_flight = {'urgent': 0, 'low': 0}
+        peak = {'urgent': 0, 'low': 0}
+
+        def send(notification_id):
+            lane = lane_of[notification_id]
+            with lock:
+                in_flight[lane] += 1
+                peak[lane] = max(peak[lane], in_flight[lane])
+            time.sleep(0.005)
+            with lock:
+                in_flight[lane] -= 1
+            return True
+
+        results = self.make_dispatcher(5).dispatch(send, lanes)
+
+        # Malgré son poids, « low » ne dépasse jamais un envoi à la fois
+        self.assertEqual(peak['low'], 1)
+        self.assertGreater(peak['urgent'], 1)
+        self.assertEqual(results['low']['success'] + results['urgent']['success'], 24)
+
+
+class NotificationClaimTests(TestCase):
+    """
+    Réservation des notifications avant envoi et reprise des notifications en attente
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='claim', email='claim@example.com', password='x')
+
+    def create(self, **fields):
+        fields.setdefault('subject', 'Sujet')
+        fields.setdefault('message', 'Message')
+        fields.setdefault('notification_type', 'system_alert')
+        return EmailNotification.objects.create(recipient=self.user, **fields)
+
+    def test_single_claim(self):
+        notification = self.create()
+        self.assertTrue(EmailNotification.objects.claim(notification.id, claim_lease()))
+        self.assertFalse(EmailNotification.objects.claim(notification.id, claim_lease()))
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'sending')
+
+    def test_sent_notification_not_claimed(self):
+        notification = self.create(status='sent')
+        self.assertFalse(EmailNotification.objects.claim(notification.id, claim_lease()))
+
+    def test_expired_claim_released_to_retries(self):
+        notification = self.create()
+        EmailNotification.objects.claim(notification.id, timedelta(seconds=-1))
+        self.assertEqual(EmailNotification.objects.release_expired_claims(), 1)
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.retry_count), ('failed', 1))
+
+    @override_settings(NOTIFICATION_DELIVERY={'pending_max_age_seconds': 3600})
+    def test_old_pending_rows_not_dispatched(self):
+        recent = self.create()
+        old = self.create()
+        queued = self.create(send_immediately=False, scheduled_send_time=timezone.now() - timedelta(days=2))
+        EmailNotification.objects.filter(id__in=[old.id, queued.id]).update(created_at=timezone.now() - timedelta(days=3))
+
+        ids = set(dispatchable(EmailNotification.objects.all()).values_list('id', flat=True))
+        self.assertEqual(ids, {recent.id, queued.id})
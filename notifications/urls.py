@@ -10,11 +10,19 @@ urlpatterns = [
     path('send/', views.send_notification, name='send-notification'),
     path('send-bulk/', views.send_bulk_notifications, name='send-bulk-notifications'),
     path('stats/', views.notification_stats, name='notification-stats'),
+    path('stats/history/', views.notification_stats_history, name='notification-stats-history'),
+    path('queue-stats/', views.notification_queue_stats, name='notification-queue-stats'),
     path('user/', views.user_notifications, name='user-notifications'),
     path('<int:notification_id>/mark-read/', views.mark_as_read, name='mark-as-read'),
     path('<int:notification_id>/delete/', views.delete_notification, name='delete-notification'),
     path('<int:notification_id>/logs/', views.notification_logs, name='notification-logs'),
     
+    # Boîte de réception in-app
+    path('inbox/', views.inbox, name='inbox'),
+    path('inbox/unread-count/', views.inbox_unread_count, name='inbox-unread-count'),
+    path('inbox/<int:notification_id>/read/', views.inbox_mark_read, name='inbox-mark-read'),
+    path('inbox/mark-all-read/', views.inbox_mark_all_read, name='inbox-mark-all-read'),
+    
     # Templates
     path('templates/', views.EmailTemplateListCreateView.as_view(), name='template-list-create'),
     path('templates/<int:pk>/', views.EmailTemplateDetailView.as_view(), name='template-detail'),
@@ -5,12 +5,15 @@ from rest_framework.response import Response
 from django.db.models import Q
 from django.utils import timezone
 from django.core.paginator import Paginator
-from .models import EmailNotification, EmailTemplate, EmailLog
+from .models import EmailNotification, EmailTemplate, EmailLog, InAppNotification
 from .services import EmailNotificationService, ProjectNotificationService
+from .inbox import InboxService
+from .stats_service import NotificationStatsService
 from .serializers import (
     EmailNotificationSerializer, 
     EmailTemplateSerializer,
     EmailLogSerializer,
+    InAppNotificationSerializer,
     NotificationStatsSerializer
 )
 from django.db.models import Count
@@ -26,7 +29,7 @@ class EmailNotificationListCreateView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        queryset = EmailNotification.objects.filter(recipient=user)
+        queryset = EmailNotification.objects.recent().filter(recipient=user)
         
         # Filtres
         status_filter = self.request.query_params.get('status')
@@ -77,6 +80,13 @@ def send_notification(request):
             recipient=request.user
         )
         
+        # Seules les notifications en attente ou échouées peuvent être réservées
+        if notification.status not in ('pending', 'failed'):
+            return Response(
+                {'error': 'Notification déjà envoyée ou en cours d\'envoi'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
         service = EmailNotificationService()
         success = service.send_notification(notification.id)
         
@@ -115,31 +125,59 @@ def send_bulk_notifications(request):
     return Response(results)
 
 
+def _is_admin(user):
+    return user.is_superuser or user.role == 'admin'
+
+
+def _admin_required():
+    return Response(
+        {'error': 'Réservé aux administrateurs'},
+        status=status.HTTP_403_FORBIDDEN
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def notification_stats_history(request):
+    """
+    Statistiques des derniers jours, lues dans les agrégats journaliers
+    """
+    if not _is_admin(request.user):
+        return _admin_required()
+    try:
+        days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+    except ValueError:
+        return Response(
+            {'error': 'days doit être un entier'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response(NotificationStatsService().get_history(days))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def notification_queue_stats(request):
+    """
+    Profondeur et temps d'attente des files de priorité
+    """
+    if not _is_admin(request.user):
+        return _admin_required()
+    service = EmailNotificationService()
+    return Response(service.get_queue_stats())
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def notification_stats(request):
     """
     Obtenir les statistiques des notifications
     """
-    service = EmailNotificationService()
-    stats = service.get_notification_stats()
+    stats_service = NotificationStatsService()
+    stats = dict(stats_service.get_global_stats())
     
     # Ajouter des statistiques spécifiques à l'utilisateur
-    user_stats = {
-        'user_total': EmailNotification.objects.filter(recipient=request.user).count(),
-        'user_pending': EmailNotification.objects.filter(
-            recipient=request.user, 
-            status='pending'
-        ).count(),
-        'user_sent': EmailNotification.objects.filter(
-            recipient=request.user, 
-            status='sent'
-        ).count(),
-        'user_failed': EmailNotification.objects.filter(
-            recipient=request.user, 
-            status='failed'
-        ).count(),
-    }
+    user_stats = stats_service.get_user_stats(request.user)
     
     stats.update(user_stats)
     
@@ -155,7 +193,7 @@ def user_notifications(request):
     page = int(request.query_params.get('page', 1))
     page_size = int(request.query_params.get('page_size', 20))
     
-    queryset = EmailNotification.objects.filter(recipient=request.user)
+    queryset = EmailNotification.objects.recent().filter(recipient=request.user)
     
     # Filtres
     status_filter = request.query_params.get('status')
@@ -236,6 +274,73 @@ def delete_notification(request, notification_id):
         )
 
 
+# Vues pour la boîte de réception in-app
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def inbox(request):
+    """
+    Obtenir la boîte de réception de l'utilisateur avec pagination
+    """
+    page = int(request.query_params.get('page', 1))
+    page_size = int(request.query_params.get('page_size', 20))
+    
+    queryset = InAppNotification.objects.filter(recipient=request.user)
+    if request.query_params.get('unread') in ('1', 'true'):
+        queryset = queryset.filter(is_read=False)
+    queryset = queryset.order_by('-created_at')
+    
+    paginator = Paginator(queryset, page_size)
+    page_obj = paginator.get_page(page)
+    
+    serializer = InAppNotificationSerializer(page_obj.object_list, many=True)
+    
+    return Response({
+        'results': serializer.data,
+        'count': paginator.count,
+        'unread_count': InboxService().get_unread_count(request.user),
+        'num_pages': paginator.num_pages,
+        'current_page': page,
+        'has_next': page_obj.has_next(),
+        'has_previous': page_obj.has_previous(),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def inbox_unread_count(request):
+    """
+    Nombre de notifications non lues (badge), servi depuis le cache
+    """
+    return Response({'unread_count': InboxService().get_unread_count(request.user)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def inbox_mark_read(request, notification_id):
+    """
+    Marquer une notification de la boîte de réception comme lue
+    """
+    service = InboxService()
+    service.mark_read(request.user, [notification_id])
+    return Response({
+        'message': 'Notification marquée comme lue',
+        'unread_count': service.get_unread_count(request.user),
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def inbox_mark_all_read(request):
+    """
+    Marquer toute la boîte de réception comme lue
+    """
+    updated = InboxService().mark_all_read(request.user)
+    return Response({
+        'message': f'{updated} notifications marquées comme lues',
+        'unread_count': 0,
+    })
+
+
 # Vues pour les templates
 class EmailTemplateListCreateView(generics.ListCreateAPIView):
     """
@@ -0,0 +1,162 @@
+"""
+Change capture for projects, tasks, notes and task comments.
+
+Tracked field values are remembered when an instance is loaded (post_init)
+and diffed against the instance itself after a save, so capturing a change
+never costs an extra query. Every change becomes an ``ActivityEvent``; events
+of one transaction are written with a single ``bulk_create`` once it commits,
+then published on the real-time channel (``projects.events``).
+
+The diff of the last save is also left on the instance as
+``instance.activity_changes`` ({field: (old, new)}) for in-request consumers
+such as notifications.
+"""
+import contextvars
+import logging
+import threading
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import events
+from .models import ActivityEvent, Project, ProjectNote, Task, TaskComment
+
+logger = logging.getLogger(__name__)
+
+# Tracked fields per model (attribute names)
+TRACKED_FIELDS = {
+    Project: (
+        'name', 'description', 'status', 'priority', 'progress', 'start_date', 'deadline',
+        'completed_date', 'department', 'manager_id', 'budget', 'spent',
+    ),
+    Task: (
+        'title', 'description', 'status', 'priority', 'assignee_id', 'due_date',
+        'completed_date', 'project_id', 'estimated_time', 'actual_time',
+    ),
+    ProjectNote: ('content', 'author_id'),
+    TaskComment: ('content', 'author_id', 'task_id'),
+}
+
+OBJECT_TYPES = {
+    Project: 'project',
+    Task: 'task',
+    ProjectNote: 'note',
+    TaskComment: 'task_comment',
+}
+
+_actor = contextvars.ContextVar('activity_actor', default=None)
+_batches = threading.local()
+
+
+def set_actor(user):
+    """Attribute the following changes to `user`; returns a token for reset_actor"""
+    return _actor.set(user if user is not None and user.is_authenticated else None)
+
+
+def reset_actor(token):
+    _actor.reset(token)
+
+
+def snapshot(instance):
+    """Current values of the tracked fields (deferred fields are left out, never loaded)"""
+    values = instance.__dict__
+    return {name: values[name] for name in TRACKED_FIELDS[type(instance)] if name in values}
+
+
+def diff(initial, current):
+    """{field: (old, new)} for the fields whose value changed"""
+    return {
+        name: (initial.get(name), value)
+        for name, value in current.items()
+        if name not in initial or initial[name] != value
+    }
+
+
+def record_changes(instances, action, using='default'):
+    """
+    Diff each instance against its loaded values and record the events; used
+    by the save signals and by bulk writes, which send no signal
+    """
+    for instance in instances:
+        current = snapshot(instance)
+        initial = {} if action == 'created' else getattr(instance, '_activity_snapshot', {})
+        instance.activity_changes = diff(initial, current)
+        instance._activity_snapshot = current
+        record(instance, action, instance.activity_changes, using=using)
+
+
+def project_id_of(instance):
+    if isinstance(instance, Project):
+        return instance.pk
+    if isinstance(instance, TaskComment):
+        task = TaskComment.task.field.get_cached_value(instance, default=None)
+        if task is not None:
+            return task.project_id
+        return Task.objects.filter(pk=instance.task_id).values_list('project_id', flat=True).first()
+    return instance.project_id
+
+
+class _Batch:
+    """Events of one transaction, written together when it commits"""
+
+    def __init__(self, using):
+        self.using = using
+        self.events = []
+
+    def flush(self):
+        if getattr(_batches, self.using, None) is self:
+            delattr(_batches, self.using)
+        try:
+            ActivityEvent.objects.using(self.using).bulk_create(self.events, batch_size=500)
+        except Exception as e:
+            logger.error(f"Failed to record {len(self.events)} activity events: {e}")
+        for event in self.events:
+            events.publish(event.project_id, to_realtime_event(event))
+
+
+def _current_batch(using):
+    """The batch of the running transaction, registered on commit at first use"""
+    connection = transaction.get_connection(using)
+    batch = getattr(_batches, using, None)
+    # A rolled back transaction drops its commit hook, and its batch with it
+    if batch is not None and not any(hook[1] == batch.flush for hook in connection.run_on_commit):
+        batch = None
+    if batch is None:
+        batch = _Batch(using)
+        setattr(_batches, using, batch)
+        transaction.on_commit(batch.flush, using=using)
+    return batch
+
+
+def record(instance, action, changes, using='default'):
+    """Queue an activity event for `instance`, written when the transaction commits"""
+    actor = _actor.get()
+    event = ActivityEvent(
+        object_type=OBJECT_TYPES[type(instance)],
+        object_id=instance.pk,
+        project_id=project_id_of(instance),
+        action=action,
+        changes={name: [old, new] for name, (old, new) in changes.items()},
+        actor_id=actor.pk if actor is not None else None,
+        created_at=timezone.now(),
+    )
+    if transaction.get_connection(using).in_atomic_block:
+        _current_batch(using).events.append(event)
+    else:
+        # Autocommit: the save is already committed
+        batch = _Batch(using)
+        batch.events.append(event)
+        batch.flush()
+    return event
+
+
+def to_realtime_event(event):
+    """Payload published on the project topic: the new value of each changed field"""
+    return {
+        'type': f"{event.object_type}.{event.action}",
+        'id': event.object_id,
+        'project_id': event.project_id,
+        'fields': {name: values[1] for name, values in event.changes.items()},
+        'actor': event.actor_id,
+        'timestamp': event.created_at.isoformat(),
+    }
@@ -0,0 +1,145 @@
+"""
+In-process publish/subscribe bus for project change events.
+
+Events are small dicts published on per-project topics (``project:<id>``)
+and streamed to browsers by ``stream_views.project_event_stream`` (Server-Sent
+Events). The transport is pluggable through ``settings.PROJECT_EVENTS['backend']``:
+
+- ``projects.events.InProcessBackend`` (default): subscribers live in the
+  same process as the publisher, which is enough for a single ASGI worker.
+- ``projects.events.RedisBackend``: fans events out through Redis pub/sub so
+  every worker sees every event (uses ``REDIS_URL``).
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import AsyncIterator, Dict, Iterable, Set, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_SETTINGS = {
+    'backend': 'projects.events.InProcessBackend',
+    'queue_size': 100,            # Events buffered per subscriber before dropping
+    'heartbeat_seconds': 15,      # Keep-alive comment sent on idle streams
+    'max_stream_seconds': 600,    # Streams are closed then resumed by the client
+}
+
+
+def get_event_setting(name: str):
+    """Read a project events setting (settings.PROJECT_EVENTS or default)"""
+    return getattr(settings, 'PROJECT_EVENTS', {}).get(name, DEFAULT_EVENT_SETTINGS[name])
+
+
+def project_topic(project_id) -> str:
+    return f"project:{project_id}"
+
+
+class InProcessBackend:
+    """
+    Deliver events to subscribers running in this process.
+
+    Publishers may run in any thread (sync views, signal handlers); each
+    subscriber owns an asyncio queue and is fed through its own event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def publish(self, topic: str, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, event)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropping project event for a slow subscriber")
+
+    async def subscribe(self, topics: Iterable[str]) -> AsyncIterator[dict]:
+        topics = list(topics)
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=get_event_setting('queue_size')))
+        with self._lock:
+            for topic in topics:
+                self._subscribers.setdefault(topic, set()).add(entry)
+        try:
+            while True:
+                yield await entry[1].get()
+        finally:
+            with self._lock:
+                for topic in topics:
+                    subscribers = self._subscribers.get(topic)
+                    if subscribers is not None:
+                        subscribers.discard(entry)
+                        if not subscribers:
+                            del self._subscribers[topic]
+
+
+class RedisBackend:
+    """
+    Deliver events through Redis pub/sub so all workers receive them.
+    """
+
+    CHANNEL_PREFIX = 'projects:events:'
+
+    def __init__(self):
+        import redis
+
+        self.url = getattr(settings, 'REDIS_URL', None) or os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+        self._client = redis.Redis.from_url(self.url)
+
+    def publish(self, topic: str, event: dict):
+        try:
+            self._client.publish(self.CHANNEL_PREFIX + topic, json.dumps(event, cls=DjangoJSONEncoder))
+        except Exception as e:
+            logger.error(f"Failed to publish project event on {topic}: {e}")
+
+    async def subscribe(self, topics: Iterable[str]) -> AsyncIterator[dict]:
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(*[self.CHANNEL_PREFIX + topic for topic in topics])
+        try:
+            async for message in pubsub.listen():
+                if message.get('type') == 'message':
+                    yield json.loads(message['data'])
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+            await client.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the configured event backend (created once per process)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(get_event_setting('backend'))()
+    return _backend
+
+
+def publish(project_id, event: dict):
+    """Publish an event on a project's topic."""
+    if project_id is None:
+        return
+    get_backend().publish(project_topic(project_id), event)
+
+
+def subscribe(project_ids: Iterable[int]) -> AsyncIterator[dict]:
+    """Subscribe to the topics of the given projects."""
+    return get_backend().subscribe(project_topic(project_id) for project_id in project_ids)
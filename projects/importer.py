@@ -0,0 +1,306 @@
+"""
+Spreadsheet import of projects and tasks.
+
+An XLSX workbook may hold a ``projects`` sheet and a ``tasks`` sheet; a CSV
+file holds one of them. Column names match the model fields:
+
+- projects: name, description, status, priority, category, department,
+  manager (username), start_date, deadline, budget, tags, project_number
+- tasks: title, project (project number), description, status, priority,
+  task_type, assignee (username), due_date, estimated_time, tags
+
+Validation is column-wise (pandas): choice fields accept values or labels,
+dates and numbers are parsed for the whole column, and usernames and project
+numbers are resolved with one query each, within what the importing user
+may reach: projects of their accessible departments, and managers from those
+departments (any project and user for admins). Nothing is written unless every
+row is valid; rows are then created with chunked ``bulk_create`` inside one
+transaction.
+"""
+import logging
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import activity
+from .models import Project, Task
+from .views import accessible_projects_q
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+KINDS = ('projects', 'tasks')
+
+
+class SpreadsheetImporter:
+    """
+    Validate and import projects and tasks read from a spreadsheet
+    """
+
+    CHUNK_SIZE = 500
+
+    def __init__(self, user):
+        self.user = user
+
+    # Reading
+
+    def read(self, file, filename: str = '', kind: str = None) -> Dict[str, pd.DataFrame]:
+        """Read a CSV or XLSX file into one DataFrame per kind"""
+        filename = (filename or getattr(file, 'name', '') or '').lower()
+        if filename.endswith('.csv'):
+            frames = {'': pd.read_csv(file, dtype=str)}
+        else:
+            frames = pd.read_excel(file, sheet_name=None, dtype=str)
+
+        result = {}
+        for sheet, frame in frames.items():
+            frame = self._normalize(frame)
+            sheet_kind = sheet.strip().lower()
+            if sheet_kind not in KINDS:
+                if len(frames) > 1:
+                    continue
+                sheet_kind = kind or ('tasks' if 'title' in frame.columns else 'projects')
+            result[sheet_kind] = frame
+        return result
+
+    def _normalize(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Lower-case headers, strip cells, blank cells as missing, drop empty rows"""
+        frame = frame.rename(columns=lambda column: str(column).strip().lower())
+        frame = frame.apply(lambda column: column.str.strip())
+        frame = frame.mask(frame == '').dropna(how='all').reset_index(drop=True)
+        return frame
+
+    # Validation helpers
+
+    def _column(self, frame: pd.DataFrame, name: str) -> pd.Series:
+        if name in frame.columns:
+            return frame[name]
+        return pd.Series([None] * len(frame), index=frame.index, dtype=object)
+
+    def _flag(self, errors: pd.Series, mask: pd.Series, message: str):
+        for index in mask[mask].index:
+            errors[index].append(message)
+
+    def _required(self, frame, errors, *names):
+        for name in names:
+            self._flag(errors, self._column(frame, name).isna(), f"{name}: required")
+
+    def _choice(self, frame, errors, model, name) -> pd.Series:
+        """Map values or labels (case-insensitive) to choice values, model default when blank"""
+        field = model._meta.get_field(name)
+        mapping = {}
+        for value, label in field.choices:
+            mapping[str(label).lower()] = value
+            mapping[str(value).lower()] = value
+        raw = self._column(frame, name)
+        values = raw.str.lower().map(mapping)
+        self._flag(errors, raw.notna() & values.isna(), f"{name}: invalid choice")
+        return values.fillna(field.default)
+
+    def _date(self, frame, errors, name) -> pd.Series:
+        raw = self._column(frame, name)
+        # ISO dates first (Excel cells), then day-first dates (31/12/2025)
+        values = pd.to_datetime(raw, errors='coerce', format='ISO8601')
+        retry = raw.notna() & values.isna()
+        if retry.any():
+            values[retry] = pd.to_datetime(raw[retry], errors='coerce', dayfirst=True, format='mixed')
+        self._flag(errors, raw.notna() & values.isna(), f"{name}: invalid date")
+        return values
+
+    def _number(self, frame, errors, name) -> pd.Series:
+        raw = self._column(frame, name)
+        values = pd.to_numeric(raw, errors='coerce')
+        self._flag(errors, raw.notna() & values.isna(), f"{name}: invalid number")
+        self._flag(errors, values < 0, f"{name}: must be positive")
+        return values.fillna(0)
+
+    def _users(self, frame, errors, name, allowed=None, message='unknown user') -> pd.Series:
+        """Resolve usernames to user ids (one query), among the users matching `allowed`"""
+        raw = self._column(frame, name)
+        usernames = set(raw.dropna())
+        users = User.objects.filter(username__in=usernames)
+        if allowed is not None:
+            users = users.filter(allowed)
+        ids = dict(users.values_list('username', 'id')) if usernames else {}
+        values = raw.map(ids)
+        self._flag(errors, raw.notna() & values.isna(), f"{name}: {message}")
+        return values
+
+    def _assignable_managers_q(self):
+        """Users the importing user may name as manager (None: anyone)"""
+        if self.user.is_superuser or self.user.role == 'admin':
+            return None
+        return Q(pk=self.user.pk) | Q(department__in=self.user.get_accessible_departments())
+
+    def _tags(self, frame, name='tags') -> pd.Series:
+        return self._column(frame, name).map(
+            lambda value: [tag.strip() for tag in value.split(',') if tag.strip()] if isinstance(value, str) else []
+        )
+
+    def _records(self, clean: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Rows as dicts, missing values as None"""
+        return clean.astype(object).where(clean.notna(), None).to_dict('records')
+
+    def _report(self, frame: pd.DataFrame, errors: pd.Series) -> Dict[str, Any]:
+        invalid = errors[errors.map(bool)]
+        return {
+            'rows': len(frame),
+            'valid': len(frame) - len(invalid),
+            # Spreadsheet row numbers: header on row 1
+            'errors': [{'row': index + 2, 'errors': messages} for index, messages in invalid.items()],
+            'created': 0,
+        }
+
+    # Projects
+
+    def validate_projects(self, frame: pd.DataFrame):
+        """Return (cleaned DataFrame, per-row errors)"""
+        errors = pd.Series([[] for _ in range(len(frame))], index=frame.index, dtype=object)
+        self._required(frame, errors, 'name', 'start_date', 'deadline')
+
+        clean = pd.DataFrame(index=frame.index)
+        clean['name'] = self._column(frame, 'name')
+        clean['description'] = self._column(frame, 'description')
+        for name in ('status', 'priority', 'category', 'department'):
+            clean[name] = self._choice(frame, errors, Project, name)
+        clean['start_date'] = self._date(frame, errors, 'start_date')
+        clean['deadline'] = self._date(frame, errors, 'deadline')
+        self._flag(errors, clean['start_date'] > clean['deadline'], "deadline: before start_date")
+        clean['budget'] = self._number(frame, errors, 'budget')
+        clean['tags'] = self._tags(frame)
+
+        manager = self._users(
+            frame, errors, 'manager',
+            allowed=self._assignable_managers_q(),
+            message='unknown user or outside your departments',
+        )
+        clean['manager_id'] = manager.fillna(self.user.pk)
+
+        numbers = self._column(frame, 'project_number')
+        clean['project_number'] = numbers
+        self._flag(errors, numbers.notna() & numbers.duplicated(keep=False), "project_number: duplicated in file")
+        given = set(numbers.dropna())
+        if given:
+            existing = set(Project.objects.filter(project_number__in=given).values_list('project_number', flat=True))
+            self._flag(errors, numbers.isin(existing), "project_number: already exists")
+        return clean, errors
+
+    def create_projects(self, clean: pd.DataFrame) -> List[Project]:
+        rows = self._records(clean)
+        numbers = iter(Project.reserve_project_numbers(sum(1 for row in rows if not row['project_number'])))
+        projects = []
+        for row in rows:
+            row.update(
+                start_date=row['start_date'].date(),
+                deadline=row['deadline'].date(),
+                budget=Decimal(str(row['budget'])),
+                manager_id=int(row['manager_id']),
+                project_number=row['project_number'] or next(numbers),
+            )
+            projects.append(Project(**row))
+        Project.objects.bulk_create(projects, batch_size=self.CHUNK_SIZE)
+        # Primary keys are not returned by every backend (MySQL): re-read the
+        # rows by their numbers, just generated and unique
+        return list(
+            Project.objects.filter(project_number__in=[project.project_number for project in projects])
+            .order_by('pk')
+        )
+
+    # Tasks
+
+    def validate_tasks(self, frame: pd.DataFrame, new_project_numbers=()):
+        """Return (cleaned DataFrame, per-row errors)"""
+        errors = pd.Series([[] for _ in range(len(frame))], index=frame.index, dtype=object)
+        self._required(frame, errors, 'title', 'project')
+
+        clean = pd.DataFrame(index=frame.index)
+        clean['title'] = self._column(frame, 'title')
+        clean['description'] = self._column(frame, 'description')
+        for name in ('status', 'priority', 'task_type'):
+            clean[name] = self._choice(frame, errors, Task, name)
+        clean['due_date'] = self._date(frame, errors, 'due_date')
+        clean['estimated_time'] = self._number(frame, errors, 'estimated_time')
+        clean['tags'] = self._tags(frame)
+        clean['assignee_id'] = self._users(frame, errors, 'assignee')
+
+        projects = self._column(frame, 'project')
+        references = set(projects.dropna()) - set(new_project_numbers)
+        # Only the projects the user can see may receive tasks
+        referenced = Project.objects.filter(project_number__in=references)
+        visible = accessible_projects_q(self.user)
+        if visible is not None:
+            referenced = referenced.filter(visible)
+        existing = dict(referenced.values_list('project_number', 'id')) if references else {}
+        self._flag(
+            errors,
+            projects.notna() & ~projects.isin(list(existing) + list(new_project_numbers)),
+            "project: unknown or inaccessible project number",
+        )
+        clean['project_number'] = projects
+        clean['project_id'] = projects.map(existing)
+        return clean, errors
+
+    def create_tasks(self, clean: pd.DataFrame, project_ids: Dict[str, int]) -> List[Task]:
+        rows = self._records(clean)
+        numbers = Task.reserve_task_numbers(len(rows))
+        tasks = []
+        for row, number in zip(rows, numbers):
+            project_number = row.pop('project_number')
+            row.update(
+                project_id=int(row['project_id'] or project_ids[project_number]),
+                assignee_id=int(row['assignee_id']) if row['assignee_id'] is not None else None,
+                due_date=timezone.make_aware(row['due_date'].to_pydatetime()) if row['due_date'] is not None else None,
+                estimated_time=Decimal(str(row['estimated_time'])),
+                reporter=self.user,
+                task_number=number,
+            )
+            tasks.append(Task(**row))
+        Task.objects.bulk_create(tasks, batch_size=self.CHUNK_SIZE)
+        # Re-read for the primary keys, as in create_projects
+        return list(Task.objects.filter(task_number__in=numbers).order_by('pk'))
+
+    # Run
+
+    def run(self, frames: Dict[str, pd.DataFrame], dry_run: bool = True) -> Dict[str, Any]:
+        """
+        Validate every sheet, then (unless dry_run or any row is invalid)
+        create projects and tasks in one transaction
+        """
+        report = {'dry_run': dry_run, 'committed': False}
+        cleaned = {}
+
+        if 'projects' in frames:
+            cleaned['projects'], errors = self.validate_projects(frames['projects'])
+            report['projects'] = self._report(frames['projects'], errors)
+        new_numbers = set(cleaned['projects']['project_number'].dropna()) if 'projects' in cleaned else set()
+        if 'tasks' in frames:
+            cleaned['tasks'], errors = self.validate_tasks(frames['tasks'], new_numbers)
+            report['tasks'] = self._report(frames['tasks'], errors)
+
+        if dry_run or any(report[kind]['errors'] for kind in KINDS if kind in report):
+            return report
+
+        with transaction.atomic():
+            project_ids = {}
+            if 'projects' in cleaned:
+                projects = self.create_projects(cleaned['projects'])
+                project_ids = {project.project_number: project.pk for project in projects}
+                activity.record_changes(projects, 'created')
+                report['projects']['created'] = len(projects)
+            if 'tasks' in cleaned:
+                tasks = self.create_tasks(cleaned['tasks'], project_ids)
+                activity.record_changes(tasks, 'created')
+                report['tasks']['created'] = len(tasks)
+
+        report['committed'] = True
+        logger.info(
+            f"Spreadsheet import by {self.user}: "
+            + ', '.join(f"{report[kind]['created']} {kind}" for kind in KINDS if kind in report)
+        )
+        return report
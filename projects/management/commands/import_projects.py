@@ -0,0 +1,79 @@
+"""
+Django command to import projects and tasks from a spreadsheet
+Usage: python manage.py import_projects <file.xlsx|file.csv> [--user USERNAME] [--kind tasks] [--commit]
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.importer import KINDS, SpreadsheetImporter
+
+
+class Command(BaseCommand):
+    help = 'Validate (and with --commit, create) projects and tasks from an XLSX/CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='XLSX workbook (projects/tasks sheets) or CSV file')
+        parser.add_argument(
+            '--user',
+            help='Username recorded as reporter and default manager (default: first superuser)',
+        )
+        parser.add_argument(
+            '--kind',
+            choices=KINDS,
+            help='Content of a CSV file (guessed from its columns otherwise)',
+        )
+        parser.add_argument(
+            '--commit',
+            action='store_true',
+            help='Create the rows (dry run otherwise)',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the full report as JSON',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError('No importing user found (use --user)')
+
+        importer = SpreadsheetImporter(user)
+        with open(options['path'], 'rb') as file:
+            frames = importer.read(file, options['path'], kind=options['kind'])
+        if not frames:
+            raise CommandError('No projects or tasks sheet found')
+
+        dry_run = not options['commit']
+        self.stdout.write(self.style.SUCCESS(f"Importing {options['path']}..."))
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING('Dry run: nothing will be created (use --commit to import)')
+            )
+
+        report = importer.run(frames, dry_run=dry_run)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+            return
+
+        for kind in KINDS:
+            if kind not in report:
+                continue
+            result = report[kind]
+            self.stdout.write(f"\n{kind}: {result['rows']} rows, {result['valid']} valid, {result['created']} created")
+            for error in result['errors'][:50]:
+                self.stdout.write(self.style.ERROR(f"  Row {error['row']}: {'; '.join(error['errors'])}"))
+            if len(result['errors']) > 50:
+                self.stdout.write(f"  ... {len(result['errors']) - 50} more invalid rows")
+
+        if report['committed']:
+            self.stdout.write(self.style.SUCCESS('\nImport complete'))
+        elif not dry_run:
+            self.stdout.write(self.style.ERROR('\nImport aborted: fix the invalid rows first'))
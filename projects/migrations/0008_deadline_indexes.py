@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_add_status_priority_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['deadline', 'status'], name='projects_deadlin_48a3f5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['due_date', 'status'], name='tasks_due_dat_6498c2_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
@@ -91,6 +92,10 @@ class Project(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Project'
         verbose_name_plural = 'Projects'
+        indexes = [
+            models.Index(fields=['deadline', 'status']),
+            models.Index(fields=['updated_at', 'id']),
+        ]
     
     def __str__(self):
         return self.name
@@ -130,34 +135,26 @@ class Project(models.Model):
     
     def generate_project_number(self):
         """Generate unique project number in format prj-year-index"""
-        from django.db.models import Max
+        return Project.reserve_project_numbers(1)[0]
+    
+    @classmethod
+    def reserve_project_numbers(cls, count):
+        """Reserve a block of `count` consecutive project numbers (prj-year-index)"""
         from datetime import datetime
         
         # Get current year (last 2 digits)
         current_year = datetime.now().year % 100
+        prefix = f"prj-{current_year:02d}-"
         
         # Get the highest index for projects in current year
-        existing_projects = Project.objects.filter(
-            project_number__startswith=f"prj-{current_year:02d}-"
-        )
-        
-        if existing_projects.exists():
-            # Extract the highest index from existing project numbers
-            max_index = 0
-            for project in existing_projects:
-                try:
-                    # Extract index from project_number like "prj-25-01"
-                    parts = project.project_number.split('-')
-                    if len(parts) == 3 and parts[2].isdigit():
-                        index = int(parts[2])
-                        max_index = max(max_index, index)
-                except (ValueError, IndexError):
-                    continue
-            next_index = max_index + 1
-        else:
-            next_index = 1
+        max_index = 0
+        for project_number in cls.objects.filter(project_number__startswith=prefix).values_list('project_number', flat=True):
+            # Extract index from project_number like "prj-25-01"
+            parts = project_number.split('-')
+            if len(parts) == 3 and parts[2].isdigit():
+                max_index = max(max_index, int(parts[2]))
         
-        return f"prj-{current_year:02d}-{next_index:02d}"
+        return [f"{prefix}{index:02d}" for index in range(max_index + 1, max_index + 1 + count)]
 
 
 class ProjectComment(models.Model):
@@ -276,6 +273,10 @@ class Task(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Task'
         verbose_name_plural = 'Tasks'
+        indexes = [
+            models.Index(fields=['due_date', 'status']),
+            models.Index(fields=['updated_at', 'id']),
+        ]
     
     def __str__(self):
         return self.title
@@ -316,34 +317,26 @@ class Task(models.Model):
     
     def generate_task_number(self):
         """Generate unique task number in format t-year-index"""
-        from django.db.models import Max
+        return Task.reserve_task_numbers(1)[0]
+    
+    @classmethod
+    def reserve_task_numbers(cls, count):
+        """Reserve a block of `count` consecutive task numbers (t-year-index)"""
         from datetime import datetime
         
         # Get current year (last 2 digits)
         current_year = datetime.now().year % 100
+        prefix = f"t-{current_year:02d}-"
         
         # Get the highest index for tasks in current year
-        existing_tasks = Task.objects.filter(
-            task_number__startswith=f"t-{current_year:02d}-"
-        )
-        
-        if existing_tasks.exists():
-            # Extract the highest index from existing task numbers
-            max_index = 0
-            for task in existing_tasks:
-                try:
-                    # Extract index from task_number like "t-25-01"
-                    parts = task.task_number.split('-')
-                    if len(parts) == 3 and parts[2].isdigit():
-                        index = int(parts[2])
-                        max_index = max(max_index, index)
-                except (ValueError, IndexError):
-                    continue
-            next_index = max_index + 1
-        else:
-            next_index = 1
+        max_index = 0
+        for task_number in cls.objects.filter(task_number__startswith=prefix).values_list('task_number', flat=True):
+            # Extract index from task_number like "t-25-01"
+            parts = task_number.split('-')
+            if len(parts) == 3 and parts[2].isdigit():
+                max_index = max(max_index, int(parts[2]))
         
-        return f"t-{current_year:02d}-{next_index:02d}"
+        return [f"{prefix}{index:02d}" for index in range(max_index + 1, max_index + 1 + count)]
 
 
 class TaskComment(models.Model):
@@ -438,3 +431,66 @@ class ProjectNote(models.Model):
     @property
     def likes_count(self):
         return self.likes.count()
+
+
+class SyncTombstone(models.Model):
+    """
+    Record of a deleted project or task, served by the delta-sync endpoints
+    """
+    OBJECT_TYPE_CHOICES = [
+        ('project', 'Project'),
+        ('task', 'Task'),
+    ]
+
+    object_type = models.CharField(max_length=20, choices=OBJECT_TYPE_CHOICES)
+    object_id = models.BigIntegerField()
+    # Copied from the deleted project so tombstones follow the same access rules
+    project_id = models.BigIntegerField(null=True, blank=True)
+    department = models.CharField(max_length=20, blank=True)
+    manager_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sync_tombstones'
+        ordering = ['id']
+        verbose_name = 'Sync Tombstone'
+        verbose_name_plural = 'Sync Tombstones'
+        indexes = [
+            models.Index(fields=['object_type', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.object_type} {self.object_id} deleted at {self.deleted_at}"
+
+
+class ActivityEvent(models.Model):
+    """
+    Append-only log of changes to projects, tasks, notes and task comments
+    """
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+
+    object_type = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    project_id = models.BigIntegerField(null=True, blank=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # {field: [old, new]} for the tracked fields that changed
+    changes = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'activity_events'
+        ordering = ['-id']
+        verbose_name = 'Activity Event'
+        verbose_name_plural = 'Activity Events'
+        indexes = [
+            models.Index(fields=['project_id', 'id']),
+            models.Index(fields=['object_type', 'object_id', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.object_type} {self.object_id} {self.action}"
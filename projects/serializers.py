@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Project, ProjectComment, ProjectAttachment, Task, TaskComment, TaskAttachment, TimeEntry, ProjectNote
+from .models import Project, ProjectComment, ProjectAttachment, Task, TaskComment, TaskAttachment, TimeEntry, ProjectNote, ActivityEvent
 
 User = get_user_model()
 
@@ -30,9 +30,14 @@ class ProjectSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_tasks_count(self, obj):
+        # Annotated by the write path, counted otherwise
+        if hasattr(obj, 'tasks_total'):
+            return obj.tasks_total
         return obj.get_tasks_count()
     
     def get_completed_tasks_count(self, obj):
+        if hasattr(obj, 'tasks_completed'):
+            return obj.tasks_completed
         return obj.get_completed_tasks_count()
     
     def get_team_members(self, obj):
@@ -282,6 +287,32 @@ class TaskCreateUpdateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field resolved from the objects preloaded in
+    context['preloaded'][model] (bulk requests), instead of one query per item
+    """
+    def to_internal_value(self, data):
+        preloaded = self.context.get('preloaded', {}).get(self.get_queryset().model)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in preloaded:
+            self.fail('does_not_exist', pk_value=data)
+        return preloaded[pk]
+
+
+class TaskBulkCreateSerializer(TaskCreateUpdateSerializer):
+    """
+    Serializer for bulk task creation (related objects preloaded by the view)
+    """
+    project = PreloadedPrimaryKeyRelatedField(queryset=Project.objects.all())
+    assignee = PreloadedPrimaryKeyRelatedField(queryset=User.objects.all(), required=False, allow_null=True)
+
+
 class TaskCommentSerializer(serializers.ModelSerializer):
     """
     Serializer for task comments
@@ -377,3 +408,18 @@ class ProjectNoteSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
+
+
+class ActivityEventSerializer(serializers.ModelSerializer):
+    """
+    Serializer for activity events (read-only history)
+    """
+    actor_name = serializers.CharField(source='actor.full_name', read_only=True, default=None)
+    
+    class Meta:
+        model = ActivityEvent
+        fields = [
+            'id', 'object_type', 'object_id', 'project_id', 'action', 'changes',
+            'actor', 'actor_name', 'created_at'
+        ]
+        read_only_fields = fields
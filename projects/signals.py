@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_init, post_save
+
+from . import activity, sync
+from .models import Project, Task
+
+
+def remember_initial_values(sender, instance, **kwargs):
+    """Keep the loaded values so that saves only record what changed"""
+    instance._activity_snapshot = activity.snapshot(instance)
+
+
+def record_saved(sender, instance, created, raw=False, using='default', **kwargs):
+    """Record a created/updated activity event after a save"""
+    if raw:
+        return
+    activity.record_changes([instance], 'created' if created else 'updated', using=using)
+
+
+def record_deleted(sender, instance, using='default', **kwargs):
+    """Record a deleted activity event"""
+    activity.record(instance, 'deleted', {}, using=using)
+
+
+def record_tombstone(sender, instance, **kwargs):
+    """Keep deleted projects and tasks visible to the delta-sync endpoints"""
+    sync.record_tombstone(instance)
+
+
+for model in activity.TRACKED_FIELDS:
+    post_init.connect(remember_initial_values, sender=model, dispatch_uid=f'activity_init_{model.__name__}')
+    post_save.connect(record_saved, sender=model, dispatch_uid=f'activity_save_{model.__name__}')
+    post_delete.connect(record_deleted, sender=model, dispatch_uid=f'activity_delete_{model.__name__}')
+
+for model in (Project, Task):
+    post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'sync_tombstone_{model.__name__}')
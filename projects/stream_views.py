@@ -0,0 +1,111 @@
+"""
+Server-Sent Events stream of project changes (see projects.events), served
+by an ASGI server
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import events
+from .models import Project
+from .views import accessible_projects_q
+
+User = get_user_model()
+
+
+def _stream_user(request):
+    """
+    Resolve the user of an event stream from a JWT access token, passed as
+    `?token=` (EventSource cannot set headers) or as a Bearer header
+    """
+    raw_token = request.GET.get('token')
+    if not raw_token:
+        header = request.headers.get('Authorization', '').split()
+        if len(header) == 2 and header[0] in jwt_settings.AUTH_HEADER_TYPES:
+            raw_token = header[1]
+    if not raw_token:
+        return None
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None
+    return User.objects.filter(
+        **{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM]}, is_active=True
+    ).first()
+
+
+def _stream_project_ids(user, requested_ids):
+    """
+    Keep the requested projects the user may view (one query)
+    """
+    projects = Project.objects.filter(id__in=requested_ids)
+    visible = accessible_projects_q(user)
+    if visible is not None:
+        projects = projects.filter(visible)
+    return list(projects.values_list('id', flat=True))
+
+
+async def project_event_stream(request):
+    """
+    Server-Sent Events stream of project, task and note changes
+
+    GET /api/projects/events/stream/?projects=1,2&token=<access token>
+    Each event carries its type (e.g. `task.updated`) and only the changed fields.
+    """
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+
+    try:
+        requested_ids = [int(value) for value in request.GET.get('projects', '').split(',') if value.strip()]
+    except ValueError:
+        return JsonResponse({'error': 'projects must be a comma-separated list of ids'}, status=400)
+    if not requested_ids:
+        return JsonResponse({'error': 'projects is required'}, status=400)
+
+    project_ids = await sync_to_async(_stream_project_ids)(user, requested_ids)
+    if not project_ids:
+        return JsonResponse({'error': 'No accessible project'}, status=403)
+
+    heartbeat = events.get_event_setting('heartbeat_seconds')
+    max_seconds = events.get_event_setting('max_stream_seconds')
+
+    async def stream():
+        subscription = events.subscribe(project_ids)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_seconds
+        pending = None
+        try:
+            yield f"retry: 3000\n: subscribed to {','.join(map(str, project_ids))}\n\n"
+            while loop.time() < deadline:
+                if pending is None:
+                    pending = asyncio.ensure_future(subscription.__anext__())
+                # Waiting on the same future across heartbeats keeps the
+                # subscription alive (a timeout would cancel it)
+                done, _ = await asyncio.wait({pending}, timeout=min(heartbeat, deadline - loop.time()))
+                if not done:
+                    yield ": ping\n\n"
+                    continue
+                event = pending.result()
+                pending = None
+                yield f"event: {event['type']}\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
+        finally:
+            if pending is not None:
+                pending.cancel()
+                try:
+                    await pending
+                except (asyncio.CancelledError, StopAsyncIteration):
+                    pass
+            await subscription.aclose()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
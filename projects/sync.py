@@ -0,0 +1,112 @@
+"""
+Delta synchronisation for project and task lists.
+
+A sync token is an opaque cursor over ``(updated_at, id)`` for live rows and
+over the tombstone id for deletions. Each call returns the rows changed after
+the token, in index order (``(updated_at, id)``), plus the ids deleted since,
+and a new token to pass on the next call.
+
+``updated_at`` and tombstone ids are assigned before commit, so a slow
+transaction can commit a change behind a cursor that was already issued.
+Only changes older than ``PROJECT_SYNC_SETTLE_SECONDS`` are served: the
+cursor never moves past ``now - settle``, and a change shows up on a later
+call as long as its transaction lasted less than that.
+"""
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Project, SyncTombstone
+
+DEFAULT_SYNC_PAGE_SIZE = 500
+
+DEFAULT_SYNC_SETTLE_SECONDS = 10
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_token(updated_at, row_id, tombstone_id) -> str:
+    micros = (updated_at - EPOCH) // timedelta(microseconds=1) if updated_at else 0
+    raw = f"{micros}.{row_id}.{tombstone_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Return (updated_at, row_id, tombstone_id); the start of history when token is empty"""
+    if not token:
+        return None, 0, 0
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        micros, row_id, tombstone_id = (int(part) for part in raw.split('.'))
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidSyncToken('Invalid sync token')
+    updated_at = EPOCH + timedelta(microseconds=micros) if micros else None
+    return updated_at, row_id, tombstone_id
+
+
+def get_changes(queryset, tombstones, token=None, page_size=None, now=None):
+    """
+    Rows of `queryset` and tombstones of `tombstones` changed after `token`
+    and settled by `now`
+
+    Returns a dict with `rows` (model instances), `deleted` (ids),
+    `next_token` and `has_more` (call again with next_token to get the rest).
+    """
+    page_size = page_size or getattr(settings, 'PROJECT_SYNC_PAGE_SIZE', DEFAULT_SYNC_PAGE_SIZE)
+    settle = getattr(settings, 'PROJECT_SYNC_SETTLE_SECONDS', DEFAULT_SYNC_SETTLE_SECONDS)
+    settled = (now or timezone.now()) - timedelta(seconds=settle)
+    queryset = queryset.filter(updated_at__lte=settled)
+    tombstones = tombstones.filter(deleted_at__lte=settled)
+
+    updated_at, row_id, tombstone_id = decode_token(token)
+    if not token:
+        # A first sync loads every live row: past deletions are irrelevant
+        tombstone_id = tombstones.order_by('-id').values_list('id', flat=True).first() or 0
+
+    if updated_at is not None:
+        queryset = queryset.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=row_id)
+        )
+    rows = list(queryset.order_by('updated_at', 'id')[:page_size + 1])
+    deleted = list(
+        tombstones.filter(id__gt=tombstone_id).order_by('id').values_list('id', 'object_id')[:page_size + 1]
+    )
+
+    has_more = len(rows) > page_size or len(deleted) > page_size
+    rows, deleted = rows[:page_size], deleted[:page_size]
+
+    if rows:
+        updated_at, row_id = rows[-1].updated_at, rows[-1].id
+    if deleted:
+        tombstone_id = deleted[-1][0]
+
+    return {
+        'rows': rows,
+        'deleted': [object_id for _, object_id in deleted],
+        'next_token': encode_token(updated_at, row_id, tombstone_id),
+        'has_more': has_more,
+    }
+
+
+def record_tombstone(instance):
+    """Record the deletion of a project or task"""
+    if isinstance(instance, Project):
+        project = instance
+        object_type = 'project'
+    else:
+        project = instance.project
+        object_type = 'task'
+    SyncTombstone.objects.create(
+        object_type=object_type,
+        object_id=instance.pk,
+        project_id=project.pk,
+        department=project.department or '',
+        manager_id=project.manager_id,
+    )
@@ -1,3 +1,108 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Project, SyncTombstone
+from .sync import InvalidSyncToken, get_changes
+
+User = get_user_model()
+
+
+@override_settings(PROJECT_SYNC_SETTLE_SECONDS=10)
+class ProjectSyncTests(TestCase):
+    """
+    Delta sync pages through live rows and tombstones without losing or repeating changes
+    """
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='sync', email='sync@example.com', password='x')
+        self.projects = [self.create_project(f'Project {index}') for index in range(5)]
+
+    def create_project(self, name):
+        today = timezone.localdate()
+        return Project.objects.create(name=name, manager=self.manager, start_date=today, deadline=today)
+
+    def later(self, seconds=60):
+        return timezone.now() + timedelta(seconds=seconds)
+
+    def sync(self, token=None, page_size=2, now=None):
+        """Call get_changes until has_more is False: (row ids, deleted ids, token, pages)"""
+        now = now or self.later()
+        rows, deleted, pages = [], [], 0
+        while True:
+            changes = get_changes(
+                Project.objects.all(), SyncTombstone.objects.filter(object_type='project'),
+                token, page_size=page_size, now=now,
+            )
+            rows += [project.pk for project in changes['rows']]
+            deleted += changes['deleted']
+            token = changes['next_token']
+            pages += 1
+            if not changes['has_more']:
+                return rows, deleted, token, pages
+
+    def test_first_sync_pages_through_every_row(self):
+        removed = self.projects.pop()
+        removed.delete()
+
+        rows, deleted, _, pages = self.sync()
+
+        self.assertEqual(sorted(rows), sorted(project.pk for project in self.projects))
+        self.assertEqual(len(rows), len(set(rows)))
+        # Deletions from before the first sync are not replayed
+        self.assertEqual(deleted, [])
+        self.assertEqual(pages, 2)
+
+    def test_deletions_and_updates_across_pages(self):
+        _, _, token, _ = self.sync()
+
+        deleted_ids = [project.pk for project in self.projects[:3]]
+        for project in self.projects[:3]:
+            project.delete()
+        survivor = self.projects[3]
+        survivor.name = 'Renamed'
+        survivor.save()
+
+        rows, deleted, token, pages = self.sync(token)
+
+        self.assertEqual(rows, [survivor.pk])
+        self.assertEqual(deleted, deleted_ids)
+        self.assertEqual(pages, 2)
+
+        # Nothing left to serve
+        rows, deleted, _, _ = self.sync(token)
+        self.assertEqual((rows, deleted), ([], []))
+
+    def test_unsettled_changes_are_served_later(self):
+        _, _, token, _ = self.sync()
+        project = self.create_project('Fresh')
+
+        # Still within the settle delay: not served, and the cursor does not move past it
+        rows, _, token, _ = self.sync(token, now=timezone.now())
+        self.assertEqual(rows, [])
+
+        rows, _, _, _ = self.sync(token)
+        self.assertEqual(rows, [project.pk])
+
+    def test_late_commit_behind_cursor_is_served(self):
+        now = timezone.now()
+        Project.objects.update(updated_at=now - timedelta(hours=1))
+        _, _, token, _ = self.sync()
+
+        # Two transactions: the later one commits first and is visible to the sync...
+        first = self.create_project('Committed first')
+        Project.objects.filter(pk=first.pk).update(updated_at=now - timedelta(seconds=3))
+        rows, _, token, _ = self.sync(token, now=now)
+
+        # ...the earlier one commits afterwards, with an older updated_at
+        late = self.create_project('Committed late')
+        Project.objects.filter(pk=late.pk).update(updated_at=now - timedelta(seconds=5))
+
+        later_rows, _, _, _ = self.sync(token)
+        self.assertEqual(sorted(rows + later_rows), sorted([first.pk, late.pk]))
+
+    def test_invalid_token(self):
+        with self.assertRaises(InvalidSyncToken):
+            get_changes(Project.objects.all(), SyncTombstone.objects.all(), 'not-a-token')
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import stream_views, views
 
 app_name = 'projects'
 
@@ -12,6 +12,10 @@ router.register(r'task-statistics', views.TaskStatisticsView, basename='task_sta
 urlpatterns = [
     # Task endpoints (must come before router to avoid conflicts)
     path('tasks/', views.TaskViewSet.as_view({'get': 'list', 'post': 'create'}), name='task-list'),
+    path('tasks/bulk/', views.TaskViewSet.as_view({'post': 'bulk_create'}), name='task-bulk-create'),
+    path('tasks/bulk/status/', views.TaskViewSet.as_view({'post': 'bulk_status'}), name='task-bulk-status'),
+    path('tasks/bulk/assign/', views.TaskViewSet.as_view({'post': 'bulk_assign'}), name='task-bulk-assign'),
+    path('tasks/sync/', views.TaskViewSet.as_view({'get': 'sync'}), name='task-sync'),
     path('tasks/<int:pk>/', views.TaskViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='task-detail'),
     path('tasks/<int:task_id>/comments/', views.TaskCommentListCreateView.as_view({'get': 'list', 'post': 'create'}), name='task_comments'),
     path('tasks/<int:task_id>/attachments/', views.TaskAttachmentListCreateView.as_view({'get': 'list', 'post': 'create'}), name='task_attachments'),
@@ -19,9 +23,11 @@ urlpatterns = [
     
     # Other specific paths
     path('dashboard/', views.dashboard_data, name='dashboard_data'),
+    path('events/stream/', stream_views.project_event_stream, name='project_event_stream'),
     path('calendar/', views.calendar_data, name='calendar_data'),
     path('calendar/export/', views.export_calendar_excel, name='export_calendar_excel'),
     path('export/excel/', views.export_projects_excel, name='export_projects_excel'),
+    path('import/', views.import_spreadsheet, name='import_spreadsheet'),
     path('<int:project_id>/comments/', views.ProjectCommentListCreateView.as_view({'get': 'list', 'post': 'create'}), name='project_comments'),
     path('<int:project_id>/attachments/', views.ProjectAttachmentListCreateView.as_view({'get': 'list', 'post': 'create'}), name='project_attachments'),
     path('<int:project_id>/attachments/<int:pk>/download/', views.download_attachment, name='project_attachment_download'),
@@ -109,22 +109,26 @@ from django.db.models import Q, Count, Avg, Sum
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.db import transaction
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 from datetime import datetime
 
-from .models import Project, ProjectComment, ProjectAttachment, Task, TaskComment, TaskAttachment, TimeEntry, ProjectNote
+from .models import Project, ProjectComment, ProjectAttachment, Task, TaskComment, TaskAttachment, TimeEntry, ProjectNote, SyncTombstone, ActivityEvent
 
 User = get_user_model()
 from .serializers import (
     ProjectSerializer, ProjectListSerializer, ProjectCreateUpdateSerializer,
     ProjectCommentSerializer, ProjectAttachmentSerializer,
-    TaskSerializer, TaskListSerializer, TaskCreateUpdateSerializer,
+    TaskSerializer, TaskListSerializer, TaskCreateUpdateSerializer, TaskBulkCreateSerializer,
     TaskCommentSerializer, TaskAttachmentSerializer, TimeEntrySerializer,
-    ProjectNoteSerializer
+    ProjectNoteSerializer, ActivityEventSerializer
 )
 from .filters import ProjectFilter, TaskFilter
+from .sync import InvalidSyncToken, get_changes
+from . import activity
 from .permissions import IsProjectManagerOrReadOnly, IsProjectManager, CanViewProject, CanModifyProject
 
 
@@ -169,7 +173,44 @@ def get_user_accessible_projects(user):
     return queryset.distinct()
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+def accessible_projects_q(user):
+    """
+    Filter matching the projects of get_user_accessible_projects, usable on
+    any queryset or model exposing `department` and `manager_id` (None when
+    the user can see every project)
+    """
+    if user.is_superuser or user.role == 'admin':
+        return None
+    departments = user.get_accessible_departments()
+    if not departments:
+        # Like get_user_accessible_projects: no department, no project at
+        # all, managed ones included
+        return Q(pk__in=[])
+    # Team projects are only visible within accessible departments, which
+    # the department clause already covers
+    visible = Q(department__in=departments)
+    if user.role == 'manager':
+        visible |= Q(manager_id=user.pk)
+    return visible
+
+
+class ActivityActorMixin:
+    """
+    Attribute the changes captured while handling a request to its user
+    """
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._activity_actor_token = activity.set_actor(request.user)
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_activity_actor_token', None)
+        if token is not None:
+            activity.reset_actor(token)
+            self._activity_actor_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ProjectViewSet(ActivityActorMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing projects
     - All authenticated users: Read access
@@ -198,6 +239,61 @@ class ProjectViewSet(viewsets.ModelViewSet):
         """
         return get_user_accessible_projects(self.request.user)
     
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        Delta sync: projects created or changed since `?since=<token>` and
+        ids of projects deleted since, with the token for the next call
+        """
+        queryset = Project.objects.select_related('manager').prefetch_related('team')
+        tombstones = SyncTombstone.objects.filter(object_type='project')
+        visible = accessible_projects_q(request.user)
+        if visible is not None:
+            queryset = queryset.filter(visible)
+            tombstones = tombstones.filter(visible)
+        
+        try:
+            changes = get_changes(queryset, tombstones, request.query_params.get('since'))
+        except InvalidSyncToken as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'results': ProjectListSerializer(changes['rows'], many=True, context={'request': request}).data,
+            'deleted': changes['deleted'],
+            'next': changes['next_token'],
+            'has_more': changes['has_more'],
+        })
+    
+    @action(detail=True, methods=['get'], url_path='activity')
+    def history(self, request, pk=None):
+        """
+        Activity of a project and of its tasks, notes and comments, newest
+        first (`?before=<event id>` for the next page, `?object_type=task`)
+        """
+        projects = Project.objects.filter(pk=pk)
+        visible = accessible_projects_q(request.user)
+        if visible is not None:
+            projects = projects.filter(visible)
+        if not projects.exists():
+            return Response({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        events = ActivityEvent.objects.filter(project_id=pk).select_related('actor').order_by('-id')
+        object_type = request.query_params.get('object_type')
+        if object_type:
+            events = events.filter(object_type=object_type)
+        before = request.query_params.get('before')
+        if before:
+            try:
+                events = events.filter(id__lt=int(before))
+            except ValueError:
+                return Response({'error': 'before must be an event id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        page = list(events[:50])
+        return Response({
+            'results': ActivityEventSerializer(page, many=True).data,
+            'next_before': page[-1].id if len(page) == 50 else None,
+        })
+    
     @action(detail=True, methods=['patch'], permission_classes=[permissions.IsAuthenticated])
     def update_progress(self, request, pk=None):
         """
@@ -293,111 +389,130 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def get_write_object(self):
+        """
+        Fetch the project to write once: access rules, manager and task
+        counts in one query (the team is prefetched for the response)
+        """
+        queryset = Project.objects.select_related('manager').prefetch_related('team').annotate(
+            tasks_total=Count('tasks', distinct=True),
+            tasks_completed=Count('tasks', filter=Q(tasks__status='completed'), distinct=True),
+        )
+        visible = accessible_projects_q(self.request.user)
+        if visible is not None:
+            queryset = queryset.filter(visible)
+        instance = get_object_or_404(queryset, pk=self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        self.check_object_permissions(self.request, instance)
+        return instance
+    
+    def apply_status_rules(self, instance, old_status):
+        """Adjust progress and completion date when the status changes"""
+        if instance.status == old_status:
+            return
+        if instance.status == 'termine' and instance.progress < 100:
+            instance.progress = 100
+            instance.completed_date = timezone.now().date()
+        elif instance.status == 'planification' and instance.progress > 0:
+            instance.progress = 0
+            instance.completed_date = None
+        elif instance.status == 'en_cours' and instance.progress == 0:
+            instance.progress = 50  # Set to middle value when starting
+        elif instance.status in ['en_attente', 'en_retard'] and instance.progress == 100:
+            instance.progress = 75  # Set to high value when pausing
+    
     def perform_create(self, serializer):
         """Set the manager to the current user if not specified"""
         if not serializer.validated_data.get('manager'):
             serializer.save(manager=self.request.user)
         else:
             serializer.save()
+        # A new project has no task yet
+        serializer.instance.tasks_total = serializer.instance.tasks_completed = 0
 
     def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-        # Re-serialize with full serializer so client immediately gets manager_name, etc.
-        if response.status_code in [status.HTTP_200_OK, status.HTTP_201_CREATED]:
-            project_id = response.data.get('id') if isinstance(response.data, dict) else None
-            if project_id:
-                instance = Project.objects.get(id=project_id)
-                
-                # 🔔 INTÉGRATION DES NOTIFICATIONS
-                try:
-                    from notifications.services import ProjectNotificationService
-                    notification_service = ProjectNotificationService()
-                    
-                    # Notifier la création du projet
-                    notification_service.notify_project_created(instance, request.user)
-                    print(f"✅ Notification de création envoyée pour le projet {instance.name}")
-                    
-                except Exception as e:
-                    print(f"⚠️ Erreur notification création projet: {str(e)}")
-                
-                data = ProjectSerializer(instance).data
-                return Response(data, status=response.status_code)
-        return response
-
-    def update(self, request, *args, **kwargs):
-        # Récupérer l'instance avant la mise à jour pour détecter les changements
-        instance = self.get_object()
-        old_data = {
-            'name': instance.name,
-            'description': instance.description,
-            'status': instance.status,
-            'deadline': instance.deadline,
-        }
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        instance = serializer.instance
         
-        response = super().update(request, *args, **kwargs)
-        if response.status_code in [status.HTTP_200_OK, status.HTTP_201_CREATED]:
-            instance = self.get_object()
+        # 🔔 INTÉGRATION DES NOTIFICATIONS
+        try:
+            from notifications.services import ProjectNotificationService
+            notification_service = ProjectNotificationService()
             
-            # 🔔 INTÉGRATION DES NOTIFICATIONS - Mise à jour
-            try:
-                from notifications.services import ProjectNotificationService
-                notification_service = ProjectNotificationService()
-                
-                # Détecter les changements
-                changes = {}
-                if old_data['name'] != instance.name:
-                    changes['name'] = (old_data['name'], instance.name)
-                if old_data['description'] != instance.description:
-                    changes['description'] = (old_data['description'], instance.description)
-                if old_data['status'] != instance.status:
-                    changes['status'] = (old_data['status'], instance.status)
-                if old_data['deadline'] != instance.deadline:
-                    changes['deadline'] = (old_data['deadline'].strftime('%d/%m/%Y'), instance.deadline.strftime('%d/%m/%Y'))
-                
-                # Notifier la mise à jour si il y a des changements
-                if changes:
-                    notification_service.notify_project_updated(instance, request.user, changes)
-                    print(f"✅ Notification de mise à jour envoyée pour le projet {instance.name}")
-                
-            except Exception as e:
-                print(f"⚠️ Erreur notification mise à jour projet: {str(e)}")
+            # Notifier la création du projet
+            notification_service.notify_project_created(instance, request.user)
+            print(f"✅ Notification de création envoyée pour le projet {instance.name}")
             
-            data = ProjectSerializer(instance).data
-            return Response(data, status=response.status_code)
-        return response
+        except Exception as e:
+            print(f"⚠️ Erreur notification création projet: {str(e)}")
+        
+        # Full serializer so the client immediately gets manager_name, etc.
+        return Response(ProjectSerializer(instance).data, status=status.HTTP_201_CREATED)
 
-    def partial_update(self, request, *args, **kwargs):
-        # Get the project instance before update
-        instance = self.get_object()
+    def perform_update(self, serializer):
+        """
+        Apply the validated data and the status rules to the fetched
+        instance, then save only the fields that changed
+        """
+        instance = serializer.instance
+        data = dict(serializer.validated_data)
+        team = data.pop('team', None)
         old_status = instance.status
-        old_progress = instance.progress
         
-        # Check if status is being updated
-        new_status = request.data.get('status')
+        changed = []
+        for attr, value in data.items():
+            if getattr(instance, attr) != value:
+                setattr(instance, attr, value)
+                changed.append(attr)
+        old_progress, old_completed = instance.progress, instance.completed_date
+        self.apply_status_rules(instance, old_status)
+        if instance.progress != old_progress:
+            changed.append('progress')
+        if instance.completed_date != old_completed:
+            changed.append('completed_date')
+        
+        if changed:
+            instance.save(update_fields=changed + ['updated_at'])
+        else:
+            instance.activity_changes = {}
+        if team is not None:
+            instance.team.set(team)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        instance = self.get_write_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
         
-        response = super().partial_update(request, *args, **kwargs)
-        if response.status_code in [status.HTTP_200_OK, status.HTTP_201_CREATED]:
-            # Get updated instance
-            instance = self.get_object()
+        # 🔔 INTÉGRATION DES NOTIFICATIONS - Mise à jour
+        try:
+            from notifications.services import ProjectNotificationService
+            notification_service = ProjectNotificationService()
             
-            # Auto-update progress based on status change
-            if new_status and new_status != old_status:
-                if new_status == 'Terminé' and old_progress < 100:
-                    instance.progress = 100
-                    instance.completed_date = timezone.now().date()
-                elif new_status == 'Planification' and old_progress > 0:
-                    instance.progress = 0
-                    instance.completed_date = None
-                elif new_status == 'En cours' and old_progress == 0:
-                    instance.progress = 50  # Set to middle value when starting
-                elif new_status in ['En attente', 'En retard'] and old_progress == 100:
-                    instance.progress = 75  # Set to high value when pausing
-                
-                instance.save()
+            # Changements capturés à la sauvegarde (sans relire le projet)
+            captured = instance.activity_changes
+            changes = {
+                name: captured[name] for name in ('name', 'description', 'status') if name in captured
+            }
+            if 'deadline' in captured:
+                old_deadline, new_deadline = captured['deadline']
+                changes['deadline'] = (old_deadline.strftime('%d/%m/%Y'), new_deadline.strftime('%d/%m/%Y'))
             
-            data = ProjectSerializer(instance).data
-            return Response(data, status=response.status_code)
-        return response
+            # Notifier la mise à jour si il y a des changements
+            if changes:
+                notification_service.notify_project_updated(instance, request.user, changes)
+                print(f"✅ Notification de mise à jour envoyée pour le projet {instance.name}")
+            
+        except Exception as e:
+            print(f"⚠️ Erreur notification mise à jour projet: {str(e)}")
+        
+        return Response(ProjectSerializer(instance).data)
+
+    def partial_update(self, request, *args, **kwargs):
+        kwargs['partial'] = True
+        return self.update(request, *args, **kwargs)
     
     @action(detail=True, methods=['get'])
     def statistics(self, request, pk=None):
@@ -647,7 +762,7 @@ class ProjectStatisticsView(viewsets.ViewSet):
         return Response(stats)
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ActivityActorMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing tasks
     - All authenticated users: Read access
@@ -697,6 +812,28 @@ class TaskViewSet(viewsets.ModelViewSet):
         """Set the reporter to the current user"""
         serializer.save(reporter=self.request.user)
     
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        Delta sync: tasks created or changed since `?since=<token>` and ids
+        of tasks deleted since, with the token for the next call
+        """
+        queryset = self.get_queryset().select_related('assignee', 'project')
+        # Task visibility follows the task list (see get_queryset)
+        tombstones = SyncTombstone.objects.filter(object_type='task')
+        
+        try:
+            changes = get_changes(queryset, tombstones, request.query_params.get('since'))
+        except InvalidSyncToken as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'results': TaskListSerializer(changes['rows'], many=True, context={'request': request}).data,
+            'deleted': changes['deleted'],
+            'next': changes['next_token'],
+            'has_more': changes['has_more'],
+        })
+    
     @action(detail=True, methods=['post'])
     def assign(self, request, pk=None):
         """Assign task to a user"""
@@ -780,6 +917,162 @@ class TaskViewSet(viewsets.ModelViewSet):
         serializer = TimeEntrySerializer(time_entries, many=True)
         return Response(serializer.data)
     
+    # Maximum number of tasks per bulk request
+    BULK_LIMIT = 500
+    
+    def _manageable_tasks(self, request):
+        """
+        Load the tasks listed in `ids` that the user may manage (same rule as
+        _can_manage_task, in one query); returns (tasks, error response)
+        """
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return None, Response({'error': 'ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.BULK_LIMIT:
+            return None, Response({'error': f'At most {self.BULK_LIMIT} tasks per request'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = {int(task_id) for task_id in ids}
+        except (TypeError, ValueError):
+            return None, Response({'error': 'ids must be task ids'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        user = request.user
+        tasks = Task.objects.filter(id__in=ids).select_related('project', 'assignee', 'reporter')
+        if user.role != 'admin':
+            tasks = tasks.filter(Q(project__manager=user) | Q(assignee=user))
+        tasks = list(tasks)
+        
+        denied = sorted(ids - {task.id for task in tasks})
+        if denied:
+            return None, Response({
+                'success': False,
+                'error': 'Permission insuffisante',
+                'message': 'Vous devez être assigné à ces tâches, gestionnaire du projet ou administrateur.',
+                'task_ids': denied,
+            }, status=status.HTTP_403_FORBIDDEN)
+        return tasks, None
+    
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        """Create several tasks at once: {"tasks": [task payload, ...]}"""
+        payloads = request.data.get('tasks')
+        if not isinstance(payloads, list) or not payloads:
+            return Response({'error': 'tasks must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(payloads) > self.BULK_LIMIT:
+            return Response({'error': f'At most {self.BULK_LIMIT} tasks per request'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Projects and assignees of the whole batch in two queries
+        def referenced_ids(field):
+            return {
+                int(payload[field]) for payload in payloads
+                if isinstance(payload, dict) and str(payload.get(field, '')).isdigit()
+            }
+        preloaded = {
+            Project: Project.objects.in_bulk(referenced_ids('project')),
+            User: User.objects.in_bulk(referenced_ids('assignee')),
+        }
+        serializer = TaskBulkCreateSerializer(
+            data=payloads, many=True, context={'request': request, 'preloaded': preloaded}
+        )
+        serializer.is_valid(raise_exception=True)
+        
+        with transaction.atomic():
+            numbers = Task.reserve_task_numbers(len(payloads))
+            Task.objects.bulk_create([
+                Task(**data, reporter=request.user, task_number=number)
+                for data, number in zip(serializer.validated_data, numbers)
+            ])
+            # Primary keys are not returned by every backend (MySQL): re-read
+            # the rows by their reserved numbers
+            tasks = list(
+                Task.objects.filter(task_number__in=numbers)
+                .select_related('project', 'assignee', 'reporter')
+                .order_by('pk')
+            )
+            activity.record_changes(tasks, 'created')
+        
+        self._notify_tasks(tasks, 'notify_task_created', request.user)
+        return Response(TaskListSerializer(tasks, many=True).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        """Change the status of several tasks: {"ids": [...], "status": "..."}"""
+        new_status = request.data.get('status')
+        if new_status not in [choice[0] for choice in Task.STATUS_CHOICES]:
+            return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        tasks, error = self._manageable_tasks(request)
+        if error:
+            return error
+        
+        now = timezone.now()
+        changed = [task for task in tasks if task.status != new_status]
+        for task in changed:
+            task.status = new_status
+            if new_status == 'completed':
+                task.completed_date = now
+            task.updated_at = now
+        
+        with transaction.atomic():
+            Task.objects.bulk_update(changed, ['status', 'completed_date', 'updated_at'], batch_size=self.BULK_LIMIT)
+            activity.record_changes(changed, 'updated')
+        
+        if new_status == 'completed':
+            self._notify_tasks(changed, 'notify_task_completed', request.user)
+        return Response({'message': 'Task status updated successfully', 'updated': [task.id for task in changed]})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_assign(self, request):
+        """Assign several tasks to a user: {"ids": [...], "user_id": n}"""
+        user_id = request.data.get('user_id')
+        if not user_id:
+            return Response({'error': 'user_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return Response({'error': 'user_id must be a user id'}, status=status.HTTP_400_BAD_REQUEST)
+        assignee = User.objects.filter(id=user_id).first()
+        if assignee is None:
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        tasks, error = self._manageable_tasks(request)
+        if error:
+            return error
+        
+        now = timezone.now()
+        changed = [task for task in tasks if task.assignee_id != assignee.id]
+        previous = {task.id: task.assignee for task in changed}
+        for task in changed:
+            task.assignee = assignee
+            task.updated_at = now
+        
+        with transaction.atomic():
+            Task.objects.bulk_update(changed, ['assignee', 'updated_at'], batch_size=self.BULK_LIMIT)
+            activity.record_changes(changed, 'updated')
+        
+        self._notify_tasks(
+            changed, 'notify_task_updated', request.user,
+            changes=lambda task: {'assignee': (
+                previous[task.id].username if previous[task.id] else None, assignee.username
+            )},
+        )
+        return Response({'message': 'Tasks assigned successfully', 'updated': [task.id for task in changed]})
+    
+    def _notify_tasks(self, tasks, method, user, changes=None):
+        """Emit the notifications of a bulk operation as one grouped write"""
+        if not tasks:
+            return
+        try:
+            from notifications.services import TaskNotificationService
+            notification_service = TaskNotificationService()
+            with notification_service.batch():
+                for task in tasks:
+                    if changes is None:
+                        getattr(notification_service, method)(task, user)
+                    else:
+                        getattr(notification_service, method)(task, user, changes(task))
+        except Exception as e:
+            print(f"⚠️ Erreur notifications tâches groupées: {str(e)}")
+    
     def _has_task_access(self, task, user):
         """Check if user has access to the task"""
         return (
@@ -799,7 +1092,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         )
 
 
-class TaskCommentListCreateView(viewsets.ModelViewSet):
+class TaskCommentListCreateView(ActivityActorMixin, viewsets.ModelViewSet):
     """
     ViewSet for task comments
     """
@@ -1090,7 +1383,7 @@ def dashboard_data(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class ProjectNoteViewSet(viewsets.ModelViewSet):
+class ProjectNoteViewSet(ActivityActorMixin, viewsets.ModelViewSet):
     """
     ViewSet for project notes (social media style comments)
     """
@@ -1457,6 +1750,37 @@ def export_calendar_excel(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([CanModifyProject])
+def import_spreadsheet(request):
+    """
+    Import projects and tasks from an XLSX/CSV file (multipart field `file`)
+    
+    Dry run by default: pass `dry_run=false` to create the rows once the
+    report shows no error. `kind=projects|tasks` applies to CSV files.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # pandas is only loaded when an import is requested
+    from .importer import SpreadsheetImporter
+    
+    importer = SpreadsheetImporter(request.user)
+    try:
+        frames = importer.read(upload, upload.name, kind=request.data.get('kind'))
+    except Exception as e:
+        return Response({'error': f'Unreadable file: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+    if not frames:
+        return Response({'error': 'No projects or tasks sheet found'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    dry_run = str(request.data.get('dry_run', 'true')).lower() not in ('false', '0', 'no')
+    report = importer.run(frames, dry_run=dry_run)
+    if not dry_run and not report['committed']:
+        return Response(report, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report, status=status.HTTP_201_CREATED if report['committed'] else status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_projects_excel(request):
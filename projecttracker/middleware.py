@@ -0,0 +1,45 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .request_metrics import QueryRecorder, get_request_metrics_setting, record_request, should_sample
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, response size and, for a sample of requests, the SQL of
+    each view (see projecttracker.request_metrics)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = get_request_metrics_setting('enabled')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        recorder = QueryRecorder() if should_sample() else None
+        start = time.perf_counter()
+        if recorder is not None:
+            with recorder.record():
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        record_request(request, response, time.perf_counter() - start, recorder)
+        return response
+
+    async def __acall__(self, request):
+        # Queries of async requests run on other threads' connections: only
+        # latency and size are recorded
+        if not self.enabled:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        record_request(request, response, time.perf_counter() - start)
+        return response
@@ -0,0 +1,241 @@
+"""
+Per-view request metrics and budgets.
+
+``RequestMetricsMiddleware`` times every request and records its view name
+and response size. A sample of requests (``REQUEST_METRICS['sample_rate']``)
+also records its SQL through ``connection.execute_wrapper``: query count,
+SQL time, Python time (the rest), and queries repeated with the same
+fingerprint, the usual sign of an N+1.
+
+Metrics are exported to Prometheus when ``prometheus_client`` is installed,
+through ``metrics_view`` at ``/metrics``. That view is only served to staff
+users, to the bearer token ``REQUEST_METRICS['metrics_token']`` and to the
+addresses of ``REQUEST_METRICS['metrics_allowed_ips']``. A warning is logged
+whenever a request goes over the query or latency budget of its view.
+"""
+import hmac
+import ipaddress
+import logging
+import os
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUEST_METRICS_SETTINGS = {
+    'enabled': True,
+    'sample_rate': 0.05,
+    'query_budget': 50,
+    'latency_budget_ms': 1000,
+    'duplicate_threshold': 5,
+    'budgets': {},
+    'metrics_token': '',
+    'metrics_allowed_ips': ['127.0.0.1', '::1'],
+}
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+# Placeholder lists and literals left in the SQL (IN lists grow with their
+# parameters, raw SQL may inline values)
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def get_request_metrics_setting(name):
+    return getattr(settings, 'REQUEST_METRICS', {}).get(name, DEFAULT_REQUEST_METRICS_SETTINGS[name])
+
+
+def get_budget(view_name, name):
+    """Budget `name` ('queries' or 'latency_ms') of a view, None when disabled"""
+    budgets = get_request_metrics_setting('budgets').get(view_name, {})
+    if name in budgets:
+        return budgets[name]
+    if name == 'queries':
+        return get_request_metrics_setting('query_budget')
+    return get_request_metrics_setting('latency_budget_ms')
+
+
+def fingerprint(sql):
+    """The SQL with its literals and IN lists replaced, to group queries differing only by values"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    return _NUMBER.sub('?', sql)
+
+
+if prometheus_client is not None:
+    REQUEST_SECONDS = prometheus_client.Histogram(
+        'projecttracker_view_request_seconds', 'Request latency by view',
+        ['view', 'method'],
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    )
+    RESPONSE_BYTES = prometheus_client.Histogram(
+        'projecttracker_view_response_bytes', 'Response size by view',
+        ['view'],
+        buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    )
+    QUERIES = prometheus_client.Histogram(
+        'projecttracker_view_queries', 'SQL queries per sampled request',
+        ['view'],
+        buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+    )
+    SQL_SECONDS = prometheus_client.Histogram(
+        'projecttracker_view_sql_seconds', 'SQL time per sampled request',
+        ['view'],
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    )
+    PYTHON_SECONDS = prometheus_client.Histogram(
+        'projecttracker_view_python_seconds', 'Time outside SQL per sampled request',
+        ['view'],
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    )
+    DUPLICATE_QUERIES = prometheus_client.Counter(
+        'projecttracker_view_duplicate_queries', 'Queries repeating an earlier fingerprint of the same sampled request',
+        ['view'],
+    )
+    BUDGET_EXCEEDED = prometheus_client.Counter(
+        'projecttracker_view_budget_exceeded', 'Requests over their query or latency budget',
+        ['view', 'budget'],
+    )
+
+
+class QueryRecorder:
+    """``execute_wrapper`` counting and timing the queries of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    def record(self):
+        """Context manager installing the recorder on every database connection"""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+    def fingerprints(self):
+        """{fingerprint: count}, fingerprinted once per distinct statement"""
+        counts = Counter()
+        for sql, count in self.statements.items():
+            counts[fingerprint(sql)] += count
+        return counts
+
+
+def should_sample():
+    return random.random() < get_request_metrics_setting('sample_rate')
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else UNRESOLVED_VIEW
+
+
+def response_size(response):
+    if response.has_header('Content-Length'):
+        return int(response['Content-Length'])
+    if getattr(response, 'streaming', False):
+        return None
+    return len(response.content)
+
+
+def record_request(request, response, seconds, recorder=None):
+    """Export the metrics of a request and warn about exceeded budgets"""
+    view = view_name(request)
+    size = response_size(response)
+    exceeded = []
+
+    latency_budget = get_budget(view, 'latency_ms')
+    if latency_budget is not None and seconds * 1000 > latency_budget:
+        exceeded.append('latency')
+
+    duplicates = []
+    if recorder is not None:
+        query_budget = get_budget(view, 'queries')
+        if query_budget is not None and recorder.count > query_budget:
+            exceeded.append('queries')
+        threshold = get_request_metrics_setting('duplicate_threshold')
+        fingerprints = recorder.fingerprints()
+        duplicates = [(sql, count) for sql, count in fingerprints.most_common() if count >= threshold]
+
+    if prometheus_client is not None:
+        REQUEST_SECONDS.labels(view, request.method).observe(seconds)
+        if size is not None:
+            RESPONSE_BYTES.labels(view).observe(size)
+        if recorder is not None:
+            QUERIES.labels(view).observe(recorder.count)
+            SQL_SECONDS.labels(view).observe(recorder.seconds)
+            PYTHON_SECONDS.labels(view).observe(max(seconds - recorder.seconds, 0))
+            repeated = recorder.count - len(fingerprints)
+            if repeated:
+                DUPLICATE_QUERIES.labels(view).inc(repeated)
+        for budget in exceeded:
+            BUDGET_EXCEEDED.labels(view, budget).inc()
+
+    if exceeded:
+        details = f"{seconds * 1000:.0f} ms"
+        if recorder is not None:
+            details += f", {recorder.count} queries in {recorder.seconds * 1000:.0f} ms"
+        logger.warning(
+            f"{request.method} {request.path} ({view}) over its {' and '.join(exceeded)} budget: {details}"
+        )
+    if duplicates:
+        logger.warning(
+            f"{request.method} {request.path} ({view}) repeated queries: "
+            + '; '.join(f"{count}x {sql[:200]}" for sql, count in duplicates[:3])
+        )
+
+
+def metrics_access_allowed(request):
+    """Staff users, the configured bearer token and the allowed addresses may read /metrics"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+
+    token = get_request_metrics_setting('metrics_token')
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if token and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip(), token):
+        return True
+
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in get_request_metrics_setting('metrics_allowed_ips')
+    )
+
+
+def metrics_view(request):
+    """Prometheus exposition of the default registry (all processes in multiprocess mode)"""
+    if not metrics_access_allowed(request):
+        return HttpResponseForbidden()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return HttpResponse(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'django_filters',
     
@@ -71,8 +72,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'authentication.middleware.SessionActivityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'projecttracker.middleware.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'projecttracker.urls'
@@ -170,10 +173,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'authentication.User'
 
+# Login accepts a username or an email address (one lookup)
+AUTHENTICATION_BACKENDS = [
+    'authentication.backends.UsernameOrEmailBackend',
+]
+
+# Write the UserSession record of a login on a background worker instead of
+# in the login request
+LOGIN_SESSION_WRITE_ASYNC = True
+
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -193,7 +205,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # The login view writes last_login together with last_login_ip
+    'UPDATE_LAST_LOGIN': False,
     
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -220,6 +233,59 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Users of JWT-authenticated requests are read from this cache for `ttl`
+# seconds, and reloaded as soon as their roles, status or department
+# permissions change. Point `cache` at a shared cache (Redis, Memcached) when
+# running several workers so that changes reach all of them at once.
+# Custom role permission masks are cached for `permission_masks_ttl` seconds.
+AUTH_USER_CACHE = {
+    'cache': 'default',
+    'ttl': 10,
+    'permission_masks_ttl': 300,
+}
+
+# Last seen time and IP of authenticated users are buffered in memory and
+# written to their sessions every `flush_seconds`; `manage.py prune_sessions`
+# deactivates sessions idle for `stale_days` and deletes inactive ones after
+# `retention_days`. Users seen within `online_minutes` count as online.
+SESSION_ACTIVITY = {
+    'flush_seconds': 30,
+    'online_minutes': 5,
+    'stale_days': 7,
+    'retention_days': 90,
+}
+
+# Refresh-token blacklist checks go through a per-process Bloom filter of
+# blacklisted token ids, rebuilt every `rebuild_seconds`; blacklistings reach
+# other processes at once through a version kept in `cache`. Expired tokens
+# are deleted by `manage.py prune_tokens` in batches of `prune_batch_size`.
+TOKEN_REVOCATION = {
+    'cache': 'default',
+    'rebuild_seconds': 300,
+    'false_positive_rate': 0.001,
+    'prune_batch_size': 1000,
+}
+
+# Per-view latency and response size of every request, and SQL query count,
+# SQL time and repeated queries of `sample_rate` of them, exported to
+# Prometheus at /metrics when django-prometheus is installed. A warning is
+# logged for requests over `query_budget` queries or `latency_budget_ms`
+# (None disables a budget); `budgets` overrides them per view name, e.g.
+# {'authentication:user_list': {'queries': 10, 'latency_ms': 300}}.
+# Queries repeated `duplicate_threshold` times in one request are logged too.
+REQUEST_METRICS = {
+    'enabled': True,
+    'sample_rate': 0.05,
+    'query_budget': 50,
+    'latency_budget_ms': 1000,
+    'duplicate_threshold': 5,
+    'budgets': {},
+    # /metrics is served to staff users, to this bearer token and to these
+    # addresses (single IPs or networks)
+    'metrics_token': '',
+    'metrics_allowed_ips': ['127.0.0.1', '::1'],
+}
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -280,6 +346,75 @@ SERVER_EMAIL = 'GHPportail@groupehdyrapahrm.com'
 EMAIL_TIMEOUT = 30
 EMAIL_USE_SSL = False
 
+# Notification digests: window in minutes per mode, selected per user
+# through User.preferences['notification_digest']
+NOTIFICATION_DIGEST_WINDOWS = {
+    'hourly': 60,
+    'daily': 24 * 60,
+}
+
+# Notification delivery: parallel SMTP workers, retry backoff and relay
+# circuit breaker (state lives in the cache, shared only if the cache is)
+NOTIFICATION_DELIVERY = {
+    'workers': 4,
+    'retry_base_seconds': 60,
+    'retry_max_seconds': 6 * 60 * 60,
+    'breaker_threshold': 5,
+    'breaker_cooldown_seconds': 300,
+    # Priority lanes: scheduling weight and max concurrent sends per lane
+    'lanes': {
+        'urgent': {'weight': 8, 'concurrency': 4},
+        'high': {'weight': 4, 'concurrency': 3},
+        'medium': {'weight': 2, 'concurrency': 2},
+        'low': {'weight': 1, 'concurrency': 1},
+    },
+    'lane_batch_size': 50,
+    # Seconds a notification stays claimed while it is being sent
+    'claim_lease_seconds': 300,
+    # Lanes only pick up pending rows created within this window (or after
+    # `pending_since`, an ISO datetime); explicitly scheduled rows always go
+    'pending_max_age_seconds': 24 * 60 * 60,
+    'pending_since': None,
+}
+
+# Seconds notification statistics stay cached
+NOTIFICATION_STATS_CACHE_TTL = 60
+
+# Retention (days) applied by `manage.py prune_notifications`; pruned rows
+# are archived as gzipped NDJSON under archive_dir
+NOTIFICATION_RETENTION = {
+    'email_log_days': 90,
+    'notification_days': 365,
+    'inbox_days': 180,
+    'reminder_ledger_days': 30,
+    'scheduler_run_days': 30,
+    'batch_size': 1000,
+    'archive': True,
+    'archive_dir': os.path.join(BASE_DIR, 'archives', 'notifications'),
+}
+
+# Jobs fired by `manage.py run_scheduler` (cron expression, dotted callable)
+SCHEDULER_JOBS = {
+    'reminders': {'schedule': '0 7 * * *', 'callable': 'notifications.scheduler.run_reminders'},
+    'retry_failed': {'schedule': '*/15 * * * *', 'callable': 'notifications.scheduler.run_retry_failed'},
+    'digests': {'schedule': '*/5 * * * *', 'callable': 'notifications.scheduler.run_digests'},
+    'pending': {'schedule': '* * * * *', 'callable': 'notifications.scheduler.run_pending'},
+    'stats_rollup': {'schedule': '10 0 * * *', 'callable': 'notifications.scheduler.run_stats_rollup'},
+    'prune': {'schedule': '30 2 * * *', 'callable': 'notifications.scheduler.run_prune'},
+    'prune_tokens': {'schedule': '45 2 * * *', 'callable': 'authentication.token_revocation.prune_expired_tokens'},
+    'prune_sessions': {'schedule': '50 2 * * *', 'callable': 'authentication.sessions.prune_stale_sessions'},
+}
+
+# Real-time project events streamed at /api/projects/events/stream/ (serve
+# with uvicorn). The in-process backend only reaches subscribers of the same
+# worker; use projects.events.RedisBackend when running several workers.
+PROJECT_EVENTS = {
+    'backend': 'projects.events.InProcessBackend',
+    'queue_size': 100,
+    'heartbeat_seconds': 15,
+    'max_stream_seconds': 600,
+}
+
 # Database routing
 DATABASE_ROUTERS = ['ax_server_models.database_router.AxServerRouter']
 
@@ -152,10 +152,15 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'authentication.middleware.SessionActivityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'projecttracker.middleware.RequestMetricsMiddleware',
 ]
 
+# Prometheus scrapers read /metrics with this bearer token
+REQUEST_METRICS = {**REQUEST_METRICS, 'metrics_token': os.environ.get('METRICS_TOKEN', '')}
+
 # WhiteNoise settings
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
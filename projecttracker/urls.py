@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from . import request_metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
@@ -30,6 +32,11 @@ urlpatterns = [
     path('api/administration/', include('administration.urls')),
 ]
 
+# Prometheus metrics at /metrics, restricted to staff, a bearer token and
+# allowed addresses (see projecttracker.request_metrics)
+if request_metrics.prometheus_client is not None:
+    urlpatterns += [path('metrics', request_metrics.metrics_view, name='prometheus-django-metrics')]
+
 # Serve media files in development
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -18,6 +18,10 @@ const refreshToken = async () => {
   const response = await axios.post(`${API_BASE_URL}/authentication/refresh/`, {
     refresh: refreshTokenValue
   })
+  // Refresh tokens are rotated: the previous one is blacklisted
+  if (response.data.tokens.refresh) {
+    window.localStorage.setItem('refreshToken', response.data.tokens.refresh)
+  }
   return response.data.tokens.access
 }
 